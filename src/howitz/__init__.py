@@ -2,7 +2,6 @@ __version__ = '0.1-b2'
 
 
 from logging.config import dictConfig
-from flask_caching import Cache
 
 from flask import Flask, g, redirect, url_for, current_app
 from flask.logging import default_handler
@@ -13,10 +12,16 @@ from werkzeug.exceptions import HTTPException, BadRequest, NotFound, Forbidden
 from howitz.config.utils import load_config
 from howitz.config.zino1 import make_zino1_config
 from howitz.config.howitz import make_howitz_config
-from howitz.error_handlers import handle_generic_exception, handle_generic_http_exception, handle_400, handle_404, handle_403, handle_lost_connection, handle_bad_gateway
+from howitz.error_handlers import handle_generic_exception, handle_generic_http_exception, handle_400, handle_404, handle_403, handle_lost_connection, handle_bad_gateway, handle_login_busy
+from howitz.jobs import JobQueue
+from howitz.rowcache import RowCache
+from howitz.sessions import make_session_interface
 from howitz.users.db import UserDB
+from howitz.users.hashing import PasswordHasher, PasswordHasherBusy
 from howitz.users.commands import user_cli
-from zinolib.controllers.zino1 import Zino1EventManager, LostConnectionError, NotConnectedError
+from howitz.utils import get_zino_session
+from howitz.zino.pool import SessionPool
+from zinolib.controllers.zino1 import LostConnectionError, NotConnectedError
 
 __all__ = ["create_app"]
 
@@ -34,6 +39,7 @@ def create_app(test_config=None):
     app.register_error_handler(BrokenPipeError, handle_lost_connection)
     app.register_error_handler(NotConnectedError, handle_lost_connection)
     app.register_error_handler(502, handle_bad_gateway)
+    app.register_error_handler(PasswordHasherBusy, handle_login_busy)
 
     # load config
     app = load_config(app, test_config)
@@ -52,22 +58,52 @@ def create_app(test_config=None):
         app.logger.addHandler(default_handler)
         app.logger.warn('Logging not set up, config not found')
 
-    # set up zino controller
+    # set up pool of zino sessions, one per logged in user
     app.logger.debug('ZinoV1Config %s', zino_config)
-    event_manager = Zino1EventManager.configure(zino_config)
-    app.event_manager = event_manager
-    app.logger.debug('Zino1EventManager %s', event_manager)
-
-    # set up placeholder for UpdateHandler
-    app.updater = None
-    app.logger.debug('UpdateHandler is None')
+    zino_sessions = SessionPool(
+        zino_config,
+        max_size=howitz_config.get("max_zino_sessions", 20),
+        idle_timeout=howitz_config.get("zino_session_timeout", 3600),
+        autoremove=zino_config.autoremove,
+        workers=howitz_config.get("zino_workers", 3),
+        shared_dir=howitz_config.get("shared_events_dir", ""),
+        health_interval=howitz_config.get("zino_health_interval", 30),
+        resync_interval=howitz_config.get("zino_resync_interval", 300),
+    )
+    app.zino_sessions = zino_sessions
+    app.logger.debug('SessionPool %s', zino_sessions)
+
+    # set up queue of background jobs, like bulk actions
+    jobs = JobQueue(max_running=howitz_config.get("bulk_job_workers", 2))
+    app.jobs = jobs
+    app.logger.debug('JobQueue %s', jobs)
+
+    # set up pool of processes hashing passwords, so that logins do not hold up other requests
+    password_hasher = PasswordHasher(
+        method=howitz_config.get("password_hash_method", "scrypt"),
+        workers=howitz_config.get("password_workers", 2),
+        max_pending=howitz_config.get("password_queue_size", 32),
+    )
+    app.password_hasher = password_hasher
+    app.logger.debug('PasswordHasher %s', password_hasher)
 
     # set up user database
-    database = UserDB(app.config["HOWITZ_STORAGE"])
+    database = UserDB(app.config["HOWITZ_STORAGE"], cache_ttl=howitz_config.get("user_cache_ttl", 60),
+                      password_method=password_hasher.method)
     database.initdb()
     app.database = database
     app.logger.info('Connected to database %s', database)
 
+    # set up server-side sessions, the cookie only holds a session id
+    session_backend = howitz_config.get("session_backend", "sqlite")
+    session_storage = app.config["HOWITZ_STORAGE"]
+    if session_backend == "filesystem":
+        session_storage = howitz_config.get("session_dir", "./.howitz_sessions")
+    session_interface = make_session_interface(session_backend, session_storage)
+    if session_interface:
+        app.session_interface = session_interface
+    app.logger.debug('Session backend -> %s', session_backend)
+
     # load extra commands
     app.cli.add_command(user_cli)
 
@@ -79,17 +115,18 @@ def create_app(test_config=None):
     @login_manager.user_loader
     def load_user(user_id):
         with current_app.app_context():
-            user = current_app.database.get(user_id)
-            current_app.logger.info('User "%s" logged in', user.username)
+            user = current_app.database.get(user_id)  # Cached, this runs on every request
+            current_app.logger.debug('Loaded user "%s"', user_id)
             return user
 
     @login_manager.unauthorized_handler
     def unauthorized():
-        logout_user()
         with current_app.app_context():
+            zino_session = get_zino_session(quiet=True)
+            logout_user()
             try:
-                if current_app.event_manager.is_connected and not current_app.event_manager.is_authenticated:
-                    current_app.event_manager.disconnect()
+                if zino_session and not zino_session.is_authenticated:
+                    current_app.zino_sessions.remove(zino_session.username)
                     current_app.logger.debug("Zino session was disconnected")
             except ValueError:
                 current_app.logger.debug("Zino session was not established")
@@ -103,16 +140,10 @@ def create_app(test_config=None):
     assets.register("css", css)
     css.build()
 
-    cache_type = app.config.get("CACHE_TYPE")
-    if not cache_type:
-        cache = Cache(config={'CACHE_TYPE': 'SimpleCache'})
-        cache.init_app(app)
-        app.logger.warn('Caching config not found, setting up simple caching')
-    else:
-        cache = Cache(app)
-        app.logger.debug('Cache type -> %s', cache_type)
-    app.cache = cache
-
+    # set up cache of rendered event table rows, size is configured in megabytes
+    row_cache = RowCache(max_size=howitz_config.get("row_cache_size", 32) * 1024 * 1024)
+    app.row_cache = row_cache
+    app.logger.debug('RowCache %s', row_cache)
 
     # import endpoints/urls
     from . import endpoints
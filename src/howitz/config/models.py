@@ -4,7 +4,7 @@ from pydantic import BaseModel
 from pydantic.networks import IPvAnyAddress
 
 from howitz.config.defaults import DEFAULT_TIMEZONE, DEFAULT_STORAGE
-from howitz.endpoints import EventSort
+from howitz.events.sorting import EventSort
 
 
 class ServerConfig(BaseModel):
@@ -30,6 +30,23 @@ class HowitzConfig(ServerConfig, StorageConfig):
     refresh_interval: int = 5
     timezone: str = DEFAULT_TIMEZONE
     sort_by: str = str(EventSort.DEFAULT)
+    max_zino_sessions: int = 20
+    zino_session_timeout: int = 3600
+    zino_workers: int = 3
+    shared_events_dir: str = ""
+    zino_health_interval: int = 30
+    zino_resync_interval: int = 300
+    bulk_job_workers: int = 2
+    bulk_rate: float = 0
+    event_stream: bool = False
+    row_cache_size: int = 32
+    page_size: int = 100
+    session_backend: Literal["sqlite", "filesystem", "cookie"] = "sqlite"
+    session_dir: str = "./.howitz_sessions"
+    user_cache_ttl: int = 60
+    password_hash_method: str = "scrypt"
+    password_workers: int = 2
+    password_queue_size: int = 32
 
 
 class DevHowitzConfig(DevServerConfig, DevStorageConfig):
@@ -37,3 +54,20 @@ class DevHowitzConfig(DevServerConfig, DevStorageConfig):
     refresh_interval: int = 5
     timezone: str = DEFAULT_TIMEZONE
     sort_by: str = str(EventSort.DEFAULT)
+    max_zino_sessions: int = 20
+    zino_session_timeout: int = 3600
+    zino_workers: int = 3
+    shared_events_dir: str = ""
+    zino_health_interval: int = 30
+    zino_resync_interval: int = 300
+    bulk_job_workers: int = 2
+    bulk_rate: float = 0
+    event_stream: bool = False
+    row_cache_size: int = 32
+    page_size: int = 100
+    session_backend: Literal["sqlite", "filesystem", "cookie"] = "sqlite"
+    session_dir: str = "./.howitz_sessions"
+    user_cache_ttl: int = 60
+    password_hash_method: str = "scrypt"
+    password_workers: int = 2
+    password_queue_size: int = 32
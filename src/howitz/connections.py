@@ -0,0 +1,52 @@
+import threading
+import weakref
+
+
+__all__ = [
+    "ThreadConnections",
+]
+
+
+class _Holder:
+    "Holds the connection of a thread, and closes it when the thread ends and lets go of it"
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.close = weakref.finalize(self, connection.close)
+
+
+class ThreadConnections:
+    """A database connection per thread, opened with ``connect()`` on first use
+
+    Reusing a connection saves opening the database, and lets sqlite reuse
+    its prepared statements. A connection is closed when the thread that
+    opened it ends, threads come and go with servers that start a thread per
+    request.
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+        self._local = threading.local()
+        self._holders = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        "Number of open connections"
+        return len(self._holders)
+
+    def get(self):
+        "The connection of the current thread"
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = self._local.holder = _Holder(self.connect())
+            with self._lock:
+                self._holders.add(holder)
+        return holder.connection
+
+    def close(self):
+        "Close the connections of all threads"
+        with self._lock:
+            holders = list(self._holders)
+            self._local = threading.local()
+        for holder in holders:
+            holder.close()
@@ -1,111 +1,71 @@
+import functools
+import hashlib
 import os
-from enum import Enum
+import zoneinfo
 
 from flask import (
     Blueprint,
+    Response,
     current_app,
     flash,
     g,
+    jsonify,
     make_response,
     redirect,
     render_template,
     request,
     session,
+    stream_template,
     url_for,
 )
 from flask_login import login_user, current_user, logout_user
 
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 
-from werkzeug.exceptions import BadRequest, InternalServerError, MethodNotAllowed
-from zinolib.controllers.zino1 import Zino1EventManager, UpdateHandler
+from markupsafe import Markup
+from werkzeug.exceptions import BadRequest, InternalServerError, MethodNotAllowed, NotFound
 from zinolib.controllers.zino1 import RetryError, EventClosedError, LostConnectionError, NotConnectedError
-from zinolib.event_types import Event, AdmState, PortState, BFDState, ReachabilityState, LogEntry, HistoryEntry
-from zinolib.compat import StrEnum
-from zinolib.ritz import AuthenticationError, ProtocolError
+from zinolib.event_types import Event, AdmState, LogEntry, HistoryEntry
+from zinolib.ritz import AuthenticationError
 
 from howitz.users.utils import authenticate_user
 
 from . import __version__
 from .config.defaults import DEFAULT_TIMEZONE
-from .utils import login_check, date_str_without_timezone, shorten_downtime, calculate_event_age_no_seconds
+from .events.counters import EventCounters
+from .events.details import EventDetails
+from .events.filtering import PRIORITY_NAMES, EventFilter
+from .events.sorting import EventSort, SortedIndex, decode_cursor, encode_cursor
+from .events.stream import event_stream
+from .events.table import TableEvent
+from .jobs import Job
+from .sessions import regenerate_session
+from .zino import bulk
+from .zino.health import Health
+from .utils import get_zino_session, login_check, get_date_formatter, get_user_timezone, is_valid_timezone
 
 main = Blueprint('main', __name__)
 
 
-# TODO: Should be configurable
-class EventColor(StrEnum):
-    RED = "red"
-    BLUE = "cyan"
-    GREEN = "green"
-    YELLOW = "yellow"
-    DEFAULT = ""
-
-
-# Inspired by https://stackoverflow.com/a/54732120
-class EventSort(Enum):
-    # Name, relevant event attribute, is_reversed, displayed name, description
-    AGE = "age", "opened", True, "Age", "Newest events first"
-    AGE_REV = "age-rev", "opened", False, "Age reversed", "Oldest events first"
-    UPD = "upd", "updated", False, "Activity", "Events with the oldest update date first"
-    UPD_REV = "upd-rev", "updated", True, "Activity reversed", "Events with the most recent update date first"
-    DOWN = "down", "get_downtime", True, "Downtime", "Events with longest downtime first"
-    DOWN_REV = "down-rev", "get_downtime", False, "Downtime reversed", "Events with shortest/none downtime first"
-
-    LASTTRANS = ("lasttrans", "updated", True, "Last transaction",
-                 "Events with the most recent update date first, all IGNORED events are at the bottom")
-    SEVERITY = "severity", "", True, "Severity", "Events with highest priority first, grouped by event type. Priority takes into account both whether event signifies any disturbance, event's administrative phase and event's type, so there might not be continuous blocks of color"
-    DEFAULT = "raw", "", None, "Raw", "The same order in which Zino server sends events (by ID, ascending)"
-
-    def __new__(cls, *args, **kwds):
-        obj = object.__new__(cls)
-        obj._value_ = args[0]
-        return obj
-
-    def __init__(self, _: str, attribute: str = None, reversed: bool = None, display_name: str = None, description: str = None):
-        self._attribute = attribute
-        self._reversed = reversed
-        self._display_name = display_name
-        self._description = description
-
-    def __str__(self):
-        return self.value
-
-    @property
-    def attribute(self):
-        return self._attribute
-
-    @property
-    def reversed(self):
-        return self._reversed
-
-    @property
-    def display_name(self):
-        return self._display_name
-
-    @property
-    def description(self):
-        return self._description
-
-
 def auth_handler(username, password):
     # check user credentials in database
     with current_app.app_context():
-        user = authenticate_user(current_app.database, username, password)
+        user = authenticate_user(current_app.database, username, password, hasher=current_app.password_hasher)
         current_app.logger.debug('User %s', user)
 
-        connect_to_zino(user.username, user.token)
+        zino_session = connect_to_zino(user.username, user.token)
 
-        if current_app.event_manager.is_authenticated:  # is zino authenticated
-            current_app.logger.debug('User is Zino authenticated %s', current_app.event_manager.is_authenticated)
+        if zino_session.is_authenticated:  # is zino authenticated
+            current_app.logger.debug('User is Zino authenticated %s', zino_session.is_authenticated)
             current_app.logger.debug('HOWITZ CONFIG %s', current_app.howitz_config)
+            regenerate_session(session)  # A session id planted before logging in must not get logged in
             login_user(user, remember=True)
             flash('Logged in successfully.')
             session["selected_events"] = {}
             session["expanded_events"] = {}
             session["errors"] = {}
-            session["event_ids"] = []
             session["sort_by"] = current_app.howitz_config.get("sort_by", "raw")
+            session["event_filter"] = {}
             session["events_last_refreshed"] = None
             return user
 
@@ -114,76 +74,60 @@ def auth_handler(username, password):
 
 def logout_handler():
     with current_app.app_context():
+        username = current_user.username
         logged_out = logout_user()
+        regenerate_session(session)
         current_app.logger.debug('User logged out %s', logged_out)
-        current_app.event_manager.disconnect()
+        current_app.jobs.cancel_all(username)
+        current_app.zino_sessions.remove(username)
         current_app.logger.debug("Zino session was disconnected")
         flash('Logged out successfully.')
         session.pop('expanded_events', {})
         session.pop('selected_events', {})
         session.pop('errors', {})
-        session.pop('event_ids', [])
         session.pop('sort_by', "raw")
+        session.pop('event_filter', {})
         session.pop('events_last_refreshed', None)
-        current_app.cache.clear()
         current_app.logger.info("Logged out successfully.")
 
 
-def connect_to_updatehandler():
-    if current_app.event_manager.is_authenticated:  # is zino authenticated
-        current_app.updater = UpdateHandler(current_app.event_manager, autoremove=current_app.zino_config.autoremove)
-        current_app.updater.connect()
-        current_app.logger.debug('Connected to UpdateHandler: %s', current_app.updater)
-        return
-    raise NotConnectedError('Session not authenticated, cannot connect to UpdateHandler')
-
-
 def connect_to_zino(username, token):
-    if not current_app.event_manager.is_connected:
-        current_app.event_manager = Zino1EventManager.configure(current_app.zino_config)
-        current_app.event_manager.connect()
-        current_app.logger.info('Connected to Zino %s', current_app.event_manager.is_connected)
-
-    if not current_app.event_manager.is_authenticated:
-        current_app.event_manager.authenticate(username=username, password=token)
-        current_app.logger.info('Authenticated in Zino %s', current_app.event_manager.is_authenticated)
-
-    connect_to_updatehandler()
+    zino_session = current_app.zino_sessions.connect(username, token)
+    current_app.logger.debug('Connected %s', zino_session)
+    return zino_session
 
 
 def reconnect_to_zino():
     current_app.logger.info('Attempting reconnect to Zino')
 
     # Disconnect completely from Zino in case of any dangling connection state
-    current_app.event_manager.disconnect()
+    zino_session = get_zino_session(quiet=True)
+    if zino_session is not None:
+        zino_session.disconnect()
 
     # Reconnect to Zino with existing credentials
-    connect_to_zino(current_user.username, current_user.token)
+    zino_session = connect_to_zino(current_user.username, current_user.token)
 
-    # Make sure that EventManager is populated with data after re-connect
-    current_app.event_manager.get_events()
-
-    # Re-fetch the event list and update event data in cache and session
-    # This is needed in case there were NTIE updates that occurred while connection was down, so that they are not lost until manual page refresh
-    events = current_app.event_manager.events
-    current_app.cache.set("events", events)  # Update cache
-    session["event_ids"] = list(events.keys())  # Update session
-    session["events_last_refreshed"] = None  # Mark current event table in UI as outdated
-    session.modified = True
+    # Catch up on updates that occurred while the connection was down, so that they are not lost until manual
+    # page refresh. Only the events that changed are fetched, clients get them on their next refresh
+    zino_session.load_events()
 
 
 def test_zino_connection():
-    try:
-        current_app.event_manager.test_connection()  # Fetches event with fake id
-        return True
-    except ProtocolError:  # Event ID unknown, but connection is OK
-        return True
-    except TimeoutError as e:
-        current_app.logger.exception('TimeoutError when testing Zino connection %s', e)
+    """Tell whether the connection to Zino works, as last checked by the health monitor of the session
+
+    Returns None if that is uncertain, and asks the monitor to check again soon.
+    """
+    zino_session = get_zino_session(quiet=True)
+    if zino_session is None or zino_session.health is None:  # Session was evicted from the pool, nothing to test
+        return None
+    status = zino_session.health.status
+    if status.health == Health.DOWN:
         return False
-    except Exception as e:
-        current_app.logger.exception('Unexpected error when testing Zino connection %s', e)
-        return None  # Uncertain connection state, let the caller decide how to interpret it
+    if status.health == Health.UNKNOWN or status.failures:
+        zino_session.health.check_soon()
+        return None
+    return True
 
 
 def clear_ui_state():
@@ -191,27 +135,35 @@ def clear_ui_state():
         session["selected_events"] = {}
         session["expanded_events"] = {}
         session["errors"] = {}
-        session["event_ids"] = []
         session["events_last_refreshed"] = None
         session.modified = True
 
-        current_app.cache.clear()
-
 
 def get_timezone():
-    tz = current_app.howitz_config["timezone"]  # Get raw string from config. Accepted values are 'UTC' or 'LOCAL'.
+    tz = get_user_timezone()  # Accepted values are 'UTC', 'LOCAL' or the name of a timezone
     if tz == 'LOCAL':  # Change to a specific timezone name if 'LOCAL'
         tz = datetime.now(timezone.utc).astimezone().tzinfo
-    elif not tz == DEFAULT_TIMEZONE:  # Fall back to default if invalid value is provided
+    elif not is_valid_timezone(tz):  # Fall back to default if invalid value is provided
         tz = f"{DEFAULT_TIMEZONE} (default)"
     return tz
 
 
+@functools.cache
+def get_timezone_names():
+    return ('LOCAL', 'UTC') + tuple(sorted(zoneinfo.available_timezones() - {'UTC'}))
+
+
 def get_info_dict():
     with current_app.app_context():
-        events = current_app.cache.get("events") or ()
+        zino_session = get_zino_session(quiet=True)
+        _, counts = zino_session.store.stats() if zino_session else (None, EventCounters().as_dict())
+        event_count = counts["total"]
+        selected = zino_session.store.select(get_event_filter()) if zino_session else None
         info_dict = {
-            'event_count': len(events),
+            'event_count': event_count if selected is None else len(selected),
+            'total_event_count': event_count,
+            'adm_state_counts': counts["adm_state"],
+            'color_counts': counts["color"],
             'howitz_version': __version__,
             'sort_by': session.get('sort_by') or 'raw',
             'timezone': get_timezone(),
@@ -222,202 +174,348 @@ def get_info_dict():
 
 
 def get_current_events():
+    zino_session = get_zino_session()
+    # Nothing to fetch once the events are loaded, the update pump keeps them up to date
+    loader = zino_session.start_loading()
+    if loader is not None:
+        # Show the first page as soon as it is there, the other events are added as they arrive
+        loader.wait_for(get_page_size() or 100, timeout=1.0)
+
+    table_events = get_sorted_table_event_list(zino_session.store)
+    return table_events
+
+
+def get_sort_by():
+    return EventSort(session.get("sort_by") or "raw")
+
+
+def get_page_size():
+    "Number of rows to render per page of the events table, None for all rows"
+    return current_app.howitz_config.get("page_size", 100) or None
+
+
+def get_event_filter():
     try:
-        current_app.event_manager.get_events()
-    except RetryError as retryErr:  # Intermittent error in Zino
-        current_app.logger.exception('RetryError when fetching current events %s', retryErr)
-        try:
-            current_app.event_manager.get_events()
-        except RetryError as retryErr:  # Intermittent error in Zino
-            current_app.logger.exception('RetryError when fetching current events after retry, %s', retryErr)
-            raise
-    events = current_app.event_manager.events
+        return EventFilter.from_dict(session.get("event_filter") or {})
+    except ValueError as e:
+        current_app.logger.warning('Ignoring invalid event filter in session: %s', e)
+        return EventFilter()
 
-    # Cache current events
-    current_app.cache.set("events", events)
-    # Save current events' IDs
-    session["event_ids"] = list(events.keys())
-    session.modified = True
 
-    table_events = get_sorted_table_event_list(events)
-    return table_events
+def get_window_end(sort_by: EventSort, event_filter: EventFilter):
+    """Return the sort key of the last row the client has loaded, None if it has loaded all rows
 
+    Raises ValueError if the client did not tell, or its rows are of another sort or filter.
+    """
+    return decode_cursor(sort_by, request.values.get("events_window_end", ""), tag=event_filter.tag)
 
-def get_sorted_table_event_list(events: dict):
-    events_sorted = sort_events(events, sort_by=EventSort(session.get("sort_by") or "raw"))
-    table_events = []
-    for c in events_sorted.values():
-        table_events.append(create_table_event(c, expanded=str(c.id) in session["expanded_events"],
-                                               selected=str(c.id) in session["selected_events"]))
 
-    session["events_last_refreshed"] = datetime.now(timezone.utc)
-    return table_events
+def get_sorted_table_event_list(store):
+    """Render the rows of the events table in the current sort order, of the events that match the filter
 
+    Only the rows the client has loaded are rendered, or the first page if
+    it has loaded none yet or the sort or filter has changed. More rows are loaded as
+    the operator scrolls, see ``load_more_events()``.
 
-def update_events():
-    updated_ids = set()
+    Rendered rows are cached, only rows of events that changed, or whose UI state
+    or age/downtime changed, are rendered again.
+    """
+    sort_by = get_sort_by()
+    event_filter = get_event_filter()
+    zino_session = get_zino_session()
+    g.events_loader = zino_session.loader if zino_session.is_loading else None
+    window_end = None
+    page_size = get_page_size()
+    if not g.events_loader:  # Until all events are loaded only the first page is rendered, whatever the client had
+        try:
+            window_end = get_window_end(sort_by, event_filter)
+            page_size = None
+        except ValueError:
+            pass
+    version, events_sorted, last_key = store.sorted_page(sort_by, size=page_size, end=window_end,
+                                                         event_filter=event_filter)
+    g.events_version = store.version_tag(version)
+    if g.events_loader:
+        # No cursor, so that the client asks for the first page again. More rows cannot be loaded meanwhile
+        g.events_window_end = ""
+        g.events_more = False
+    else:
+        g.events_window_end = encode_cursor(sort_by, last_key, tag=event_filter.tag)
+        g.events_more = last_key is not None
+    table_rows = render_event_rows(store, events_sorted)
+    # Until all events are loaded the table is rendered again on refresh, with the events added meanwhile in place
+    session["events_last_refreshed"] = None if g.events_loader else datetime.now(timezone.utc)
+    return table_rows
 
-    while True:
-        if current_app.updater is None:
-            try:
-                connect_to_updatehandler()
-            except NotConnectedError as e:
-                raise LostConnectionError("Could not establish connection to UpdateHandler") from e
-        updated = current_app.updater.get_event_update()
-        if not updated:
-            break
-        updated_ids.add(updated)
 
-    return updated_ids
+def render_event_rows(store, events_sorted):
+    """Return an iterator that renders the rows of ``events_sorted`` as it goes
+
+    Responses with many rows are streamed with ``stream_template()``, so
+    that rows are sent as soon as they are rendered instead of all at once.
+    """
+    expanded_ids = [c.id for _, c in events_sorted if str(c.id) in session["expanded_events"]]
+    if expanded_ids:
+        prefetch_event_details(get_zino_session(), expanded_ids)
+    return _iter_event_rows(store, events_sorted)
+
 
+def stream_rows_template(template_name, chunk_size=16384, **context):
+    """Like ``stream_template()``, but sends the output in chunks of about ``chunk_size`` characters
 
-def refresh_current_events():
-    if current_app.updater is None:
+    Jinja yields the output piece by piece, a few for every row, and sending
+    them one at a time costs more than rendering them.
+    """
+    return _join_chunks(stream_template(template_name, **context), chunk_size)
+
+
+def _join_chunks(stream, chunk_size):
+    chunk = []
+    length = 0
+    for piece in stream:
+        chunk.append(piece)
+        length += len(piece)
+        if length >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def _iter_event_rows(store, events_sorted):
+    row_cache = current_app.row_cache
+    misses = row_cache.misses
+    for event_version, c in events_sorted:
+        yield render_event_row(store, event_version, c)
+    current_app.logger.debug('Rendered %s of %s rows, row cache %s',
+                             row_cache.misses - misses, len(events_sorted), row_cache.stats())
+
+
+def render_event_row(store, event_version, event):
+    "Render the table row(s) of ``event``, or get them from the row cache"
+    expanded = str(event.id) in session["expanded_events"]
+    selected = str(event.id) in session["selected_events"]
+    key = (store.id, event.id, event_version, expanded, selected, get_user_timezone(), __version__)
+    row = current_app.row_cache.get(key)
+    if row is None:
+        table_event = create_table_event(store.table_event(event), expanded=expanded, selected=selected)
+        row = Markup(render_template('/components/table/event-rows.html', event_list=[table_event]))
+        current_app.row_cache.set(key, row)
+    return row
+
+
+def check_update_pump(zino_session):
+    pump = zino_session.pump
+    if pump is None:
         try:
-            connect_to_updatehandler()
+            zino_session.connect_updatehandler()
         except NotConnectedError as e:
             raise LostConnectionError("Could not establish connection to UpdateHandler") from e
+    elif not pump.is_alive():
+        raise LostConnectionError("Lost connection to UpdateHandler") from pump.error
 
-    event_ids = update_events()
-    current_app.logger.debug('UPDATED EVENT IDS %s', event_ids)
-
-    removed_events = []
-    modified_events = []
-    added_events = []
-    removed = current_app.event_manager.removed_ids
-    existing = session["event_ids"]
-    current_events = current_app.cache.get("events") or {}
-    is_resort = None  # Re-sort cached events list if any new events added, or any modified
-    for i in event_ids:
-        if i in removed:
-            removed_events.append(i)
-            if i in existing:
-                existing.remove(i)
-            current_events.pop(i, None)
-        elif i not in existing:
-            c = current_app.event_manager.create_event_from_id(int(i))
-            added_event = create_table_event(c, expanded=False, selected=False)
-            added_events.append(added_event)
-            existing.insert(0, int(i))
-            current_events.update({i: c})
-            is_resort = True
-        else:
-            c = current_app.event_manager.create_event_from_id(int(i))
-            modified_events.append(create_table_event(c,
-                                                      expanded=str(c.id) in session["expanded_events"],
-                                                      selected=str(c.id) in session["selected_events"]))
-            current_events.update({i: c})
-            is_resort = True
-
-    session["event_ids"] = existing
-    session.modified = True
-    current_app.cache.set("events", current_events)
-
-    table_events = []
-    has_stale_data = session["events_last_refreshed"] is None or (
-            datetime.now(timezone.utc) - session["events_last_refreshed"]).total_seconds() > 60
-    if is_resort or has_stale_data:
-        table_events = get_sorted_table_event_list(current_events)
 
-    return removed_events, modified_events, added_events, table_events
+def is_table_stale(event_filter: EventFilter):
+    "Whether the table the client shows must be rendered again from scratch, even if no events changed"
+    # Age and downtime tick in the browser, so rows need not be rendered again as time passes. Only
+    # which events match a filter on age changes with time alone
+    last_refreshed = session.get("events_last_refreshed")
+    return last_refreshed is None or (event_filter.is_volatile and (
+            datetime.now(timezone.utc) - last_refreshed).total_seconds() > 60)
 
 
-def sort_events(events_dict, sort_by: EventSort = EventSort.DEFAULT):
-    current_app.logger.debug("SORTING BY %s", sort_by)
-
-    sortmap = {
-        EventSort.LASTTRANS: sort_on_lasttrans,
-        EventSort.SEVERITY: sort_on_severity,
-        EventSort.DOWN: sort_on_downtime,
-        EventSort.DOWN_REV: sort_on_downtime,
-    }
+def get_client_version(store):
+    "The version of the events in ``store`` the client shows, None if unknown or of another store"
+    return store.parse_version_tag(request.values.get("events_version"))
 
-    if sort_by == EventSort.DEFAULT:
-        return events_dict
-    if (sort := sort_by) in sortmap:
-        return sortmap.get(sort)(events_dict=events_dict, sort_by=sort)
-    else:
-        return general_sort_on(events_dict, sort_by)
 
+def is_view_current(store, sort_by: EventSort, event_filter: EventFilter):
+    "Whether the client shows the current events already, by comparing versions only"
+    return (get_client_version(store) == store.version
+            and not is_table_stale(event_filter) and not store.index(sort_by).is_outdated())
 
-def sort_on_lasttrans(events_dict, sort_by: EventSort.LASTTRANS):
-    return {k: events_dict[k] for k in
-            reversed(
-                sorted(events_dict,
-                       key=lambda k: (
-                           0 if events_dict[k].adm_state == AdmState.IGNORED else 1,
-                           getattr(events_dict[k], sort_by.attribute),
-                       ), ))
-            }
 
+def get_view_etag(version_tag: str):
+    """Validator of a rendering of the events at ``version_tag`` for the current session
 
-def sort_on_severity(events_dict, sort_by: EventSort.SEVERITY):
-    return {k: events_dict[k] for k in sorted(events_dict,
-                                              key=lambda k: (
-                                                  get_priority(events_dict[k]),
-                                                  events_dict[k].type,
-                                              ), reverse=sort_by.reversed)}
+    Made from the version and the view state of the session the rendering
+    depends on, so that it is known without rendering anything.
+    """
+    view = (version_tag, str(get_sort_by()), get_event_filter().tag, get_page_size(), get_user_timezone(),
+            sorted(session.get("expanded_events") or {}), sorted(session.get("selected_events") or {}), __version__)
+    return hashlib.blake2s(repr(view).encode(), digest_size=8).hexdigest()
 
 
-def sort_on_downtime(events_dict, sort_by: EventSort in [EventSort.DOWN, EventSort.DOWN_REV]):
-    return {k: events_dict[k] for k in sorted(events_dict,
-                                              key=lambda k: (
-                                                  timedelta() if not hasattr(events_dict[k], sort_by.attribute) else
-                                                  events_dict[k].get_downtime(),
-                                              ), reverse=sort_by.reversed)}
+def make_revalidated(response, etag: str):
+    "Tag ``response`` with ``etag``, browsers keep it and ask whether it is still current before reusing it"
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
-def general_sort_on(events_dict, sort_by: EventSort):
-    return {k: events_dict[k] for k in sorted(events_dict,
-                                              key=lambda k: (
-                                                  getattr(events_dict[k], sort_by.attribute),
-                                              ), reverse=sort_by.reversed)}
+def refresh_current_events(also=()):
+    """Find what changed since the version of the events the client has, and render those rows
 
+    ``also`` are ids of events to render again even if they did not change,
+    like events whose UI state changed. Returns the ids of rows to remove,
+    the rows to place and, if the client is too far behind, all rows.
+    """
+    zino_session = get_zino_session()
+    check_update_pump(zino_session)
+
+    # The version of the events the client is displaying is carried by the client, so that
+    # every browser tab gets the changes it has not seen yet
+    store = zino_session.store
+    sort_by = get_sort_by()
+    event_filter = get_event_filter()
+    with store.lock:
+        changes = store.changes_since(get_client_version(store))
+        index = store.index(sort_by)
+        try:
+            window_end = get_window_end(sort_by, event_filter)
+        except ValueError:
+            changes = None
+        if changes is None or index.is_outdated():  # Client is too far behind, or the order has changed with time
+            session["events_last_refreshed"] = None
+            session.modified = True
+        else:
+            # Only rows that match the filter and are inside the window the client has loaded are
+            # placed, other events that changed are removed in case they were shown
+            selected = store.select(event_filter)
+            modified = changes.modified + [i for i in also if i in store.events]
+            changed = list(dict.fromkeys(changes.added + modified))
+            shown = [i for i in changed if (selected is None or i in selected) and index.includes(i, window_end)]
+            hidden = sorted(set(modified).difference(shown))
+            # Place changed events in display order, so that the event displayed before each is in place already
+            placed = [(store.event_versions[i], store.events[i], index.previous(i, where=selected)) for i in
+                      sorted(shown, key=index.position)]
+            g.events_version = store.version_tag(changes.version)
 
-def get_priority(event: Event):
+    table_events = []
+    if is_table_stale(event_filter):
+        table_events = get_sorted_table_event_list(store)
+        return [], [], table_events
+
+    current_app.logger.debug('ADDED EVENT IDS %s, MODIFIED EVENT IDS %s, REMOVED EVENT IDS %s',
+                             changes.added, changes.modified, changes.removed)
+    placed_events = []
+    for event_version, c, previous_id in placed:
+        placed_events.append({
+            "id": c.id,
+            "row": render_event_row(store, event_version, c),
+            "previous_id": previous_id,
+            "previous_expanded": str(previous_id) in session["expanded_events"],
+        })
+
+    return changes.removed + hidden, placed_events, table_events
+
+
+def load_more_events():
+    """Render the page of rows that follows the last row the client has loaded
+
+    The rows are of the current version of the events, while the client
+    keeps the version it has. Changes to the new rows since that version
+    are placed again by the next refresh, which does no harm.
     """
-    Priorities are as follows:
-      - `0` = Lowest
-      - `1` = Low
-      - `2` = Medium
-      - `3` = High
-      - `4` = Highest
-    :param event:
-    :return: priority as int, where `0` is lowest, and `4` is the highest priority
+    zino_session = get_zino_session()
+    store = zino_session.store
+    sort_by = get_sort_by()
+    event_filter = get_event_filter()
+    try:
+        after = decode_cursor(sort_by, request.args.get("after", ""), tag=event_filter.tag)
+    except ValueError:  # The sort or filter has changed, the next refresh renders the table again
+        after = None
+    if after is None:
+        return []
+    _, events_sorted, last_key = store.sorted_page(sort_by, after=after, size=get_page_size(),
+                                                   event_filter=event_filter)
+    g.events_window_end = encode_cursor(sort_by, last_key, tag=event_filter.tag)
+    g.events_more = last_key is not None
+    return render_event_rows(store, events_sorted)
+
+
+def submit_bulk_job(title, action, **kwargs):
+    """Submit a job running a bulk action on the selected events, over the worker connections of the Zino session
+
+    The job runs in the background, its progress is shown by a panel that
+    polls ``/jobs/<job_id>``. Events it updates are shown by the refresh of
+    the events table. The selection is cleared, and the rows of the
+    selected events are rendered together with the panel.
     """
-    if event.is_down() and event.adm_state == AdmState.OPEN:
-        return 4
-    if event.adm_state in [AdmState.WORKING, AdmState.WAITING]:
-        return 3
-    if event.adm_state == AdmState.IGNORED:
-        return 1
-    if event.adm_state == AdmState.CLOSED:
-        return 0
-    return 2
+    zino_session = get_zino_session()
+    store = zino_session.store
+    selected_ids = [int(event_id) for event_id in session.get("selected_events", {})]
+    current_app.logger.debug('SELECTED EVENTS %s', selected_ids)
+
+    def start(event_id):
+        with store.lock:
+            event = store.events.get(event_id)
+        if event is None:
+            raise bulk.BulkError("Event no longer exists")
+        return bulk.submit(zino_session.workers, action, event, **kwargs)
+
+    def on_result(event_id, event):
+        zino_session.details.invalidate(event_id)
+        if event is not None:  # Show the change now instead of when the update handler tells
+            store.set(event)
+
+    howitz_config = current_app.howitz_config
+    job = Job(current_user.username, title, selected_ids, start, on_result=on_result,
+              concurrency=zino_session.workers.size, rate=howitz_config.get("bulk_rate", 0))
+    current_app.jobs.submit(job)
 
+    # Clear selected events
+    session["selected_events"] = {}
+    session.modified = True  # Necessary when modifying arrays/dicts/etc in flask session
+    current_app.logger.debug("SELECTED EVENTS %s", session["selected_events"])
 
-# todo remove all use of helpers from curitz
-def create_table_event(event, expanded=False, selected=False):
-    common = {}
+    removed_events, placed_events, event_list = refresh_current_events(also=selected_ids)
+    context = {"job": job, "counts": job.counts(), "failures": {}}
+    if event_list:
+        response = make_response(stream_rows_template('/responses/bulk-update-events-status.html', event_list=event_list,
+                                                 **context))
+    else:
+        response = make_response(render_template('/responses/bulk-updated-rows.html',
+                                                 placed_event_list=placed_events, removed_event_list=removed_events,
+                                                 **context))
+        response.headers['HX-Reswap'] = 'none'  # Only the out of band rows are swapped in
+    return response
+
+
+def get_user_job(job_id):
+    "Return the job ``job_id`` of the current user"
+    get_zino_session()  # Only for logged in users
+    job = current_app.jobs.get(job_id, owner=current_user.username)
+    if job is None:
+        raise NotFound(description=f"No job {job_id}")
+    return job
+
+
+def render_job_progress(job):
+    response = make_response(render_template('/components/popups/jobs/job-progress.html', job=job,
+                                             counts=job.counts(), failures=job.failures()))
+    if job.is_finished:
+        response.headers['HX-Trigger'] = 'footerIsOutdated'
+    return response
 
-    try:
-        common["color"] = color_code_event(event)
-        common["op_state"] = event.op_state
-        common["description"] = event.description
-        common["port"] = event.port
 
-        common["age"] = calculate_event_age_no_seconds(event.opened)
+def sort_events(events_dict, sort_by: EventSort = EventSort.DEFAULT):
+    current_app.logger.debug("SORTING BY %s", sort_by)
+
+    if sort_by == EventSort.DEFAULT:
+        return events_dict
+    return {k: events_dict[k] for k in SortedIndex(sort_by, events_dict)}
 
-        if event.type == Event.Type.PORTSTATE:
-            common["downtime"] = shorten_downtime(event.get_downtime())
-        else:
-            common["downtime"] = ""
-    except Exception:
-        raise
 
-    common.update(vars(event))
+# todo remove all use of helpers from curitz
+def create_table_event(event, expanded=False, selected=False):
+    "Wrap what the events table shows of ``event``, an ``Event`` or its ``TableEvent``, for the row templates"
+    if not isinstance(event, TableEvent):
+        event = TableEvent.from_event(event)
     table_event = {
-        "event": common
+        "event": event
     }
     if expanded:
         table_event["event_attr"], table_event["event_logs"], table_event["event_history"], table_event["event_msgs"] = (
@@ -430,69 +528,85 @@ def create_table_event(event, expanded=False, selected=False):
     return table_event
 
 
-# fixme implementation copied from curitz
-def color_code_event(event):
-    if event.adm_state == AdmState.IGNORED:
-        return EventColor.BLUE
-    elif event.adm_state == AdmState.CLOSED:
-        return EventColor.GREEN
-    elif ((event.type == Event.Type.PORTSTATE and event.port_state in [PortState.DOWN,
-                                                                       PortState.LOWER_LAYER_DOWN])
-          or (event.type == Event.Type.BGP and event.bgp_OS == "down")
-          or (event.type == Event.Type.BFD and event.bfd_state == BFDState.DOWN)
-          or (event.type == Event.Type.REACHABILITY and event.reachability == ReachabilityState.NORESPONSE)
-          or (event.type == Event.Type.ALARM and event.alarm_count > 0)):
-        if event.adm_state == AdmState.OPEN:
-            return EventColor.RED
-        elif event.adm_state in [AdmState.WORKING, AdmState.WAITING]:
-            return EventColor.YELLOW
-    else:
-        return EventColor.DEFAULT
-
-
-def format_dt_event_attrs(event: dict):
-    if event["lasttrans"]:
-        event.update(lasttrans=date_str_without_timezone(event["lasttrans"]))
-
-    if event["opened"]:
-        event.update(opened=date_str_without_timezone(event["opened"]))
-
-    if event["updated"]:
-        event.update(updated=date_str_without_timezone(event["updated"]))
+def format_dt_event_attrs(event: dict, date_format=None):
+    date_format = date_format or get_date_formatter(get_user_timezone())
+    for attr in ("lasttrans", "opened", "updated"):
+        if event[attr]:
+            event[attr] = date_format(event[attr])
 
     return event
 
 
-def format_dt_message_entries(messages: list):
+def format_dt_message_entries(messages: list, date_format=None):
+    # The entries are only rendered, and the formatted dates need no validation
+    date_format = date_format or get_date_formatter(get_user_timezone())
     res = []
     for m in messages:
         if type(m) == LogEntry:
-            res.append(LogEntry(date=date_str_without_timezone(m.date), log=m.log))
+            res.append(LogEntry.model_construct(date=date_format(m.date), log=m.log))
         elif type(m) == HistoryEntry:
-            res.append(HistoryEntry(date=date_str_without_timezone(m.date), log=m.log, user=m.user))
+            res.append(HistoryEntry.model_construct(date=date_format(m.date), log=m.log, user=m.user))
 
     return res
 
 
-def get_event_details(id):
+def fetch_event_details(event_manager, event_id):
+    "Fetch an event along with its log and history from Zino"
     try:
-        event_attr = vars(current_app.event_manager.create_event_from_id(int(id)))
-        format_dt_event_attrs(event_attr)
+        event = event_manager.create_event_from_id(event_id)
     except RetryError as retryErr:  # Intermittent error in Zino
         current_app.logger.exception('RetryError when fetching event details %s', retryErr)
         try:
-            event_attr = vars(current_app.event_manager.create_event_from_id(int(id)))
-            format_dt_event_attrs(event_attr)
+            event = event_manager.create_event_from_id(event_id)
         except RetryError as retryErr:  # Intermittent error in Zino
             current_app.logger.exception('RetryError when fetching event details after retry, %s', retryErr)
             raise
 
-    event_logs = current_app.event_manager.get_log_for_id(int(id))
-    event_history = current_app.event_manager.get_history_for_id(int(id))
+    event_logs = event_manager.get_log_for_id(event_id)
+    event_history = event_manager.get_history_for_id(event_id)
+    return EventDetails(event, event_logs, event_history)
+
+
+def get_cached_event_details(zino_session, event_id):
+    details = zino_session.details.get(event_id)
+    if details is None:
+        version = zino_session.store.event_versions.get(event_id)
+        with zino_session.lock:
+            details = fetch_event_details(zino_session.event_manager, event_id)
+        zino_session.details.set(event_id, version, details)
+    return details
+
+
+def prefetch_event_details(zino_session, event_ids):
+    """Fetch missing details of ``event_ids`` concurrently, over the worker connections of the session"""
+    missing = zino_session.details.missing(event_ids)
+    if len(missing) < 2:  # Not worth it, fetch on demand
+        return
+    versions = {event_id: zino_session.store.event_versions.get(event_id) for event_id in missing}
+    app = current_app._get_current_object()
+
+    def fetch(event_manager, event_id):
+        with app.app_context():
+            return fetch_event_details(event_manager, event_id)
 
-    event_msgs = format_dt_message_entries(event_logs + event_history)
+    for event_id, result in zino_session.workers.map(fetch, missing):
+        if isinstance(result, Exception):  # Will be fetched on demand instead
+            current_app.logger.warning('Could not prefetch details of event #%s: %s', event_id, result)
+            continue
+        zino_session.details.set(event_id, versions[event_id], result)
+    current_app.logger.debug('Prefetched details of %s events with %s', len(missing), zino_session.workers)
 
-    return event_attr, event_logs, event_history, event_msgs
+
+def get_event_details(id):
+    details = get_cached_event_details(get_zino_session(), int(id))
+
+    # History and log are kept on the event itself too, they are not attributes
+    event_attr = {k: v for k, v in vars(details.event).items() if k not in ("history", "log")}
+    date_format = get_date_formatter(get_user_timezone())
+    format_dt_event_attrs(event_attr, date_format)
+    event_msgs = format_dt_message_entries(details.log + details.history, date_format)
+
+    return event_attr, details.log, details.history, event_msgs
 
 
 @main.route('/')
@@ -500,15 +614,32 @@ def get_event_details(id):
 @login_check()
 def index():
     clear_ui_state()
-    return render_template('/views/events.html')
+    return render_template('/views/events.html', event_stream=current_app.howitz_config.get("event_stream", False),
+                           server_time=datetime.now(timezone.utc).timestamp())
 
 
 @main.get('/footer')
 def footer():
+    zino_session = get_zino_session(quiet=True)
+    etag = None
+    if zino_session:
+        etag = get_view_etag(zino_session.store.version_tag())
+        if etag in request.if_none_match:
+            return make_revalidated(Response(status=304), etag)
     info_dict = get_info_dict()
-    return render_template('/components/footer/footer-info.html',
-                           refresh_interval=current_app.howitz_config["refresh_interval"],
-                           **info_dict)
+    response = make_response(render_template('/components/footer/footer-info.html',
+                                             refresh_interval=current_app.howitz_config["refresh_interval"],
+                                             **info_dict))
+    return make_revalidated(response, etag) if etag else response
+
+
+@main.get('/stats')
+def stats():
+    "Numbers of events, in total and per value of some attributes, as JSON"
+    store = get_zino_session().store
+    version, counts = store.stats()
+    response = jsonify(version=version, **counts)
+    return make_revalidated(response, store.version_tag(version))
 
 
 @main.route('/login')
@@ -516,7 +647,8 @@ def login():
     with current_app.app_context():
         current_app.logger.debug('current user is authenticated %s', current_user.is_authenticated)
         try:
-            if current_user.is_authenticated and current_app.event_manager.is_authenticated:
+            zino_session = get_zino_session(quiet=True)
+            if zino_session is not None and zino_session.is_authenticated:
                 default_url = url_for('main.index')
                 return redirect(default_url)
         except Exception:
@@ -559,41 +691,77 @@ def auth():
 
 @main.route('/get_events')
 def get_events():
+    zino_session = get_zino_session()
+    store = zino_session.store
+    # While the update handler keeps the events current, a client that shows the current events
+    # need not have them fetched from Zino and rendered again. Time changes volatile views
+    is_current = (store.is_loaded and not zino_session.is_loading
+                  and zino_session.pump is not None and zino_session.pump.is_alive()
+                  and not get_sort_by().is_volatile and not get_event_filter().is_volatile)
+    etag = get_view_etag(store.version_tag())
+    if is_current and etag in request.if_none_match:
+        session["events_last_refreshed"] = datetime.now(timezone.utc)
+        return make_revalidated(Response(status=304), etag)
+
     table_events = get_current_events()
 
-    return render_template('responses/get-events-table.html', event_list=table_events, refresh_interval=current_app.howitz_config["refresh_interval"])
+    response = make_response(stream_rows_template('responses/get-events-table.html', event_list=table_events,
+                                             refresh_interval=current_app.howitz_config["refresh_interval"]))
+    return make_revalidated(response, get_view_etag(g.events_version))
+
+
+@main.route('/events/stream')
+def stream_events():
+    if not current_app.howitz_config.get("event_stream", False):
+        raise NotFound(description="Event stream is turned off")
+    zino_session = get_zino_session()
+    stream = event_stream(zino_session.store, is_alive=lambda: zino_session.is_authenticated)
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Do not let a proxy buffer the stream
+    return response
 
 
 @main.route('/refresh_events')
 def refresh_events():
-    removed_events, modified_events, added_events, event_list = refresh_current_events()
+    zino_session = get_zino_session()
+    check_update_pump(zino_session)
+    if is_view_current(zino_session.store, get_sort_by(), get_event_filter()):
+        return Response(status=204)  # Nothing to swap
+
+    removed_events, placed_events, event_list = refresh_current_events()
 
     if event_list:
-        response = make_response(render_template('/components/table/event-rows.html', event_list=event_list))
+        response = make_response(stream_rows_template('/responses/refreshed-events-table.html', event_list=event_list))
         response.headers['HX-Reswap'] = 'innerHTML'
         response.headers['HX-Trigger'] = 'footerIsOutdated'
         return response
     else:
-        return render_template('/responses/updated-rows.html', modified_event_list=modified_events,
-                           removed_event_list=removed_events, added_event_list=added_events)
+        return render_template('/responses/updated-rows.html', placed_event_list=placed_events,
+                               removed_event_list=removed_events)
+
+
+@main.route('/events/more')
+def get_more_events():
+    event_list = load_more_events()
+    return stream_rows_template('/responses/more-events.html', event_list=event_list)
 
 
 @main.route('/test_connection')
 def test_conn():
     is_connection_ok = test_zino_connection()
     caller_id = request.headers.get('HX-Target', None)
-    if not is_connection_ok:
+    if is_connection_ok is None and get_zino_session(quiet=True) is None:
+        try:  # Session was evicted from the pool, get a new one
+            reconnect_to_zino()
+            is_connection_ok = True
+        except Exception as e:
+            current_app.logger.warning('Could not reconnect to Zino: %s', e)
+    if is_connection_ok is False:
         current_app.logger.debug('Connection test failed showing error appbar')
-        if is_connection_ok is None:  # Uncertain connection state
-            try:  # Attempt a quiet reconnect
-                reconnect_to_zino()
-            except:
-                pass
         return render_template('components/feedback/connection-status-bar/error-appbar-content.html',
                                error_message="Connection to Zino server is lost")
 
-    if caller_id == 'connection-error-content':  # If connection should be restored after error
-        reconnect_to_zino()
     current_app.logger.debug('Connection test OK, caller ID %s', caller_id)
     return render_template('components/feedback/connection-status-bar/success-appbar-content.html')
 
@@ -601,19 +769,11 @@ def test_conn():
 @main.route('/events/<event_id>/expand_row', methods=["GET"])
 def expand_event_row(event_id):
     event_id = int(event_id)
+    zino_session = get_zino_session()
     selected_events = session.get("selected_events", {})
 
     event_attr, event_logs, event_history, event_msgs = get_event_details(event_id)
-    try:
-        eventobj = current_app.event_manager.create_event_from_id(event_id)
-    except RetryError as retryErr:  # Intermittent error in Zino
-        current_app.logger.exception('RetryError on row expand %s', retryErr)
-        try:
-            eventobj = current_app.event_manager.create_event_from_id(event_id)
-        except RetryError as retryErr:  # Intermittent error in Zino
-            current_app.logger.exception('RetryError on row expand after retry, %s', retryErr)
-            raise
-    event = create_table_event(eventobj)["event"]
+    event = create_table_event(get_cached_event_details(zino_session, event_id).event)["event"]
 
     session["expanded_events"][str(event_id)] = ""
     session.modified = True
@@ -628,17 +788,22 @@ def expand_event_row(event_id):
 @main.route('/events/<event_id>/collapse_row', methods=["GET"])
 def collapse_event_row(event_id):
     event_id = int(event_id)
+    zino_session = get_zino_session()
     selected_events = session.get("selected_events", {})
 
-    try:
-        eventobj = current_app.event_manager.create_event_from_id(event_id)
-    except RetryError as retryErr:  # Intermittent error in Zino
-        current_app.logger.exception('RetryError on row collapse %s', retryErr)
-        try:
-            eventobj = current_app.event_manager.create_event_from_id(event_id)
-        except RetryError as retryErr:  # Intermittent error in Zino
-            current_app.logger.exception('RetryError on row collapse %s', retryErr)
-            raise
+    # The update pump keeps the store current, Zino is only asked for events that are not in it
+    eventobj = zino_session.store.events.get(event_id)
+    if eventobj is None:
+        with zino_session.lock:
+            try:
+                eventobj = zino_session.event_manager.create_event_from_id(event_id)
+            except RetryError as retryErr:  # Intermittent error in Zino
+                current_app.logger.exception('RetryError on row collapse %s', retryErr)
+                try:
+                    eventobj = zino_session.event_manager.create_event_from_id(event_id)
+                except RetryError as retryErr:  # Intermittent error in Zino
+                    current_app.logger.exception('RetryError on row collapse %s', retryErr)
+                    raise
     event = create_table_event(eventobj)["event"]
 
     session["expanded_events"].pop(str(event_id), None)
@@ -652,7 +817,9 @@ def collapse_event_row(event_id):
 @main.route('/event/<event_id>/update_status', methods=['GET', 'POST'])
 def update_event_status(event_id):
     event_id = int(event_id)
-    event = current_app.event_manager.create_event_from_id(int(event_id))
+    zino_session = get_zino_session()
+    with zino_session.lock:
+        event = zino_session.event_manager.create_event_from_id(int(event_id))
     current_state = event.adm_state
 
     if request.method == 'POST':
@@ -661,18 +828,20 @@ def update_event_status(event_id):
         new_state = request.form['event-state']
         new_history = request.form['event-history']
 
-        try:
-            if not current_state == new_state:
-                set_state_res = current_app.event_manager.change_admin_state_for_id(event_id, AdmState(new_state))
-        except EventClosedError as closedErr:
-            current_app.logger.exception('EventClosedError %s', closedErr)
-            raise BadRequest(description=closedErr.args[0]) from closedErr
+        with zino_session.lock:
+            try:
+                if not current_state == new_state:
+                    set_state_res = zino_session.event_manager.change_admin_state_for_id(event_id, AdmState(new_state))
+            except EventClosedError as closedErr:
+                current_app.logger.exception('EventClosedError %s', closedErr)
+                raise BadRequest(description=closedErr.args[0]) from closedErr
 
-        if new_history:
-            add_history_res = current_app.event_manager.add_history_entry_for_id(event_id, new_history)
+            if new_history:
+                add_history_res = zino_session.event_manager.add_history_entry_for_id(event_id, new_history)
 
-        event_attr, event_logs, event_history, event_msgs = get_event_details(event_id)
-        event = create_table_event(current_app.event_manager.create_event_from_id(event_id))["event"]
+            zino_session.details.invalidate(event_id)
+            event_attr, event_logs, event_history, event_msgs = get_event_details(event_id)
+            event = create_table_event(get_cached_event_details(zino_session, event_id).event)["event"]
 
         return render_template('/responses/update-event-response.html', event=event, id=event_id, event_attr=event_attr,
                                event_logs=event_logs,
@@ -686,35 +855,12 @@ def update_event_status(event_id):
 
 @main.route('/event/bulk_update_status', methods=['POST'])
 def bulk_update_events_status():
-    selected_events = session.get("selected_events", {})
-    expanded_events = session.get("expanded_events", {})
-    current_app.logger.debug('SELECTED EVENTS %s', selected_events)
-    current_app.logger.debug('EXPANDED EVENTS %s', expanded_events)
-
     # Get new values from the requests
     new_state = request.form['event-state']
     new_history = request.form['event-history']
 
-    # Update each selected event with new values
-    for event_id in selected_events:
-        try:
-            if new_state:
-                set_state_res = current_app.event_manager.change_admin_state_for_id(int(event_id), AdmState(new_state))
-        except EventClosedError as closedErr:
-            current_app.logger.exception('EventClosedError %s', closedErr)
-            raise BadRequest(description=closedErr.args[0]) from closedErr
-
-        if new_history:
-            add_history_res = current_app.event_manager.add_history_entry_for_id(int(event_id), new_history)
-
-    # Clear selected events
-    session["selected_events"] = {}
-    session.modified = True  # Necessary when modifying arrays/dicts/etc in flask session
-    current_app.logger.debug("SELECTED EVENTS %s", session["selected_events"])
-
-    # Rerender whole events table
-    event_list = get_current_events()
-    return render_template('/responses/bulk-update-events-status.html', event_list=event_list)
+    return submit_bulk_job('Updating status', bulk.update_status,
+                           state=AdmState(new_state) if new_state else None, history=new_history)
 
 
 @main.route('/show_update_status_modal', methods=['GET'])
@@ -724,14 +870,18 @@ def show_update_events_status_modal():
 
 @main.route('/event/<i>/poll', methods=["POST"])
 def poll(i):
+    zino_session = get_zino_session()
     selected_events = session.get("selected_events", {})
     event_id = int(i)
 
-    poll_res = current_app.event_manager.poll(event_id)
+    with zino_session.lock:
+        poll_res = zino_session.event_manager.poll(event_id)
 
     if poll_res:
-        event_attr, event_logs, event_history, event_msgs = get_event_details(event_id)
-        event = create_table_event(current_app.event_manager.create_event_from_id(event_id))["event"]
+        with zino_session.lock:
+            zino_session.details.invalidate(event_id)
+            event_attr, event_logs, event_history, event_msgs = get_event_details(event_id)
+            event = create_table_event(get_cached_event_details(zino_session, event_id).event)["event"]
 
         return render_template('/responses/update-event-response.html', event=event, id=event_id, event_attr=event_attr,
                                event_logs=event_logs,
@@ -743,26 +893,7 @@ def poll(i):
 
 @main.route('/event/bulk_poll', methods=['POST'])
 def bulk_poll():
-    selected_events = session.get("selected_events", {})
-    expanded_events = session.get("expanded_events", {})
-    current_app.logger.debug('SELECTED EVENTS %s', selected_events)
-    current_app.logger.debug('EXPANDED EVENTS %s', expanded_events)
-
-    # Update each selected event with new values
-    for event_id in selected_events:
-        poll_res = current_app.event_manager.poll(int(event_id))
-
-        if not poll_res:
-            raise InternalServerError(description=f"Unexpected error when polling event #{event_id}")
-
-    # Clear selected events
-    session["selected_events"] = {}
-    session.modified = True  # Necessary when modifying arrays/dicts/etc in flask session
-    current_app.logger.debug("SELECTED EVENTS %s", session["selected_events"])
-
-    # Rerender whole events table
-    event_list = get_current_events()
-    return render_template('/responses/bulk-update-events-status.html', event_list=event_list)
+    return submit_bulk_job('Polling', bulk.poll)
 
 
 @main.route('/event/<event_id>/unselect', methods=["POST"])
@@ -803,38 +934,23 @@ def select_event(event_id):
 
 @main.route('/event/bulk_clear_flapping', methods=['POST'])
 def bulk_clear_flapping():
-    selected_events = session.get("selected_events", {})
-    expanded_events = session.get("expanded_events", {})
-    current_app.logger.debug('SELECTED EVENTS %s', selected_events)
-    current_app.logger.debug('EXPANDED EVENTS %s', expanded_events)
-
-    # Update each selected event with new values
-    for event_id in selected_events:
-        flapping_res = current_app.event_manager.clear_flapping(int(event_id))
-
-        if not flapping_res:
-            raise MethodNotAllowed(description='Cant clear flapping on a non-port event.')
-
-    # Clear selected events
-    session["selected_events"] = {}
-    session.modified = True  # Necessary when modifying arrays/dicts/etc in flask session
-    current_app.logger.debug("SELECTED EVENTS %s", session["selected_events"])
-
-    # Rerender whole events table
-    event_list = get_current_events()
-    return render_template('/responses/bulk-update-events-status.html', event_list=event_list)
+    return submit_bulk_job('Clearing flapping', bulk.clear_flapping)
 
 
 @main.route('/event/<i>/clear-flapping', methods=["POST"])
 def clear_flapping(i):
+    zino_session = get_zino_session()
     selected_events = session.get("selected_events", {})
     event_id = int(i)
 
-    flapping_res = current_app.event_manager.clear_flapping(event_id)
+    with zino_session.lock:
+        flapping_res = zino_session.event_manager.clear_flapping(event_id)
 
     if flapping_res:
-        event_attr, event_logs, event_history, event_msgs = get_event_details(event_id)
-        event = create_table_event(current_app.event_manager.create_event_from_id(event_id))["event"]
+        with zino_session.lock:
+            zino_session.details.invalidate(event_id)
+            event_attr, event_logs, event_history, event_msgs = get_event_details(event_id)
+            event = create_table_event(get_cached_event_details(zino_session, event_id).event)["event"]
 
         return render_template('/responses/update-event-response.html', event=event, id=event_id, event_attr=event_attr,
                                event_logs=event_logs,
@@ -844,6 +960,19 @@ def clear_flapping(i):
         raise MethodNotAllowed(description='Cant clear flapping on a non-port event.')
 
 
+@main.route('/jobs/<job_id>', methods=['GET'])
+def get_job_progress(job_id):
+    return render_job_progress(get_user_job(job_id))
+
+
+@main.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = get_user_job(job_id)
+    job.cancel()
+    current_app.logger.info('Cancelled %s', job)
+    return render_job_progress(job)
+
+
 @main.route('/events/table/change_sort_by', methods=['GET', 'POST'])
 def change_events_order():
     if request.method == 'POST':
@@ -853,26 +982,83 @@ def change_events_order():
         session.modified = True
 
         # Rerender whole events table
-        events = current_app.cache.get("events")
-        if events:
-            table_events = get_sorted_table_event_list(events)
+        zino_session = get_zino_session()
+        if zino_session.store.is_loaded:
+            table_events = get_sorted_table_event_list(zino_session.store)
         else:
             table_events = get_current_events()
 
-        response = make_response(render_template('/responses/resort-events.html', event_list=table_events))
+        response = make_response(stream_rows_template('/responses/resort-events.html', event_list=table_events))
         response.headers['HX-Trigger'] = 'footerIsOutdated'
         return response
 
     elif request.method == 'GET':
         return render_template(
             '/components/popups/modals/forms/sort-table-form.html', sort_methods=EventSort,
-            current_sort=EventSort(session.get("sort_by") or "raw")
+            current_sort=get_sort_by()
+        )
+
+
+@main.route('/events/table/filter', methods=['GET', 'POST'])
+def change_events_filter():
+    if request.method == 'POST':
+        if 'clear' in request.form:
+            event_filter = EventFilter()
+        else:
+            try:
+                event_filter = EventFilter.from_dict(request.form)
+            except ValueError as e:
+                raise BadRequest(description=str(e))
+        session["event_filter"] = event_filter.to_dict()
+        session.modified = True
+
+        # Rerender whole events table
+        zino_session = get_zino_session()
+        if zino_session.store.is_loaded:
+            table_events = get_sorted_table_event_list(zino_session.store)
+        else:
+            table_events = get_current_events()
+
+        response = make_response(stream_rows_template('/responses/filter-events.html', event_list=table_events))
+        response.headers['HX-Trigger'] = 'footerIsOutdated'
+        return response
+
+    elif request.method == 'GET':
+        filter_index = get_zino_session().store.filter_index
+        return render_template(
+            '/components/popups/modals/forms/filter-table-form.html',
+            event_filter=get_event_filter(),
+            adm_states=[str(adm_state) for adm_state in AdmState],
+            event_types=[str(event_type) for event_type in Event.Type],
+            priorities=PRIORITY_NAMES,
+            routers=filter_index.values("router"),
+            op_states=filter_index.values("op_state"),
         )
 
 
 @main.route('/navbar/show-user-menu', methods=["GET"])
 def show_user_menu():
-    return render_template('/responses/show-user-menu.html')
+    return render_template('/responses/show-user-menu.html', timezones=get_timezone_names(),
+                           default_timezone=current_app.howitz_config["timezone"])
+
+
+@main.route('/navbar/user-timezone', methods=["POST"])
+def change_user_timezone():
+    get_zino_session()  # Only for logged in users
+    tz = request.form.get("timezone", "").strip()
+    if tz and not is_valid_timezone(tz):
+        raise BadRequest(description=f"Unknown timezone {tz!r}")
+    user = current_app.database.get(current_user.username)
+    user.timezone = tz
+    current_app.database.update(user)
+    current_user.timezone = tz
+    current_app.logger.debug('Timezone of %s -> %r', current_user.username, tz)
+
+    session["events_last_refreshed"] = None  # Render dates in the new timezone
+    session.modified = True
+    response = make_response(show_user_menu())
+    response.headers['HX-Trigger'] = 'footerIsOutdated'
+    return response
 
 
 @main.route('/navbar/hide-user-menu', methods=["GET"])
@@ -887,7 +1073,7 @@ def show_minimized_error_alert(alert_id):
 
 @main.route('/alert/<alert_id>/show-maximized-error', methods=["GET"])
 def show_maximized_error_alert(alert_id):
-    err_description = session["errors"][alert_id]
+    err_description = session.get("errors", {}).get(alert_id, "Details of this error are no longer available")
 
     return render_template('/responses/expand-error-alert.html', alert_id=alert_id, err_description=err_description)
 
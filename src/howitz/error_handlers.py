@@ -1,11 +1,16 @@
 import uuid
 
-from flask import render_template, session, current_app, make_response, request
+from flask import render_template, current_app, make_response, request
 from flask_login import current_user
 from werkzeug.exceptions import HTTPException, BadGateway
 
 from howitz.endpoints import reconnect_to_zino, test_zino_connection
-from howitz.utils import serialize_exception
+from howitz.utils import get_zino_session, serialize_exception, store_error_description
+
+
+def store_error(alert_id, e):
+    "Keep the traceback of ``e`` for the error alert"
+    store_error_description(alert_id, serialize_exception(e))
 
 
 def handle_generic_http_exception(e):
@@ -14,10 +19,7 @@ def handle_generic_http_exception(e):
     alert_random_id = str(uuid.uuid4())
     short_err_msg = f"{e.code} {e.name}: {e.description}"
 
-    if not "errors" in session:
-        session["errors"] = dict()
-    session["errors"][str(alert_random_id)] = serialize_exception(e)
-    session.modified = True
+    store_error(alert_random_id, e)
 
     response = make_response(render_template('/components/popups/alerts/error/error-alert.html',
                            alert_id=alert_random_id, short_err_msg=short_err_msg))
@@ -39,10 +41,7 @@ def handle_generic_exception(e):
     except IndexError:
         short_err_msg = 'An unexpected error has occurred'
 
-    if not "errors" in session:
-        session["errors"] = dict()
-    session["errors"][str(alert_random_id)] = serialize_exception(e)
-    session.modified = True
+    store_error(alert_random_id, e)
     current_app.logger.exception('Exception in %s: %s:', request.path, e)
 
     response = make_response(render_template('/components/popups/alerts/error/error-alert.html',
@@ -79,6 +78,15 @@ def handle_403(e):
     return response, 403
 
 
+def handle_login_busy(e):
+    current_app.logger.warning("Too busy to log in: %s", e)
+
+    response = make_response(render_template('/responses/503-busy.html', err_msg=e.description))
+    response.headers.update(e.get_headers())
+
+    return response, 503
+
+
 def handle_bad_gateway(e):
     current_app.logger.exception("502 Bad Gateway has occurred %s", e)
     description = BadGateway.description
@@ -106,23 +114,23 @@ def handle_lost_connection(e):
         except IndexError:
             short_err_msg = 'Lost connection to Zino server'
 
-        if not "errors" in session:
-            session["errors"] = dict()
-        session["errors"][str(alert_random_id)] = serialize_exception(e)
-        session.modified = True
+        store_error(alert_random_id, e)
 
-        # Check if connection is still down
-        should_attempt_reconnect = test_zino_connection()
-        if should_attempt_reconnect is not False:  # Both True or None options are acceptable
-            reconnect_to_zino()  # Ensure a clean reconnect to Zino server and re-populate the events data
+        zino_session = get_zino_session(quiet=True)
+        if zino_session is None or zino_session.health is None:  # Session was evicted from the pool
+            reconnect_to_zino()
             short_err_msg = 'Temporarily lost connection to Zino server, please retry your action'
+        else:
+            # The health monitor of the session reconnects if the connection is down, have it check now
+            zino_session.health.check_soon()
+            if test_zino_connection() is not False:
+                short_err_msg = 'Temporarily lost connection to Zino server, please retry your action'
 
         response = make_response(render_template('/components/popups/alerts/error/error-alert.html',
                                                  alert_id=alert_random_id, short_err_msg=short_err_msg))
         response.headers['HX-Reswap'] = 'beforeend'
         return response, 503
     else:  # Redirect to /login for complete re-authentication
-        current_app.event_manager.disconnect()
         res = make_response()
         res.headers['HX-Redirect'] = '/login'
         return res, 401
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from zinolib.event_types import Event
+
+from .sorting import get_priority
+from .table import color_code_event
+
+
+__all__ = [
+    "EventCounters",
+]
+
+
+def _color(event: Event):
+    return str(color_code_event(event) or "default")
+
+
+class EventCounters:
+    """Number of events, in total and per value of some of their attributes
+
+    Like ``FilterIndex`` the counters are kept up to date as events change,
+    so that the counts are known without going through the events.
+    """
+    FIELDS = {
+        "adm_state": lambda event: str(event.adm_state),
+        "type": lambda event: str(event.type),
+        "color": _color,
+        "priority": get_priority,
+        "router": lambda event: event.router,
+    }
+
+    def __init__(self, events: dict = None):
+        self.rebuild(events or {})
+
+    def __len__(self):
+        return len(self._values)
+
+    def rebuild(self, events: dict):
+        self._counters = {field: Counter() for field in self.FIELDS}
+        self._values = {}  # event id -> values of the event, in the order of FIELDS
+        for event in events.values():
+            self.set(event)
+
+    def set(self, event: Event):
+        self.remove(event.id)
+        values = tuple(get_value(event) for get_value in self.FIELDS.values())
+        self._values[event.id] = values
+        for field, value in zip(self.FIELDS, values):
+            self._counters[field][value] += 1
+
+    def remove(self, event_id: int):
+        values = self._values.pop(event_id, None)
+        if values is None:
+            return
+        for field, value in zip(self.FIELDS, values):
+            counter = self._counters[field]
+            counter[value] -= 1
+            if not counter[value]:
+                del counter[value]
+
+    def counts(self, field: str):
+        "Number of events per value of ``field``, most common value first"
+        return dict(self._counters[field].most_common())
+
+    def as_dict(self):
+        return {"total": len(self), **{field: self.counts(field) for field in self.FIELDS}}
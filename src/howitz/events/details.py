@@ -0,0 +1,76 @@
+import threading
+from typing import NamedTuple
+
+from zinolib.event_types import Event
+
+
+__all__ = [
+    "DetailsCache",
+    "EventDetails",
+]
+
+
+class EventDetails(NamedTuple):
+    event: Event
+    log: list
+    history: list
+
+    @classmethod
+    def from_updated_event(cls, event: Event):
+        "Details of an event refreshed by the update handler, which fetches log and history too"
+        return cls(event, event.log, event.history)
+
+
+class DetailsCache:
+    """Details of events, as shown in expanded rows
+
+    An entry is tied to the version the event had in ``store`` when the
+    details were fetched. An update notification for an event changes its
+    version, which invalidates the entry.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._details = {}  # event id -> (event version, details)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._details)
+
+    def __contains__(self, event_id):
+        return self._get(event_id) is not None
+
+    def _get(self, event_id):
+        with self._lock:
+            version, details = self._details.get(event_id, (None, None))
+            if details is None:
+                return None
+            if version != self.store.event_versions.get(event_id):
+                del self._details[event_id]
+                return None
+            return details
+
+    def get(self, event_id: int):
+        details = self._get(event_id)
+        if details is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return details
+
+    def set(self, event_id: int, version: int, details: EventDetails):
+        "Cache ``details`` fetched when the event had ``version``"
+        if version is None:  # Not in the store, there will be no notification when it changes
+            return
+        with self._lock:
+            self._details[event_id] = (version, details)
+
+    def invalidate(self, event_id: int):
+        with self._lock:
+            self._details.pop(event_id, None)
+
+    def missing(self, event_ids):
+        "Return the ids among ``event_ids`` that have no valid entry"
+        return [event_id for event_id in event_ids if event_id not in self]
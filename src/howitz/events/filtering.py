@@ -0,0 +1,213 @@
+import functools
+import hashlib
+import re
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+from zinolib.event_types import Event
+
+from .sorting import get_priority
+
+
+__all__ = [
+    "EventFilter",
+    "FilterIndex",
+    "PRIORITY_NAMES",
+]
+
+
+PRIORITY_NAMES = {
+    4: "Down and open",
+    3: "Being worked on",
+    2: "Other",
+    1: "Ignored",
+    0: "Closed",
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(pattern: str):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _op_state(event: Event):
+    "Op-state without the padding used to align it in the table"
+    return ' '.join(str(event.op_state).split())
+
+
+def _age_minutes(event: Event, now: datetime):
+    return (now - event.opened) / timedelta(minutes=1)
+
+
+class EventFilter(NamedTuple):
+    """Which events to show in the events table
+
+    An event is shown if it matches every criterion that is set. Criteria
+    that are sets match if the attribute of the event is among the values
+    in the set. ``port`` is a regular expression searched for in the port,
+    ``description`` a text to look for in the description, both ignoring
+    case. Ages are in minutes.
+    """
+    adm_states: frozenset = frozenset()
+    op_states: frozenset = frozenset()
+    types: frozenset = frozenset()
+    routers: frozenset = frozenset()
+    priorities: frozenset = frozenset()
+    port: str = ""
+    description: str = ""
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+
+    def __bool__(self):
+        return any(value not in (None, "", frozenset()) for value in self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Make a filter from a dict or a form, as made by ``to_dict()``
+
+        Raises ValueError on invalid values.
+        """
+        getlist = getattr(data, "getlist", None) or (lambda key: data.get(key) or [])
+
+        def get_int(key):
+            value = data.get(key)
+            if value in (None, ""):
+                return None
+            value = int(value)
+            if value < 0:
+                raise ValueError(f'{key} must not be negative')
+            return value
+
+        port = (data.get("port") or "").strip()
+        if port:
+            try:
+                _compile(port)
+            except re.error as e:
+                raise ValueError(f'Invalid port pattern "{port}": {e}') from e
+        return cls(
+            adm_states=frozenset(getlist("adm_states")),
+            op_states=frozenset(getlist("op_states")),
+            types=frozenset(getlist("types")),
+            routers=frozenset(getlist("routers")),
+            priorities=frozenset(int(priority) for priority in getlist("priorities")),
+            port=port,
+            description=(data.get("description") or "").strip(),
+            min_age=get_int("min_age"),
+            max_age=get_int("max_age"),
+        )
+
+    @property
+    def tag(self):
+        "Short string that differs between filters, empty for the empty filter"
+        if not self:
+            return ""
+        return hashlib.blake2s(repr(self.to_dict()).encode(), digest_size=4).hexdigest()
+
+    def to_dict(self):
+        return {key: sorted(value) if isinstance(value, frozenset) else value
+                for key, value in self._asdict().items()}
+
+    @property
+    def indexed(self):
+        "The criteria that can be looked up in a ``FilterIndex``, as (field, values) tuples"
+        criteria = [
+            ("adm_state", self.adm_states),
+            ("op_state", self.op_states),
+            ("type", self.types),
+            ("router", self.routers),
+            ("priority", self.priorities),
+        ]
+        return [(field, values) for field, values in criteria if values]
+
+    @property
+    def has_unindexed(self):
+        return bool(self.port or self.description or self.min_age is not None or self.max_age is not None)
+
+    @property
+    def is_volatile(self):
+        "Whether which events match changes with time, not only when events change"
+        return self.min_age is not None or self.max_age is not None
+
+    def matches_unindexed(self, event: Event, now: datetime):
+        "Whether ``event`` matches the criteria that are not in a ``FilterIndex``"
+        if self.port and not _compile(self.port).search(str(event.port or "")):
+            return False
+        if self.description and self.description.lower() not in str(event.description or "").lower():
+            return False
+        if self.min_age is not None or self.max_age is not None:
+            age = _age_minutes(event, now)
+            if self.min_age is not None and age < self.min_age:
+                return False
+            if self.max_age is not None and age > self.max_age:
+                return False
+        return True
+
+    def matches(self, event: Event, now: datetime = None):
+        now = now or datetime.now(timezone.utc)
+        for field, values in self.indexed:
+            if FilterIndex.FIELDS[field](event) not in values:
+                return False
+        return self.matches_unindexed(event, now)
+
+
+class FilterIndex:
+    """Ids of events by router, states, type and priority
+
+    The index is kept up to date as events change, so that the events
+    matching an ``EventFilter`` are found by looking up the events with the
+    wanted values instead of checking every event.
+    """
+    FIELDS = {
+        "adm_state": lambda event: str(event.adm_state),
+        "op_state": _op_state,
+        "type": lambda event: str(event.type),
+        "router": lambda event: event.router,
+        "priority": get_priority,
+    }
+
+    def __init__(self, events: dict = None):
+        self.rebuild(events or {})
+
+    def rebuild(self, events: dict):
+        self._index = {field: {} for field in self.FIELDS}
+        self._values = {}  # event id -> values of the event, in the order of FIELDS
+        for event in events.values():
+            self.set(event)
+
+    def set(self, event: Event):
+        self.remove(event.id)
+        values = tuple(get_value(event) for get_value in self.FIELDS.values())
+        self._values[event.id] = values
+        for field, value in zip(self.FIELDS, values):
+            self._index[field].setdefault(value, set()).add(event.id)
+
+    def remove(self, event_id: int):
+        values = self._values.pop(event_id, None)
+        if values is None:
+            return
+        for field, value in zip(self.FIELDS, values):
+            ids = self._index[field][value]
+            ids.discard(event_id)
+            if not ids:
+                del self._index[field][value]
+
+    def values(self, field: str):
+        "The values of ``field`` among the indexed events"
+        return sorted(self._index[field])
+
+    def select(self, event_filter: EventFilter, events: dict):
+        "Return the set of ids of ``events`` that match ``event_filter``"
+        candidates = None
+        # Intersect starting with the smallest set of ids
+        lookups = [
+            set().union(*(self._index[field].get(value, ()) for value in values))
+            for field, values in event_filter.indexed
+        ]
+        for ids in sorted(lookups, key=len):
+            candidates = ids if candidates is None else candidates & ids
+        if candidates is None:
+            candidates = set(events)
+        if event_filter.has_unindexed:
+            now = datetime.now(timezone.utc)
+            candidates = {i for i in candidates if event_filter.matches_unindexed(events[i], now)}
+        return candidates
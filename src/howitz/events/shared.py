@@ -0,0 +1,257 @@
+import fcntl
+import hashlib
+import logging
+import os
+import pickle
+import struct
+import tempfile
+import threading
+
+
+__all__ = [
+    "JournalFollower",
+    "JournalWriter",
+    "SharedEvents",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+_FRAME_HEADER = struct.Struct(">I")
+
+
+def _frame(record):
+    data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    return _FRAME_HEADER.pack(len(data)) + data
+
+
+class SharedEvents:
+    """Share the events of a Zino session between the worker processes of a server
+
+    Of all processes with a Zino session for the same user and server, only
+    one, the publisher, runs an update handler. It writes the events of its
+    store to a journal file: a snapshot of all events followed by the
+    changes since, see ``JournalWriter``. The other processes follow the
+    journal into their own stores instead of talking to the update handler
+    of Zino, see ``JournalFollower``. A follower takes over when the
+    publisher goes away.
+
+    Who publishes is decided with an exclusive lock on a file next to the
+    journal, held for as long as the process publishes.
+
+    The journal holds pickled events, ``directory`` must only be writable
+    by the user running Howitz.
+    """
+
+    def __init__(self, directory: str, key: str):
+        self.directory = directory
+        name = hashlib.blake2s(key.encode(), digest_size=8).hexdigest()
+        self.path = os.path.join(directory, f"{name}.journal")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self._lock_file = None
+
+    def __str__(self):
+        return f'SharedEvents(path={self.path}, publisher={self.is_publisher})'
+
+    @property
+    def is_publisher(self):
+        return self._lock_file is not None
+
+    def acquire(self):
+        "Try to become the publisher, return whether this process is the publisher"
+        if self._lock_file is not None:
+            return True
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        lock_file = open(self.lock_path, "a+b")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info('Publishing events to %s', self.path)
+        return True
+
+    def release(self):
+        lock_file, self._lock_file = self._lock_file, None
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def write_snapshot(self, events: dict):
+        "Replace the journal with a snapshot of ``events``, readers notice and start over"
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".journal-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_frame(("snapshot", events)))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def append(self, records):
+        with open(self.path, "ab") as f:
+            f.write(b"".join(_frame(record) for record in records))
+
+
+class JournalWriter(threading.Thread):
+    """Write the changes to an event store to the journal of ``shared``
+
+    A new snapshot is written when the store is loaded from scratch, when
+    the change log of the store no longer reaches back far enough, and after
+    ``compact_after`` changes so that the journal stays small.
+    """
+    interval = 1.0
+    compact_after = 10000
+
+    def __init__(self, shared: SharedEvents, store):
+        super().__init__(name="howitz-journal-writer", daemon=True)
+        self.shared = shared
+        self.store = store
+        self.error = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        version = None
+        appended = 0
+        try:
+            while not self._stopped.is_set():
+                if version is not None and self.store.wait_for_change(version, self.interval) == version:
+                    continue
+                records = None
+                with self.store.lock:
+                    changes = None if version is None else self.store.changes_since(version)
+                    if changes is not None and appended < self.compact_after:
+                        records = [("set", self.store.events[i]) for i in changes.added + changes.modified]
+                        records += [("remove", i) for i in changes.removed]
+                    elif self.store.is_loaded:
+                        events = dict(self.store.events)
+                    else:  # Nothing worth sharing yet
+                        self._stopped.wait(self.interval)
+                        continue
+                    version = self.store.version
+                if records is None:
+                    self.shared.write_snapshot(events)
+                    appended = 0
+                elif records:
+                    self.shared.append(records)
+                    appended += len(records)
+        except Exception as e:
+            logger.exception('Writing %s failed: %s', self.shared, e)
+            self.error = e
+
+
+class JournalFollower(threading.Thread):
+    """Apply the journal of ``shared`` to an event store, instead of running an update handler
+
+    Every ``takeover_interval`` seconds the follower tries to become the
+    publisher. If it does, it stops and calls ``on_promoted()``.
+
+    Acts like an ``UpdatePump``: it is alive while it keeps the store up to
+    date, ``error`` tells why it stopped otherwise.
+    """
+    interval = 0.25
+    takeover_interval = 2.0
+
+    def __init__(self, shared: SharedEvents, store, on_promoted=None):
+        super().__init__(name="howitz-journal-follower", daemon=True)
+        self.shared = shared
+        self.store = store
+        self.on_promoted = on_promoted
+        self.error = None
+        self._file = None
+        self._buffer = b""
+        self._stopped = threading.Event()
+
+    @property
+    def is_stopped(self):
+        return self._stopped.is_set()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        logger.debug("Following %s", self.shared)
+        takeover_wait = 0.0
+        try:
+            while not self.is_stopped:
+                if not self.follow():
+                    self._stopped.wait(self.interval)
+                    takeover_wait += self.interval
+                if takeover_wait >= self.takeover_interval:
+                    takeover_wait = 0.0
+                    if self.shared.acquire():
+                        self.follow()  # Catch up on what the old publisher wrote
+                        break
+        except Exception as e:
+            if not self.is_stopped:
+                logger.exception("Following %s stopped by error: %s", self.shared, e)
+                self.error = e
+            return
+        finally:
+            self._close()
+        logger.debug("Stopped following %s", self.shared)
+        if self.shared.is_publisher and not self.is_stopped:
+            logger.info("Took over publishing of %s", self.shared)
+            if self.on_promoted is not None:
+                self.on_promoted()
+
+    def follow(self):
+        "Apply what was written to the journal since last time, return how many records were applied"
+        count = 0
+        try:
+            inode = os.stat(self.shared.path).st_ino
+        except FileNotFoundError:  # Nothing published yet
+            return count
+        if self._file is not None and os.fstat(self._file.fileno()).st_ino != inode:
+            # Replaced by a new snapshot, finish the old journal first
+            count += self._read()
+            self._close()
+        if self._file is None:
+            self._file = open(self.shared.path, "rb")
+        return count + self._read()
+
+    def _read(self):
+        self._buffer += self._file.read()
+        count = 0
+        while len(self._buffer) >= _FRAME_HEADER.size:
+            (size,) = _FRAME_HEADER.unpack_from(self._buffer)
+            end = _FRAME_HEADER.size + size
+            if len(self._buffer) < end:  # The rest of the record is not written yet
+                break
+            record = pickle.loads(self._buffer[_FRAME_HEADER.size:end])
+            self._buffer = self._buffer[end:]
+            self.apply(record)
+            count += 1
+        return count
+
+    def apply(self, record):
+        kind, value = record
+        if kind == "set":
+            self.store.set(value)
+        elif kind == "remove":
+            self.store.remove(value)
+        elif kind == "snapshot":
+            self.apply_snapshot(value)
+
+    def apply_snapshot(self, events: dict):
+        if not self.store.is_loaded:
+            self.store.load(events)
+            return
+        # Only apply what differs, so that clients get the changes instead of a new table
+        with self.store.lock:
+            for event_id in set(self.store.events).difference(events):
+                self.store.remove(event_id)
+            for event_id, event in events.items():
+                if self.store.events.get(event_id) != event:
+                    self.store.set(event)
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._buffer = b""
@@ -0,0 +1,286 @@
+import base64
+import json
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+from enum import Enum
+
+from zinolib.event_types import Event, AdmState
+
+
+__all__ = [
+    "EventSort",
+    "SortedIndex",
+    "decode_cursor",
+    "encode_cursor",
+    "get_priority",
+]
+
+
+# Inspired by https://stackoverflow.com/a/54732120
+class EventSort(Enum):
+    # Name, relevant event attribute, is_reversed, displayed name, description
+    AGE = "age", "opened", True, "Age", "Newest events first"
+    AGE_REV = "age-rev", "opened", False, "Age reversed", "Oldest events first"
+    UPD = "upd", "updated", False, "Activity", "Events with the oldest update date first"
+    UPD_REV = "upd-rev", "updated", True, "Activity reversed", "Events with the most recent update date first"
+    DOWN = "down", "get_downtime", True, "Downtime", "Events with longest downtime first"
+    DOWN_REV = "down-rev", "get_downtime", False, "Downtime reversed", "Events with shortest/none downtime first"
+
+    LASTTRANS = ("lasttrans", "updated", True, "Last transaction",
+                 "Events with the most recent update date first, all IGNORED events are at the bottom")
+    SEVERITY = "severity", "", True, "Severity", "Events with highest priority first, grouped by event type. Priority takes into account both whether event signifies any disturbance, event's administrative phase and event's type, so there might not be continuous blocks of color"
+    DEFAULT = "raw", "", None, "Raw", "The same order in which Zino server sends events (by ID, ascending)"
+
+    def __new__(cls, *args, **kwds):
+        obj = object.__new__(cls)
+        obj._value_ = args[0]
+        return obj
+
+    def __init__(self, _: str, attribute: str = None, reversed: bool = None, display_name: str = None, description: str = None):
+        self._attribute = attribute
+        self._reversed = reversed
+        self._display_name = display_name
+        self._description = description
+
+    def __str__(self):
+        return self.value
+
+    @property
+    def attribute(self):
+        return self._attribute
+
+    @property
+    def reversed(self):
+        return self._reversed
+
+    @property
+    def display_name(self):
+        return self._display_name
+
+    @property
+    def description(self):
+        return self._description
+
+    @property
+    def is_volatile(self):
+        "Whether the order changes with time, not only when events change"
+        return self.attribute == "get_downtime"
+
+
+def get_priority(event: Event):
+    """
+    Priorities are as follows:
+      - `0` = Lowest
+      - `1` = Low
+      - `2` = Medium
+      - `3` = High
+      - `4` = Highest
+    :param event:
+    :return: priority as int, where `0` is lowest, and `4` is the highest priority
+    """
+    if event.is_down() and event.adm_state == AdmState.OPEN:
+        return 4
+    if event.adm_state in [AdmState.WORKING, AdmState.WAITING]:
+        return 3
+    if event.adm_state == AdmState.IGNORED:
+        return 1
+    if event.adm_state == AdmState.CLOSED:
+        return 0
+    return 2
+
+
+def _key_types(sort_by: EventSort):
+    "Types of the values in the sort keys of ``sort_by``"
+    if sort_by == EventSort.DEFAULT:
+        return (int,)
+    if sort_by == EventSort.LASTTRANS:
+        return (int, float, int)
+    if sort_by == EventSort.SEVERITY:
+        return (int, str, int)
+    return (float, int)
+
+
+def _cursor_prefix(sort_by: EventSort, tag: str):
+    return f'{sort_by}-{tag}.' if tag else f'{sort_by}.'
+
+
+def encode_cursor(sort_by: EventSort, key, tag: str = ""):
+    """Encode the sort ``key`` of a row as a string, for the client to send back
+
+    A ``key`` of None stands for the end of the list. ``tag`` ties the cursor
+    to anything else that decides which rows are listed, like a filter.
+    """
+    if key is None:
+        return _cursor_prefix(sort_by, tag)
+    return _cursor_prefix(sort_by, tag) + base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(sort_by: EventSort, cursor: str, tag: str = ""):
+    """Decode a cursor made by ``encode_cursor``, return the sort key or None for the end of the list
+
+    Raises ValueError if the cursor is malformed or was made for another sort or tag.
+    """
+    prefix = _cursor_prefix(sort_by, tag)
+    if not (cursor or '').startswith(prefix):
+        raise ValueError(f'Cursor is not for sort "{sort_by}"')
+    encoded = cursor[len(prefix):]
+    if not encoded:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Malformed cursor: {e}') from e
+    types = _key_types(sort_by)
+    if not isinstance(key, list) or len(key) != len(types):
+        raise ValueError('Malformed cursor')
+    for value, type_ in zip(key, types):
+        if isinstance(value, bool) or not isinstance(value, (int, float) if type_ is float else type_):
+            raise ValueError('Malformed cursor')
+    return tuple(key)
+
+
+def _timestamp(dt):
+    return dt.timestamp() if dt else 0.0
+
+
+def _downtime(event):
+    if not hasattr(event, "get_downtime"):
+        return 0.0
+    return (event.get_downtime() or timedelta()).total_seconds()
+
+
+class SortedIndex:
+    """Event ids in the display order of an ``EventSort``
+
+    The ids are kept in a list of sort keys ordered with ``bisect``, so an
+    event is found, inserted, moved or removed without sorting all events
+    again. A sort key is a tuple of plain numbers and strings that ends with
+    the event id, which makes every key unique.
+
+    Keys are always kept in ascending order. Sorts that show the largest
+    values first are read from the end of the list; the event id is negated
+    in their keys so that ties keep the order of a stable reverse sort.
+
+    The order of volatile sorts (downtime) changes with time alone, they
+    need to be rebuilt now and then, see ``is_outdated()``.
+    """
+    max_age = 60  # Seconds before the order of a volatile sort is outdated
+
+    def __init__(self, sort_by: EventSort, events: dict = None):
+        self.sort_by = sort_by
+        self.descending = bool(sort_by.reversed)
+        self.rebuild(events or {})
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, event_id):
+        return event_id in self._keys
+
+    def __iter__(self):
+        "Iterate over event ids in display order"
+        keys = reversed(self._sorted) if self.descending else self._sorted
+        for key in keys:
+            yield self._id(key)
+
+    @property
+    def _negated_id(self):
+        # LASTTRANS is displayed as the reverse of an ascending sort, ties
+        # included, all other descending sorts keep ties in ascending order
+        return self.descending and self.sort_by != EventSort.LASTTRANS
+
+    def key(self, event):
+        sort_by = self.sort_by
+        event_id = -event.id if self._negated_id else event.id
+        if sort_by == EventSort.DEFAULT:
+            return (event_id,)
+        if sort_by == EventSort.LASTTRANS:
+            return (0 if event.adm_state == AdmState.IGNORED else 1, _timestamp(event.updated), event_id)
+        if sort_by == EventSort.SEVERITY:
+            return (get_priority(event), str(event.type), event_id)
+        if sort_by.is_volatile:
+            return (_downtime(event), event_id)
+        return (_timestamp(getattr(event, sort_by.attribute)), event_id)
+
+    def rebuild(self, events: dict):
+        self._keys = {event_id: self.key(event) for event_id, event in events.items()}
+        self._sorted = sorted(self._keys.values())
+        self.built_at = time.monotonic()
+
+    def is_outdated(self):
+        return self.sort_by.is_volatile and time.monotonic() - self.built_at > self.max_age
+
+    def set(self, event):
+        "Insert or move ``event`` to where it belongs"
+        self.remove(event.id)
+        key = self.key(event)
+        self._keys[event.id] = key
+        insort(self._sorted, key)
+
+    def remove(self, event_id):
+        key = self._keys.pop(event_id, None)
+        if key is not None:
+            del self._sorted[bisect_left(self._sorted, key)]
+
+    def _keys_after(self, after=None):
+        "Iterate over sort keys in display order, starting after the key ``after``"
+        keys = self._sorted
+        if self.descending:
+            stop = len(keys) if after is None else bisect_left(keys, after)
+            return (keys[i] for i in range(stop - 1, -1, -1))
+        start = 0 if after is None else bisect_right(keys, after)
+        return (keys[i] for i in range(start, len(keys)))
+
+    def _id(self, key):
+        return -key[-1] if self._negated_id else key[-1]
+
+    def page(self, after=None, size=None, end=None, where=None):
+        """Return the ids of a run of events in display order, and the key of the last of them
+
+        The run starts right after the event with the sort key ``after``, or
+        at the start if None. It ends at the event with the key ``end``, or
+        after ``size`` events, or at the end of the list. The returned key is
+        None if no events follow the run. If ``where`` is given, only events
+        with ids in it are counted.
+        """
+        run = []
+        more = False
+        for key in self._keys_after(after):
+            if where is not None and self._id(key) not in where:
+                continue
+            if end is not None:
+                full = key < end if self.descending else key > end
+            else:
+                full = size is not None and len(run) >= size
+            if full:
+                more = True
+                break
+            run.append(key)
+        return [self._id(key) for key in run], (run[-1] if run and more else None)
+
+    def includes(self, event_id, end):
+        "Whether ``event_id`` is displayed at or before the event with the sort key ``end``, None being the end"
+        if end is None:
+            return True
+        key = self._keys[event_id]
+        return key >= end if self.descending else key <= end
+
+    def position(self, event_id):
+        "Return the display position of ``event_id``, counting from 0"
+        pos = bisect_left(self._sorted, self._keys[event_id])
+        return len(self._sorted) - 1 - pos if self.descending else pos
+
+    def previous(self, event_id, where=None):
+        """Return the id of the event displayed right before ``event_id``, None if it is displayed first
+
+        If ``where`` is given, only events with ids in it are displayed.
+        """
+        step = 1 if self.descending else -1
+        pos = bisect_left(self._sorted, self._keys[event_id]) + step
+        while 0 <= pos < len(self._sorted):
+            previous_id = self._id(self._sorted[pos])
+            if where is None or previous_id in where:
+                return previous_id
+            pos += step
+        return None
@@ -0,0 +1,236 @@
+import threading
+import uuid
+from collections import deque
+from enum import Enum
+from typing import NamedTuple
+
+from .counters import EventCounters
+from .filtering import EventFilter, FilterIndex
+from .sorting import EventSort, SortedIndex
+from .table import TableEvent
+
+
+__all__ = [
+    "Change",
+    "Changes",
+    "EventStore",
+]
+
+
+class Change(Enum):
+    ADDED = "added"
+    MODIFIED = "modified"
+    REMOVED = "removed"
+
+
+class Changes(NamedTuple):
+    version: int
+    added: list
+    modified: list
+    removed: list
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+
+class EventStore:
+    """In-memory copy of the events of a Zino session
+
+    Every change bumps ``version``, which also becomes the version of the
+    changed event, see ``event_versions``. Together with ``id``, which is
+    unique per store, the version of an event identifies its contents. Every
+    change is recorded in a bounded change log of
+    ``(version, change, event id)`` entries. A reader that remembers the
+    version it last saw can ask for what changed since, see
+    ``changes_since()``. When the log overflows the oldest entries are
+    dropped, readers that are that far behind must start from scratch.
+
+    Every store counts versions from 0, so clients are given the version as
+    a ``version_tag()``, which ``parse_version_tag()`` only accepts from the
+    same store. A client that was given a version by a store that has since
+    been replaced, or by another process, then starts from scratch.
+
+    Readers can block until the events change with ``wait_for_change()``.
+
+    A ``SortedIndex`` is built for an ``EventSort`` the first time it is
+    asked for with ``index()`` and is kept up to date from then on. The
+    ``filter_index`` is always kept up to date, see ``select()``, and so are
+    the ``counters``, see ``stats()``.
+
+    What the events table shows of an event is made once per version of the
+    event, see ``table_event()``.
+    """
+    changelog_size = 1024
+
+    def __init__(self, changelog_size=None):
+        self.id = uuid.uuid4().hex  # Unique across processes and restarts as well
+        self.lock = threading.RLock()
+        self._changed = threading.Condition(self.lock)
+        self.version = 0
+        self.loaded_version = 0  # Version of the last full load
+        self.events = {}
+        self.event_versions = {}
+        self._changelog = deque(maxlen=changelog_size or self.changelog_size)
+        self._oldest_version = 0  # The change log is complete for versions after this
+        self._indexes = {}
+        self.filter_index = FilterIndex()
+        self.counters = EventCounters()
+        self._table_events = {}
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def is_loaded(self):
+        return self.loaded_version > 0
+
+    def version_tag(self, version: int = None):
+        "Return ``version``, by default the current one, tagged with the id of the store"
+        return f"{self.id}-{self.version if version is None else version}"
+
+    def parse_version_tag(self, tag: str):
+        "Return the version of ``tag``, see ``version_tag()``, None if it is not of this store"
+        store_id, _, version = (tag or "").rpartition("-")
+        if store_id != self.id or not version.isdigit():
+            return None
+        return int(version)
+
+    def snapshot(self):
+        "Return the current version and a copy of the events that is safe to iterate over"
+        with self.lock:
+            return self.version, dict(self.events)
+
+    def index(self, sort_by: EventSort):
+        "Return the index for ``sort_by``, hold ``lock`` while using it"
+        with self.lock:
+            index = self._indexes.get(sort_by)
+            if index is None:
+                index = self._indexes[sort_by] = SortedIndex(sort_by, self.events)
+            return index
+
+    def select(self, event_filter: EventFilter):
+        "Return the set of ids of the events that match ``event_filter``, None if it is empty"
+        if not event_filter:
+            return None
+        with self.lock:
+            return self.filter_index.select(event_filter, self.events)
+
+    def stats(self):
+        "Return the current version and the numbers of events, in total and per value of some attributes"
+        with self.lock:
+            return self.version, self.counters.as_dict()
+
+    def table_event(self, event):
+        "Return the ``TableEvent`` of ``event``, the same one for as long as ``event`` is current"
+        with self.lock:
+            cached = self._table_events.get(event.id)
+            if cached is not None and cached[0] is event:
+                return cached[1]
+            table_event = TableEvent.from_event(event)
+            if self.events.get(event.id) is event:
+                self._table_events[event.id] = (event, table_event)
+            return table_event
+
+    def sorted_page(self, sort_by: EventSort, after=None, size: int = None, end=None,
+                    event_filter: EventFilter = None):
+        """Return a page of the events in the order of ``sort_by``, see ``SortedIndex.page()``
+
+        Returns the current version, the events of the page as ``(event
+        version, event)`` tuples and the sort key of the last event of the
+        page, None if it is the last page. Only events that match
+        ``event_filter`` are included, if given.
+        """
+        with self.lock:
+            index = self.index(sort_by)
+            if index.is_outdated():
+                index.rebuild(self.events)
+            where = self.select(event_filter)
+            ids, last_key = index.page(after=after, size=size, end=end, where=where)
+            return self.version, [(self.event_versions[i], self.events[i]) for i in ids], last_key
+
+    def load(self, events: dict):
+        "Replace all events, typically after fetching the complete event list"
+        with self.lock:
+            self.version += 1
+            self.loaded_version = self.version
+            self._oldest_version = self.version
+            self._changelog.clear()
+            self.events = dict(events)
+            self.event_versions = dict.fromkeys(self.events, self.version)
+            self._indexes = {}
+            self.filter_index.rebuild(self.events)
+            self.counters.rebuild(self.events)
+            self._table_events = {}
+            self._changed.notify_all()
+            return self.version
+
+    def set(self, event):
+        with self.lock:
+            change = Change.MODIFIED if event.id in self.events else Change.ADDED
+            self.events[event.id] = event
+            for index in self._indexes.values():
+                index.set(event)
+            self.filter_index.set(event)
+            self.counters.set(event)
+            self._table_events.pop(event.id, None)
+            version = self.event_versions[event.id] = self._log(change, event.id)
+            return version
+
+    def remove(self, event_id: int):
+        with self.lock:
+            if self.events.pop(event_id, None) is None:
+                return self.version
+            del self.event_versions[event_id]
+            for index in self._indexes.values():
+                index.remove(event_id)
+            self.filter_index.remove(event_id)
+            self.counters.remove(event_id)
+            self._table_events.pop(event_id, None)
+            return self._log(Change.REMOVED, event_id)
+
+    def _log(self, change: Change, event_id: int):
+        self.version += 1
+        if len(self._changelog) == self._changelog.maxlen:
+            self._oldest_version = self._changelog[0][0]
+        self._changelog.append((self.version, change, event_id))
+        self._changed.notify_all()
+        return self.version
+
+    def wait_for_change(self, version: int, timeout: float = None):
+        "Block until the events change after ``version`` or ``timeout`` runs out, return the current version"
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def changes_since(self, version: int):
+        """Find what changed after ``version``
+
+        Returns a ``Changes`` tuple of the current version and lists of the
+        ids of added, modified and removed events, relative to how the events
+        looked at ``version``. An event that was both added and removed after
+        ``version`` is left out.
+
+        Returns None if ``version`` is unknown or the change log no longer
+        reaches back to it, then the caller must start from scratch.
+        """
+        with self.lock:
+            if version is None or not self._oldest_version <= version <= self.version:
+                return None
+            first = {}
+            last = {}
+            for entry_version, change, event_id in reversed(self._changelog):
+                if entry_version <= version:
+                    break
+                first[event_id] = change
+                last.setdefault(event_id, change)
+            added, modified, removed = [], [], []
+            for event_id, change in first.items():
+                existed = change != Change.ADDED
+                exists = last[event_id] != Change.REMOVED
+                if existed and exists:
+                    modified.append(event_id)
+                elif exists:
+                    added.append(event_id)
+                elif existed:
+                    removed.append(event_id)
+            return Changes(self.version, added, modified, removed)
@@ -0,0 +1,40 @@
+import time
+
+
+__all__ = [
+    "event_stream",
+    "format_sse",
+]
+
+
+def format_sse(data, event=None):
+    "Format a Server-Sent Events message"
+    message = f"data: {data}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+def event_stream(store, is_alive, heartbeat=15.0, throttle=0.25, max_duration=300.0):
+    """Tell a client that the events in ``store`` changed, as Server-Sent Events
+
+    Sends an ``eventsChanged`` message with the new version of the events
+    whenever the store changes, the client then asks for the actual changes.
+    Changes arriving within ``throttle`` seconds are sent as one message.
+
+    A comment is sent every ``heartbeat`` seconds without changes so that
+    dropped connections are noticed. The stream ends when ``is_alive()``
+    returns false or after ``max_duration`` seconds, browsers reconnect
+    automatically.
+    """
+    version = store.version
+    yield format_sse(version, event="eventsChanged")  # Let the client catch up on (re)connect
+    deadline = time.monotonic() + max_duration
+    while is_alive() and time.monotonic() < deadline:
+        new_version = store.wait_for_change(version, timeout=heartbeat)
+        if new_version == version:
+            yield ": heartbeat\n\n"
+            continue
+        time.sleep(throttle)
+        version = store.version
+        yield format_sse(version, event="eventsChanged")
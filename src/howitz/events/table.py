@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+
+from zinolib.compat import StrEnum
+from zinolib.event_types import Event, AdmState, PortState, BFDState, ReachabilityState
+
+from ..utils import calculate_event_age_no_seconds, shorten_downtime
+
+
+__all__ = [
+    "EventColor",
+    "TableEvent",
+    "color_code_event",
+]
+
+
+# TODO: Should be configurable
+class EventColor(StrEnum):
+    RED = "red"
+    BLUE = "cyan"
+    GREEN = "green"
+    YELLOW = "yellow"
+    DEFAULT = ""
+
+
+# fixme implementation copied from curitz
+def color_code_event(event):
+    if event.adm_state == AdmState.IGNORED:
+        return EventColor.BLUE
+    elif event.adm_state == AdmState.CLOSED:
+        return EventColor.GREEN
+    elif ((event.type == Event.Type.PORTSTATE and event.port_state in [PortState.DOWN,
+                                                                       PortState.LOWER_LAYER_DOWN])
+          or (event.type == Event.Type.BGP and event.bgp_OS == "down")
+          or (event.type == Event.Type.BFD and event.bfd_state == BFDState.DOWN)
+          or (event.type == Event.Type.REACHABILITY and event.reachability == ReachabilityState.NORESPONSE)
+          or (event.type == Event.Type.ALARM and event.alarm_count > 0)):
+        if event.adm_state == AdmState.OPEN:
+            return EventColor.RED
+        elif event.adm_state in [AdmState.WORKING, AdmState.WAITING]:
+            return EventColor.YELLOW
+    else:
+        return EventColor.DEFAULT
+
+
+class TableEvent:
+    """What a row of the events table shows of an event
+
+    Made once per version of an event with ``from_event()``, rendering the
+    row again reuses it. Only the age and downtime depend on when the row is
+    rendered, they are computed when read.
+    """
+    __slots__ = ("id", "type", "color", "adm_state", "op_state", "router", "port", "description", "opened",
+                 "down_since", "down_before")
+
+    def __init__(self, id, type, color, adm_state, op_state, router, port, description, opened,
+                 down_since=None, down_before=None):
+        self.id = id
+        self.type = type
+        self.color = color
+        self.adm_state = adm_state
+        self.op_state = op_state
+        self.router = router
+        self.port = port
+        self.description = description
+        self.opened = opened
+        self.down_since = down_since  # When a port that is down went down
+        self.down_before = down_before  # Downtime accumulated before, None if the event has no downtime
+
+    def __repr__(self):
+        return f'TableEvent(id={self.id}, type={self.type}, adm_state={self.adm_state})'
+
+    @classmethod
+    def from_event(cls, event: Event):
+        down_since = down_before = None
+        if event.type == Event.Type.PORTSTATE:
+            # Like PortStateEvent.get_downtime(), but without fixing the time
+            down_before = event.ac_down or timedelta(0)
+            if event.port_state in [PortState.DOWN, PortState.LOWER_LAYER_DOWN]:
+                down_since = event.lasttrans
+        return cls(
+            id=event.id,
+            type=event.type,
+            color=color_code_event(event),
+            adm_state=event.adm_state,
+            op_state=event.op_state,
+            router=event.router,
+            port=event.port,
+            description=event.description,
+            opened=event.opened,
+            down_since=down_since,
+            down_before=down_before,
+        )
+
+    @property
+    def age(self):
+        return calculate_event_age_no_seconds(self.opened)
+
+    @property
+    def downtime(self):
+        if self.down_before is None:
+            return ""
+        downtime = self.down_before
+        if self.down_since is not None:
+            downtime += datetime.now(timezone.utc) - self.down_since
+        return shorten_downtime(downtime)
@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from enum import Enum
+
+
+__all__ = [
+    "ItemStatus",
+    "Job",
+    "JobQueue",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class ItemStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job:
+    """Work on a list of items, run in the background by a ``JobQueue``
+
+    ``start_item(item)`` starts the work on an item and returns a future,
+    at most ``concurrency`` items are worked on at a time and at most
+    ``rate`` items are started per second, if set. An item is failed if
+    starting it or its future raises, otherwise ``on_result(item, result)``
+    is called with the result of the future.
+
+    The status of every item is kept, see ``statuses`` and ``errors``. A
+    cancelled job starts no more items, those not started are cancelled.
+    """
+
+    def __init__(self, owner: str, title: str, items, start_item, on_result=None, concurrency: int = 1,
+                 rate: float = None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.title = title
+        self.items = list(dict.fromkeys(items))
+        self.statuses = dict.fromkeys(self.items, ItemStatus.PENDING)
+        self.errors = {}
+        self.start_item = start_item
+        self.on_result = on_result
+        self.concurrency = max(concurrency, 1)
+        self.rate = rate or None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f'Job({self.title!r}, id={self.id}, owner={self.owner})'
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def is_finished(self):
+        return self.finished_at is not None
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def counts(self):
+        "Number of items per status, by status value"
+        with self._lock:
+            counts = dict.fromkeys((status.value for status in ItemStatus), 0)
+            for status in self.statuses.values():
+                counts[status.value] += 1
+            return counts
+
+    def failures(self):
+        "Return the failed items and their errors"
+        with self._lock:
+            return dict(self.errors)
+
+    def _set(self, item, status: ItemStatus, error: str = None):
+        with self._lock:
+            self.statuses[item] = status
+            if error is not None:
+                self.errors[item] = error
+
+    def run(self):
+        self.started_at = time.time()
+        in_flight = {}
+        next_start = time.monotonic()
+        try:
+            for item in self.items:
+                if self.rate:
+                    # Wait for the next start, but not if cancelled meanwhile
+                    self._cancelled.wait(max(next_start - time.monotonic(), 0))
+                    next_start = max(next_start, time.monotonic()) + 1 / self.rate
+                if self.is_cancelled:
+                    break
+                while len(in_flight) >= self.concurrency:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self._collect(in_flight, done)
+                try:
+                    future = self.start_item(item)
+                except Exception as e:
+                    self._set(item, ItemStatus.FAILED, str(e) or type(e).__name__)
+                    continue
+                self._set(item, ItemStatus.RUNNING)
+                in_flight[future] = item
+            self._collect(in_flight, wait(in_flight).done)
+        finally:
+            with self._lock:
+                for item, status in self.statuses.items():
+                    if status == ItemStatus.PENDING:
+                        self.statuses[item] = ItemStatus.CANCELLED
+            self.finished_at = time.time()
+            logger.info('%s finished: %s', self, self.counts())
+
+    def _collect(self, in_flight, done):
+        for future in done:
+            item = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                self._set(item, ItemStatus.FAILED, str(e) or type(e).__name__)
+                continue
+            if self.on_result is not None:
+                try:
+                    self.on_result(item, result)
+                except Exception as e:
+                    logger.exception('Handling the result of %s in %s failed: %s', item, self, e)
+            self._set(item, ItemStatus.DONE)
+
+
+class JobQueue:
+    """Runs jobs in the background, at most ``max_running`` at a time
+
+    Jobs that do not fit are queued. Finished jobs are kept for
+    ``keep_finished`` seconds so that their outcome can be looked up.
+    """
+    keep_finished = 3600
+
+    def __init__(self, max_running: int = 2):
+        self.max_running = max_running
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __str__(self):
+        return f'JobQueue(max_running={self.max_running}, jobs={len(self._jobs)})'
+
+    def submit(self, job: Job):
+        with self._lock:
+            self._purge()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_running, thread_name_prefix="howitz-job")
+            self._jobs[job.id] = job
+            self._executor.submit(job.run)
+        logger.debug('Queued %s', job)
+        return job
+
+    def get(self, job_id: str, owner: str = None):
+        "Return the job, None if there is none, or it belongs to someone else than ``owner``"
+        job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def cancel_all(self, owner: str):
+        "Cancel the unfinished jobs of ``owner``"
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner and not job.is_finished]
+        for job in jobs:
+            job.cancel()
+
+    def close(self):
+        "Cancel all jobs and wait for the running ones to stop"
+        with self._lock:
+            executor, self._executor = self._executor, None
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _purge(self):
+        "Forget jobs that finished long ago, hold ``_lock`` when calling"
+        cutoff = time.time() - self.keep_finished
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.is_finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
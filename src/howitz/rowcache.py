@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+
+__all__ = [
+    "RowCache",
+]
+
+
+class RowCache:
+    """LRU cache of rendered event table rows
+
+    Keys must identify everything a rendered row depends on, typically the
+    event id and version along with the UI state of the row. The size of the
+    cache is the total length of the cached rows, when it grows past
+    ``max_size`` the least recently used rows are dropped.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, key):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._rows.move_to_end(key)
+            return row
+
+    def set(self, key, row):
+        size = len(row)
+        if size > self.max_size:
+            return
+        with self._lock:
+            old_row = self._rows.pop(key, None)
+            if old_row is not None:
+                self.size -= len(old_row)
+            self._rows[key] = row
+            self.size += size
+            while self.size > self.max_size:
+                _, dropped = self._rows.popitem(last=False)
+                self.size -= len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            "rows": len(self._rows),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,293 @@
+"""Server-side sessions
+
+The session cookie only carries a random session id, the session data is
+kept by a backend on the server. Id collections in the session, like the
+expanded and selected events, are stored as compact arrays of integers.
+"""
+import itertools
+import logging
+import os
+import pickle
+import secrets
+import sqlite3
+import time
+import zlib
+from array import array
+from pathlib import Path
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from .connections import ThreadConnections
+
+
+__all__ = [
+    "FileSystemSessionBackend",
+    "ServerSideSession",
+    "ServerSideSessionInterface",
+    "SqliteSessionBackend",
+    "decode_session",
+    "encode_session",
+    "make_session_interface",
+    "regenerate_session",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Ids:
+    """Compact form of a dict of event ids (as strings) to a value
+
+    The ids are grouped by value and every group is stored as the
+    differences between its sorted ids, in the smallest integer type that
+    fits. Those are small numbers that compress well.
+    """
+
+    def __init__(self, ids: dict):
+        groups = {}
+        for event_id, value in ids.items():
+            groups.setdefault(value, []).append(int(event_id))
+        self.groups = {value: self._pack(sorted(event_ids)) for value, event_ids in groups.items()}
+
+    @staticmethod
+    def _pack(event_ids):
+        deltas = [event_ids[0]] + [b - a for a, b in zip(event_ids, event_ids[1:])]
+        biggest = max(deltas)
+        for typecode in "BHIQ":
+            if biggest < 256 ** array(typecode).itemsize:
+                return typecode, array(typecode, deltas).tobytes()
+
+    def expand(self):
+        ids = {}
+        for value, (typecode, raw) in self.groups.items():
+            deltas = array(typecode)
+            deltas.frombytes(raw)
+            ids.update(dict.fromkeys(map(str, itertools.accumulate(deltas)), value))
+        return ids
+
+
+def _is_id(key):
+    return isinstance(key, str) and key.isascii() and key.isdigit() and str(int(key)) == key
+
+
+def _is_id_dict(value):
+    return isinstance(value, dict) and value and all(map(_is_id, value))
+
+
+def encode_session(data: dict) -> bytes:
+    compact = {key: _Ids(value) if _is_id_dict(value) else value for key, value in data.items()}
+    return zlib.compress(pickle.dumps(compact, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def decode_session(raw: bytes) -> dict:
+    compact = pickle.loads(zlib.decompress(raw))
+    return {key: value.expand() if isinstance(value, _Ids) else value for key, value in compact.items()}
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False, encoded=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.encoded = encoded  # As loaded from the backend
+        self.modified = False
+        self.replaced_sid = None  # Deleted from the backend when the session is saved
+
+    def regenerate(self):
+        "Move the data to a new session id, so that a session id known before logging in or out is of no use"
+        if not self.new:
+            self.replaced_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.encoded = None
+        self.modified = True
+
+
+def regenerate_session(session):
+    "Give a server-side session a new session id, cookie sessions are left as they are"
+    if isinstance(session, ServerSideSession):
+        session.regenerate()
+
+
+class SqliteSessionBackend:
+    "Keep sessions in a table of an sqlite database, over a connection per thread in WAL-mode"
+
+    def __init__(self, database_file: str):
+        self.database_file = database_file
+        self.connections = ThreadConnections(self.connect)
+
+    def __str__(self):
+        return f'SqliteSessionBackend({self.database_file})'
+
+    def connect(self):
+        return sqlite3.connect(self.database_file, timeout=10, check_same_thread=False)
+
+    def close(self):
+        self.connections.close()
+
+    def initdb(self):
+        connection = self.connections.get()
+        # Readers and the writer no longer block each other, kept in the database file
+        connection.execute("PRAGMA journal_mode=WAL").close()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS session (sid TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def load(self, sid: str):
+        connection = self.connections.get()
+        row = connection.execute("SELECT data FROM session WHERE sid = ? AND expires > ?", (sid, time.time())).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid: str, data: bytes, expires: float):
+        connection = self.connections.get()
+        with connection:
+            connection.execute("REPLACE INTO session (sid, data, expires) VALUES (?, ?, ?)", (sid, data, expires))
+
+    def delete(self, sid: str):
+        connection = self.connections.get()
+        with connection:
+            connection.execute("DELETE FROM session WHERE sid = ?", (sid,))
+
+    def purge(self):
+        "Delete expired sessions"
+        connection = self.connections.get()
+        with connection:
+            connection.execute("DELETE FROM session WHERE expires <= ?", (time.time(),))
+
+
+class FileSystemSessionBackend:
+    "Keep sessions in files in a directory, the modification time of a file is its expiry time"
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def __str__(self):
+        return f'FileSystemSessionBackend({self.directory})'
+
+    def initdb(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, sid):
+        return self.directory / sid
+
+    def load(self, sid: str):
+        path = self._path(sid)
+        try:
+            if path.stat().st_mtime <= time.time():
+                return None
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def save(self, sid: str, data: bytes, expires: float):
+        path = self._path(sid)
+        tmp_path = path.with_name(f'.{sid}.{secrets.token_hex(4)}')
+        tmp_path.write_bytes(data)
+        os.utime(tmp_path, (expires, expires))
+        os.replace(tmp_path, path)  # Atomic, readers never see a half written session
+
+    def delete(self, sid: str):
+        self._path(sid).unlink(missing_ok=True)
+
+    def purge(self):
+        "Delete expired sessions"
+        now = time.time()
+        for path in self.directory.iterdir():
+            try:
+                if path.stat().st_mtime <= now:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keep session data in ``backend``, the cookie only holds the session id
+
+    Session data is only written when it actually changed, and the cookie is
+    only sent when a new session is made.
+    """
+    purge_interval = 3600  # Seconds between deleting expired sessions
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._last_purge = 0
+
+    @staticmethod
+    def _is_valid_sid(sid):
+        return sid and len(sid) <= 64 and sid.replace('-', '').replace('_', '').isalnum()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if self._is_valid_sid(sid):
+            raw = self.backend.load(sid)
+            if raw is not None:
+                try:
+                    return ServerSideSession(decode_session(raw), sid=sid, encoded=raw)
+                except Exception as e:
+                    logger.warning('Could not decode session, starting a new one: %s', e)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.replaced_sid is not None:
+            self.backend.delete(session.replaced_sid)
+
+        if not session:
+            if not session.new:
+                self.backend.delete(session.sid)
+            if not session.new or session.replaced_sid is not None:
+                response.delete_cookie(name, domain=domain, path=path, secure=secure, samesite=samesite,
+                                       httponly=httponly)
+            return
+
+        if session.modified or session.new:
+            encoded = encode_session(dict(session))
+            if encoded != session.encoded:
+                expires = time.time() + app.permanent_session_lifetime.total_seconds()
+                self.backend.save(session.sid, encoded, expires)
+            self._maybe_purge()
+
+        if session.new:
+            response.vary.add("Cookie")
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite)
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        try:
+            self.backend.purge()
+        except Exception as e:
+            logger.warning('Could not delete expired sessions from %s: %s', self.backend, e)
+
+
+def make_session_interface(backend_name: str, storage: str):
+    """Make a session interface for the named backend, None for the default cookie sessions
+
+    ``storage`` is the database file of the "sqlite" backend or the directory
+    of the "filesystem" backend.
+    """
+    if backend_name == "cookie":
+        return None
+    if backend_name == "sqlite":
+        backend = SqliteSessionBackend(storage)
+    elif backend_name == "filesystem":
+        backend = FileSystemSessionBackend(storage)
+    else:
+        raise ValueError(f'Unknown session backend "{backend_name}", use "sqlite", "filesystem" or "cookie"')
+    backend.initdb()
+    return ServerSideSessionInterface(backend)
@@ -1,9 +1,16 @@
+import csv
+import os
+import sqlite3
 import sys
 import click
 from flask.cli import AppGroup, with_appcontext
 from flask import current_app
 
+from howitz.users.hashing import PasswordHasher
 from howitz.users.model import User
+from howitz.users.transfer import FORMATS, guess_format, read_users, write_users
+from howitz.users.utils import is_password_hash
+from howitz.utils import is_valid_timezone
 
 
 user_cli = AppGroup("user")
@@ -13,14 +20,18 @@ user_cli = AppGroup("user")
 @click.argument("username")
 @click.argument("password")
 @click.argument("token")
+@click.option("-z", "--timezone", default="", help="Timezone to show dates in, instead of the configured one")
 @with_appcontext
-def create_user(username, password, token):
+def create_user(username, password, token, timezone):
     with current_app.app_context():
+        if timezone and not is_valid_timezone(timezone):
+            click.echo(f'Unknown timezone {timezone}, aborting', err=True)
+            sys.exit(1)
         existing_user = current_app.database.get(username)
         if existing_user:
             click.echo(f'User {username} already exists, aborting', err=True)
             sys.exit(1)
-        new_user = User(username=username, password=password, token=token)
+        new_user = User(username=username, password=password, token=token, timezone=timezone)
         user = current_app.database.add(new_user)
         if not user:
             click.echo(f'User {username} could not be created, aborting', err=True)
@@ -33,11 +44,15 @@ def create_user(username, password, token):
 @click.argument("username")
 @click.option("-p", "--password")
 @click.option("-t", "--token")
+@click.option("-z", "--timezone", help="Timezone to show dates in, an empty string for the configured one")
 @with_appcontext
-def update_user(username, password, token):
+def update_user(username, password, token, timezone):
     with current_app.app_context():
-        if not (password or token):
-            click.echo(f'Neither token nor password given, aborting', err=True)
+        if not (password or token or timezone is not None):
+            click.echo(f'Neither token, password nor timezone given, aborting', err=True)
+            sys.exit(1)
+        if timezone and not is_valid_timezone(timezone):
+            click.echo(f'Unknown timezone {timezone}, aborting', err=True)
             sys.exit(1)
         user = current_app.database.get(username)
         if not user:
@@ -45,6 +60,7 @@ def update_user(username, password, token):
             sys.exit(1)
         user.token = token if token else user.token
         user.password = password if password else user.password
+        user.timezone = timezone if timezone is not None else user.timezone
         updated_user = current_app.database.update(user)
         if updated_user:
             click.echo(f'User {username} was successfully updated')
@@ -80,3 +96,98 @@ def list_users():
         for user in users:
             click.echo(user.username)
         sys.exit(0)
+
+
+@user_cli.command("import")
+@click.argument("file", type=click.File("r", encoding="utf-8"), default="-")
+@click.option("-f", "--format", "file_format", type=click.Choice(FORMATS),
+              help="Format of FILE, by default guessed from its extension, CSV if it has none")
+@click.option("-u", "--upsert", is_flag=True, help="Update users that exist already instead of aborting")
+@click.option("-n", "--dry-run", is_flag=True, help="Check the users and tell what would change, changing nothing")
+@click.option("-w", "--workers", type=int, default=os.cpu_count() or 1, show_default=True,
+              help="Processes hashing passwords")
+@with_appcontext
+def import_users(file, file_format, upsert, dry_run, workers):
+    """Create users from FILE, or standard input
+
+    Every user needs a username, new users a password and token as well.
+    Passwords that are already hashed, like those from "export", are kept as
+    is. With --upsert fields left out or empty keep their current value.
+    Nothing is imported if one of the users is invalid.
+    """
+    with current_app.app_context():
+        file_format = file_format or guess_format(file.name)
+        try:
+            rows = read_users(file, file_format)
+        except (ValueError, csv.Error) as e:
+            click.echo(f'Could not read {file.name} as {file_format}: {e}', err=True)
+            sys.exit(1)
+        existing = {user.username: user for user in current_app.database.get_all() or []}
+        users, errors = {}, []
+        for number, row in enumerate(rows, start=1):
+            username = row.get("username")
+            if not username:
+                errors.append(f'User {number} has no username')
+                continue
+            if username in users:
+                errors.append(f'User {username} is given more than once')
+                continue
+            current = existing.get(username)
+            if current and not upsert:
+                errors.append(f'User {username} already exists, use --upsert to update it')
+                continue
+            if not current and not ("password" in row and "token" in row):
+                errors.append(f'User {username} needs both password and token')
+                continue
+            fields = current.model_dump() if current else {}
+            fields.update(row)
+            if fields.get("timezone") and not is_valid_timezone(fields["timezone"]):
+                errors.append(f'User {username} has unknown timezone {fields["timezone"]}')
+                continue
+            users[username] = User(**fields)
+        if errors:
+            for error in errors:
+                click.echo(error, err=True)
+            click.echo('Nothing was imported, aborting', err=True)
+            sys.exit(1)
+
+        created = len(users.keys() - existing.keys())
+        updated = len(users) - created
+        if dry_run:
+            click.echo(f'Would create {created} and update {updated} users')
+            sys.exit(0)
+
+        unhashed = [user for user in users.values() if not is_password_hash(user.password)]
+        if unhashed:
+            hasher = PasswordHasher(method=current_app.password_hasher.method, workers=min(workers, len(unhashed)))
+            try:
+                password_hashes = hasher.hash_many([user.password for user in unhashed])
+            finally:
+                hasher.close()
+            for user, password_hash in zip(unhashed, password_hashes):
+                user.password = password_hash
+        try:
+            current_app.database.add_many(users.values(), replace=upsert)
+        except sqlite3.Error as e:
+            click.echo(f'Users could not be imported: {e}, aborting', err=True)
+            sys.exit(1)
+        click.echo(f'Created {created} and updated {updated} users')
+        sys.exit(0)
+
+
+@user_cli.command("export")
+@click.argument("file", type=click.File("w", encoding="utf-8"), default="-")
+@click.option("-f", "--format", "file_format", type=click.Choice(FORMATS),
+              help="Format of FILE, by default guessed from its extension, CSV if it has none")
+@with_appcontext
+def export_users(file, file_format):
+    """Write all users to FILE, or standard output
+
+    The passwords are exported hashed, the tokens as they are, so keep the
+    file safe.
+    """
+    with current_app.app_context():
+        users = current_app.database.get_all() or []
+        write_users(users, file, file_format or guess_format(file.name))
+        click.echo(f'Exported {len(users)} users', err=True)
+        sys.exit(0)
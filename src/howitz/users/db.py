@@ -1,18 +1,53 @@
 import logging
 import sqlite3
+import time
+
+from howitz.connections import ThreadConnections
 
 from .model import User
+from .utils import encode_password, is_password_hash
 
 
-logger = logging.getLogger("__name__")
+logger = logging.getLogger(__name__)
 
 
 class UserDB:
+    """Users, stored in sqlite
+
+    Every thread keeps a connection of its own while it runs, see
+    ``ThreadConnections``, and the database is in WAL-mode so that reading
+    never waits for writing.
+
+    Users that have been looked up are cached for up to ``cache_ttl``
+    seconds, so that the user of every request does not have to be read.
+    Every change counts up a version number in the database, in the same
+    transaction, and the cache is cleared when it has changed since. The
+    version is read at most every ``version_check_interval`` seconds, so
+    changes made by other processes, like the ``flask user`` commands
+    changing a user of a running server, are seen within that time. Set
+    ``cache_ttl`` to 0 to turn the cache off.
+
+    New passwords are hashed with ``password_method``, see ``PasswordHasher``.
+    """
+    cache_ttl = 60.0
+    version_check_interval = 1.0
+    _bump_version = "UPDATE user_version SET version = version + 1"
+
     class DBException(Exception):
         pass
 
-    def __init__(self, database_file: str):
+    def __init__(self, database_file: str, cache_ttl: float = None, password_method: str = "scrypt"):
         self.database_file = database_file
+        self.password_method = password_method
+        if cache_ttl is not None:
+            self.cache_ttl = cache_ttl
+        self._cache = {}  # username: (expires, user or None)
+        self._cache_version = None  # Version of the database the cached users are of
+        self._version_checked = 0.0  # When the version was last read
+        self.connections = ThreadConnections(self.connect)
+
+    def __str__(self):
+        return f'UserDB({self.database_file})'
 
     @staticmethod
     def user_factory(cursor, row):
@@ -20,6 +55,12 @@ class UserDB:
         return User(**{k: v for k,v in zip(fields, row)})
 
     def initdb(self):
+        connection = self.connection
+        # Readers and the writer no longer block each other, kept in the database file
+        connection.execute("PRAGMA journal_mode=WAL").close()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS user_version (version INTEGER NOT NULL)")
+            connection.execute("INSERT INTO user_version SELECT 0 WHERE NOT EXISTS (SELECT * FROM user_version)")
         field_items = []
         for field_name in User.model_fields.keys():
             field_string = f"{field_name} TEXT NOT NULL"
@@ -29,36 +70,102 @@ class UserDB:
         field_query = ', '.join(field_items)
         querystring = f"CREATE TABLE IF NOT EXISTS user ({field_query})"
         params = ()
-        connection = self.change_db(querystring, params)
+        self.change_db(querystring, params)
+        self.add_missing_columns()
+
+    def add_missing_columns(self):
+        "Add columns for fields added to ``User`` after the table was created"
+        connection = self.connect()
+        connection.row_factory = None
+        with connection:
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(user)")}
+            for field_name in User.model_fields.keys():
+                if field_name not in columns:
+                    logger.info('Adding column %s to user table', field_name)
+                    connection.execute(f"ALTER TABLE user ADD COLUMN {field_name} TEXT NOT NULL DEFAULT ''")
         connection.close()
+        self.clear_cache()
 
     def connect(self):
+        "Open a new connection, see ``connection`` for the one of the current thread"
         logger.debug('Connecting to %s', self.database_file)
         connection = sqlite3.connect(self.database_file, check_same_thread=False)
         connection.row_factory = self.user_factory
         return connection
 
+    @property
+    def connection(self):
+        "The connection of the current thread, opened on first use"
+        return self.connections.get()
+
+    def close(self):
+        "Close the connections of all threads"
+        self.connections.close()
+        self.clear_cache()
+
+    def invalidate(self, username):
+        "Forget the cached user ``username``"
+        self._cache.pop(username, None)
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._cache_version = None
+        self._version_checked = 0.0
+
+    def get_version(self):
+        "Number of changes made to the users, by any process"
+        cursor = self.connection.cursor()
+        cursor.row_factory = None
+        return cursor.execute("SELECT version FROM user_version").fetchone()[0]
+
+    def _check_cache(self):
+        "Clear the cache if the users were changed since they were cached"
+        now = time.monotonic()
+        if now - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = now
+        version = self.get_version()
+        if version != self._cache_version:
+            self._cache.clear()
+            self._cache_version = version
+
     def change_db(self, querystring, params):
-        connection = self.connect()
+        connection = self.connection
         with connection:
             connection.execute(querystring, params)
+            connection.execute(self._bump_version)
         return connection
 
     def change_and_return_user(self, username, querystring, params):
-        connection = self.change_db(querystring, params)
-        return self.get(username, connection)
-
-    def get(self, username, connection=None):
+        self.invalidate(username)
+        try:
+            self.change_db(querystring, params)
+        finally:
+            self.invalidate(username)  # In case another thread cached the old user meanwhile
+        return self.get(username)
+
+    def get(self, username):
+        if self.cache_ttl > 0:
+            self._check_cache()
+        cached = self._cache.get(username)
+        if cached is not None and cached[0] > time.monotonic():
+            user = cached[1]
+            # Callers change the user they get before updating it
+            return user.model_copy() if user is not None else None
+        user = self._get(username)
+        if self.cache_ttl > 0:
+            self._cache[username] = (time.monotonic() + self.cache_ttl, user)
+            user = user.model_copy() if user is not None else None
+        return user
+
+    def _get(self, username):
         logger.debug('Getting user %s', username)
-        if not connection:
-            connection = self.connect()
         querystring = "SELECT * from user where username=?"
         params = (username,)
-        query = connection.execute(querystring, params)
+        query = self.connection.execute(querystring, params)
         result = query.fetchall()
-        connection.close()
         if not result:
-            logger.warn('User %s not in database',  username)
+            logger.warning('User %s not in database',  username)
             return None
         if len(result) > 1:
             logger.error('Multiple %s in database!',  username)
@@ -66,20 +173,44 @@ class UserDB:
         return result[0]
 
     def add(self, user: User):
-        querystring = "INSERT INTO user (username, password, token) values (?, ?, ?)"
-        password = user.encode_password(user.password)
-        params = (user.username, password, user.token)
+        querystring = "INSERT INTO user (username, password, token, timezone) values (?, ?, ?, ?)"
+        password = encode_password(user.password, self.password_method)
+        params = (user.username, password, user.token, user.timezone)
         return self.change_and_return_user(user.username, querystring, params)
 
     def update(self, user: User):
-        querystring = "REPLACE INTO user (username, password, token) values (?, ?, ?)"
+        querystring = "REPLACE INTO user (username, password, token, timezone) values (?, ?, ?, ?)"
         password = user.password
         # Do not reencrypt
-        if not password.startswith(('scrypt:', 'pbkdf2:')):
-            password = user.encode_password(password)
-        params = (user.username, password, user.token)
+        if not is_password_hash(password):
+            password = encode_password(password, self.password_method)
+        params = (user.username, password, user.token, user.timezone)
         return self.change_and_return_user(user.username, querystring, params)
 
+    def add_many(self, users, replace: bool = False):
+        """Add ``users`` in one transaction, nothing is added if one of them fails
+
+        With ``replace`` existing users are replaced, otherwise an existing
+        user fails with ``sqlite3.IntegrityError``. Passwords are hashed if
+        they are not already, hash them beforehand to hash many at once.
+        """
+        verb = "REPLACE" if replace else "INSERT"
+        querystring = f"{verb} INTO user (username, password, token, timezone) values (?, ?, ?, ?)"
+        params = []
+        for user in users:
+            password = user.password
+            if not is_password_hash(password):
+                password = encode_password(password, self.password_method)
+            params.append((user.username, password, user.token, user.timezone))
+        connection = self.connection
+        try:
+            with connection:
+                connection.executemany(querystring, params)
+                connection.execute(self._bump_version)
+        finally:
+            self.clear_cache()
+        return len(params)
+
     def remove(self, username):
         querystring = "DELETE from user where username = ?"
         if not isinstance(username, str):
@@ -88,11 +219,9 @@ class UserDB:
         return self.change_and_return_user(username, querystring, params)
 
     def get_all(self):
-        querystring = "SELECT username, password, token from user"
-        connection = self.connect()
-        query = connection.execute(querystring)
+        querystring = "SELECT * from user"
+        query = self.connection.execute(querystring)
         result = query.fetchall()
-        connection.close()
         if not result:
             return None
         return result
@@ -0,0 +1,128 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.exceptions import ServiceUnavailable
+
+from .utils import encode_password, verify_password
+
+
+__all__ = [
+    "PasswordHasher",
+    "PasswordHasherBusy",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(ServiceUnavailable):
+    description = 'Too many logins at once, please try again in a moment'
+
+
+class PasswordHasher:
+    """Hash and verify passwords in a pool of processes
+
+    Hashing a password is slow on purpose. When many users log in at once,
+    like after a restart, hashing in the request threads would hold up the
+    requests of those already logged in. Instead ``workers`` processes do
+    the hashing, with at most ``max_pending`` passwords queued or being
+    hashed. When the queue is full, or a password is not done within
+    ``timeout`` seconds, ``PasswordHasherBusy`` is raised, telling the client
+    to retry after ``retry_after`` seconds. With ``workers`` 0 passwords are
+    hashed in the calling thread.
+
+    ``method`` is the method and parameters of new hashes, as understood by
+    werkzeug's ``generate_password_hash()``, like ``"scrypt:32768:8:1"`` or
+    ``"pbkdf2:sha256:600000"``. ``needs_rehash()`` tells whether a hash was
+    made with other parameters.
+    """
+    timeout = 30.0
+    retry_after = 5
+
+    def __init__(self, method: str = "scrypt", workers: int = 2, max_pending: int = 32, timeout: float = None):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max(max_pending, 1)
+        if timeout is not None:
+            self.timeout = timeout
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._prefix = None
+
+    def __str__(self):
+        return f'PasswordHasher(method={self.method}, workers={self.workers}, max_pending={self.max_pending})'
+
+    @property
+    def prefix(self):
+        "The method and parameters of new hashes, as found in front of the salt"
+        if self._prefix is None:
+            self._prefix = encode_password("", self.method).split("$", 1)[0]
+        return self._prefix
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Forking a process with running threads is not safe
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password: str):
+        return self._run(encode_password, password, self.method)
+
+    def hash_many(self, passwords, chunksize: int = 8):
+        "Hash ``passwords`` using all workers, without the limits meant for logins"
+        if not self.workers:
+            return [encode_password(password, self.method) for password in passwords]
+        methods = [self.method] * len(passwords)
+        return list(self.executor.map(encode_password, passwords, methods, chunksize=chunksize))
+
+    def verify(self, password: str, password_hash: str):
+        return self._run(verify_password, password, password_hash)
+
+    def needs_rehash(self, password_hash: str):
+        return password_hash.split("$", 1)[0] != self.prefix
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        if not self._pending.acquire(blocking=False):
+            logger.warning('%s is full', self)
+            raise PasswordHasherBusy(retry_after=self.retry_after)
+        try:
+            future = self.executor.submit(function, *args)
+        except BrokenProcessPool:
+            self._pending.release()
+            self._reset()
+            raise PasswordHasherBusy(retry_after=self.retry_after)
+        except Exception:
+            self._pending.release()
+            raise
+        # Keep the place in the queue until the work is done, even if the caller gave up
+        future.add_done_callback(lambda _: self._pending.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            logger.warning('%s did not hash a password in %ss', self, self.timeout)
+            raise PasswordHasherBusy(retry_after=self.retry_after)
+        except BrokenProcessPool:
+            self._reset()
+            raise PasswordHasherBusy(retry_after=self.retry_after)
+
+    def _reset(self):
+        logger.warning('Worker of %s died, starting new workers', self)
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -8,6 +8,7 @@ class User(UserMixin, BaseModel):
     username: str
     password: str
     token: str
+    timezone: str = ""  # Empty for the timezone in the config
 
     def __str__(self):
         token = "'SET'" if self.token else "'NOT SET'"
@@ -0,0 +1,66 @@
+import csv
+import json
+from pathlib import PurePath
+
+
+__all__ = [
+    "FIELDS",
+    "FORMATS",
+    "guess_format",
+    "read_users",
+    "write_users",
+]
+
+
+FIELDS = ("username", "password", "token", "timezone")
+FORMATS = ("csv", "json", "ndjson")
+
+
+def guess_format(filename: str, default: str = "csv"):
+    "The format of a file from its extension, ``default`` if it has none that is known"
+    suffix = PurePath(filename or "").suffix.lstrip(".").lower()
+    if suffix == "jsonl":
+        return "ndjson"
+    return suffix if suffix in FORMATS else default
+
+
+def read_users(file, format: str):
+    """Read users as dicts from ``file``
+
+    CSV needs a header line naming the columns, JSON a list of objects and
+    NDJSON an object per line. Fields not in ``FIELDS`` are dropped and
+    empty fields are left out, so that they can be told from given ones.
+    """
+    if format == "csv":
+        rows = csv.DictReader(file)
+    elif format == "json":
+        rows = json.load(file)
+        if not isinstance(rows, list):
+            raise ValueError("Expected a list of users")
+    elif format == "ndjson":
+        rows = (json.loads(line) for line in file if line.strip())
+    else:
+        raise ValueError(f"Unknown format {format}")
+    users = []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"User {number} is not an object")
+        users.append({field: str(row[field]) for field in FIELDS if row.get(field) not in (None, "")})
+    return users
+
+
+def write_users(users, file, format: str):
+    "Write ``users`` to ``file``, see ``read_users()``"
+    rows = ({field: getattr(user, field) for field in FIELDS} for user in users)
+    if format == "csv":
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    elif format == "json":
+        json.dump(list(rows), file, indent=2)
+        file.write("\n")
+    elif format == "ndjson":
+        for row in rows:
+            file.write(json.dumps(row) + "\n")
+    else:
+        raise ValueError(f"Unknown format {format}")
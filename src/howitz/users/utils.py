@@ -1,26 +1,52 @@
 import hashlib
+import logging
 
-from werkzeug.exceptions import Forbidden
+from werkzeug.exceptions import Forbidden, ServiceUnavailable
 from werkzeug.security import generate_password_hash, check_password_hash
 
 
 __all__ = [
     "authenticate_user",
     "encode_password",
+    "is_password_hash",
     "verify_password",
 ]
 
 
-def authenticate_user(database, username: str, password: str):
+logger = logging.getLogger(__name__)
+
+
+def authenticate_user(database, username: str, password: str, hasher=None):
+    """Return the user if the password is right, raise Forbidden otherwise
+
+    With a ``PasswordHasher`` the password is checked by its pool of
+    processes, and the password is hashed again if the hash was made with
+    other parameters than those configured.
+    """
     user = database.get(username)
-    if user and user.authenticate(password):
-        return user
-    else:
+    if hasher is None:
+        if user and user.authenticate(password):
+            return user
         raise Forbidden('Wrong username or password')
+    if not (user and hasher.verify(password, user.password)):
+        raise Forbidden('Wrong username or password')
+    if hasher.needs_rehash(user.password):
+        try:
+            user.password = hasher.hash(password)
+        except ServiceUnavailable:
+            logger.info('Too busy to rehash the password of %s, trying on next login', username)
+            return user
+        user = database.update(user)
+        logger.info('Rehashed the password of %s', username)
+    return user
+
+
+def encode_password(password: str, method: str = "scrypt"):
+    return generate_password_hash(password, method)
 
 
-def encode_password(password: str):
-    return generate_password_hash(password, "scrypt")
+def is_password_hash(password: str):
+    return password.startswith(('scrypt:', 'pbkdf2:'))
 
 
 def verify_password(password: str, password_hash: str):
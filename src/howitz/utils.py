@@ -1,9 +1,25 @@
 import functools
 import traceback
 from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from flask import current_app
+from flask import current_app, session
 from flask_login import current_user
+from zinolib.controllers.zino1 import NotConnectedError
+
+
+def get_zino_session(quiet=False):
+    """Get the Zino session of the logged in user.
+
+    Raises NotConnectedError if there is none, unless ``quiet`` is set, then
+    None is returned.
+    """
+    zino_session = None
+    if current_user.is_authenticated:
+        zino_session = current_app.zino_sessions.get(current_user.username)
+    if zino_session is None and not quiet:
+        raise NotConnectedError('No Zino session for this user, reconnect necessary')
+    return zino_session
 
 
 def login_check():
@@ -14,7 +30,8 @@ def login_check():
         @functools.wraps(func)
         def __login_check(*args):
             with current_app.app_context():
-                if current_user.is_authenticated and current_app.event_manager.is_authenticated:
+                zino_session = get_zino_session(quiet=True)
+                if zino_session is not None and zino_session.is_authenticated:
                     current_app.logger.info("User authorized")
                     return func(*args)
 
@@ -25,33 +42,67 @@ def login_check():
     return _login_check
 
 
+MAX_STORED_ERRORS = 10
+
+
+def store_error_description(alert_id, description: str):
+    "Keep the description of an error for its alert, only the latest few are kept"
+    errors = session.get("errors") or dict()
+    errors[str(alert_id)] = description
+    for old_alert_id in list(errors)[:-MAX_STORED_ERRORS]:
+        del errors[old_alert_id]
+    session["errors"] = errors
+    session.modified = True
+
+
 def serialize_exception(exc):
     return ''.join(traceback.format_exception(exc))
 
 
-def utc_to_local(dt: datetime):
-    """
-    Find out local timezone.
-    Copied from: https://stackoverflow.com/a/13287083
+def is_valid_timezone(name: str):
+    "Whether ``name`` is 'LOCAL', 'UTC' or the name of a timezone in the tz database"
+    if name in ('LOCAL', 'UTC'):
+        return True
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, OSError):
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=64)
+def get_tzinfo(name: str):
+    """Look up timezone ``name`` once, None means the local timezone of the server
+
+    Invalid names fall back to UTC.
     """
-    return dt.replace(tzinfo=timezone.utc).astimezone(tz=None)
+    if name == 'LOCAL':
+        return None
+    if name != 'UTC' and is_valid_timezone(name):
+        return ZoneInfo(name)
+    return timezone.utc
+
+
+def get_user_timezone():
+    "Name of the timezone of the logged in user, or of the timezone in the config if they have not chosen one"
+    return getattr(current_user, "timezone", "") or current_app.howitz_config["timezone"]
+
 
+class DateFormatter:
+    "Formats naive or UTC datetimes in timezone ``tz_name``"
+    format = "%Y-%m-%d %H:%M:%S"
 
-def set_correct_timezone(dt: datetime):
-    if current_app.howitz_config["timezone"] == 'LOCAL':
-        res = utc_to_local(dt)
-    # fixme is this else statement even needed? this makes sure that datetime is aware in Howitz
-    else:
-        res = dt.replace(
-            tzinfo=timezone.utc)  # Set UTC as timezone in case none or invalid timezone is provided in config
-        current_app.logger.debug('UTC %s', res)
+    def __init__(self, tz_name: str):
+        self.tz_name = tz_name
+        self.tzinfo = get_tzinfo(tz_name)
 
-    return res
+    def __call__(self, dt: datetime):
+        return dt.replace(tzinfo=timezone.utc).astimezone(self.tzinfo).strftime(self.format)
 
 
-def date_str_without_timezone(dt: datetime):
-    dt_aware = set_correct_timezone(dt)
-    return dt_aware.strftime("%Y-%m-%d %H:%M:%S")
+@functools.lru_cache(maxsize=64)
+def get_date_formatter(tz_name: str):
+    return DateFormatter(tz_name)
 
 
 # Implementation copied from curitz
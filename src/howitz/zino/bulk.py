@@ -0,0 +1,61 @@
+import logging
+from typing import Optional
+
+from zinolib.controllers.zino1 import EventClosedError
+from zinolib.event_types import AdmState, Event
+
+
+__all__ = [
+    "BulkError",
+    "clear_flapping",
+    "poll",
+    "submit",
+    "update_status",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class BulkError(Exception):
+    pass
+
+
+# Actions, called as ``action(event_manager, event, **kwargs)``, may return the updated event
+
+
+def update_status(event_manager, event: Event, state: Optional[AdmState] = None, history: str = ""):
+    updated = None
+    if state:
+        try:
+            updated = event_manager.change_admin_state_for_id(event.id, state)
+        except EventClosedError as e:
+            raise BulkError(e.args[0]) from e
+    if history:
+        updated = event_manager.add_history_entry_for_id(event.id, history) or updated
+    return updated
+
+
+def poll(event_manager, event: Event):
+    if not event_manager.poll(event):
+        raise BulkError(f"Unexpected error when polling event #{event.id}")
+
+
+def clear_flapping(event_manager, event: Event):
+    if not event_manager.clear_flapping(event):
+        raise BulkError('Cant clear flapping on a non-port event.')
+
+
+def _call(event_manager, action, event, kwargs):
+    # Worker connections have no events of their own, lend them the one to act on
+    event_manager.events[event.id] = event
+    try:
+        return action(event_manager, event, **kwargs)
+    finally:
+        event_manager.events.pop(event.id, None)
+
+
+def submit(workers, action, event: Event, **kwargs):
+    "Run ``action`` on ``event`` over a worker connection of ``workers``, return a future"
+    return workers.submit(_call, action, event, kwargs)
+
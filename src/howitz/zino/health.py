@@ -0,0 +1,136 @@
+import logging
+import random
+import threading
+import time
+from enum import Enum
+from typing import NamedTuple, Optional
+
+
+__all__ = [
+    "Health",
+    "HealthMonitor",
+    "HealthStatus",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class Health(Enum):
+    UNKNOWN = "unknown"
+    UP = "up"
+    DEGRADED = "degraded"  # Answering, but slowly or without updates, or a single check failed
+    DOWN = "down"
+
+
+class HealthStatus(NamedTuple):
+    health: Health
+    rtt: Optional[float] = None  # Seconds the last successful check took
+    error: str = ""  # Why the last check failed
+    checked_at: Optional[float] = None
+    failures: int = 0  # Checks failed in a row
+
+
+class HealthMonitor(threading.Thread):
+    """Check the connection of a Zino session in the background, reconnect when it is lost
+
+    Every ``interval`` seconds ``check()`` is called, it raises if the
+    connection is broken and returns whether updates still arrive. The
+    outcome is kept in ``status`` for requests to read, so that the number
+    of open pages does not decide how often Zino is asked.
+
+    When ``failures_until_down`` checks have failed in a row the connection
+    is down, and ``reconnect()`` is tried with exponential backoff: after
+    ``backoff`` seconds, doubled for every failed attempt up to
+    ``max_backoff``, with random jitter so that the sessions of many users do
+    not reconnect at the same time.
+
+    ``check_soon()`` asks for a check without waiting for the interval, no
+    more often than every ``min_interval`` seconds.
+    """
+    interval = 30.0
+    min_interval = 5.0
+    slow_rtt = 2.0  # A check slower than this is degraded
+    failures_until_down = 2
+    backoff = 1.0
+    max_backoff = 300.0
+    jitter = 0.5  # Share of the backoff that is random
+
+    def __init__(self, check, reconnect, interval=None):
+        super().__init__(name="howitz-health-monitor", daemon=True)
+        self.check = check
+        self.reconnect = reconnect
+        if interval is not None:
+            self.interval = interval
+        self.status = HealthStatus(Health.UNKNOWN)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    @property
+    def is_stopped(self):
+        return self._stopped.is_set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def check_soon(self):
+        self._wakeup.set()
+
+    def run(self):
+        logger.debug("Health monitor started")
+        attempts = 0
+        while not self.is_stopped:
+            status = self.update()
+            if status.health == Health.DOWN:
+                delay = self.backoff_delay(attempts)
+                logger.info("Zino connection is down (%s), reconnecting in %.1fs", status.error, delay)
+                if self._stopped.wait(delay):
+                    break
+                attempts += 1
+                try:
+                    self.reconnect()
+                except Exception as e:
+                    logger.warning("Reconnecting to Zino failed, attempt %s: %s", attempts, e)
+                    self.status = status._replace(error=str(e) or type(e).__name__, checked_at=time.time())
+                    continue
+                logger.info("Reconnected to Zino after %s attempts", attempts)
+                self._wakeup.clear()
+                continue  # Check right away whether the new connection works
+            attempts = 0
+            # Make sure soon whether a failed check was a fluke
+            self._wait(self.min_interval if status.failures else self.interval)
+        logger.debug("Health monitor stopped")
+
+    def _wait(self, timeout: float):
+        self._wakeup.wait(timeout)
+        if self._wakeup.is_set() and not self.is_stopped:
+            # Asked to check early, but not too often
+            since = time.time() - (self.status.checked_at or 0)
+            self._stopped.wait(max(self.min_interval - since, 0))
+        self._wakeup.clear()
+
+    def update(self):
+        "Check the connection once and keep the outcome in ``status``"
+        started = time.monotonic()
+        try:
+            receiving = self.check()
+        except Exception as e:
+            failures = self.status.failures + 1
+            health = Health.DOWN if failures >= self.failures_until_down else Health.DEGRADED
+            self.status = HealthStatus(health, rtt=self.status.rtt, error=str(e) or type(e).__name__,
+                                       checked_at=time.time(), failures=failures)
+            return self.status
+        rtt = time.monotonic() - started
+        if not receiving:
+            # Requests still work, but the events are no longer kept up to date
+            self.status = HealthStatus(Health.DOWN, rtt=rtt, error="Lost connection to UpdateHandler",
+                                       checked_at=time.time(), failures=self.status.failures + 1)
+        else:
+            health = Health.DEGRADED if rtt > self.slow_rtt else Health.UP
+            self.status = HealthStatus(health, rtt=rtt, checked_at=time.time())
+        return self.status
+
+    def backoff_delay(self, attempts: int):
+        delay = min(self.backoff * 2 ** attempts, self.max_backoff)
+        return delay * (1 - self.jitter * random.random())
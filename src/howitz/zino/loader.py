@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from .resync import is_newer
+
+
+__all__ = [
+    "EventLoader",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoader(threading.Thread):
+    """Load all events of a Zino session into its store in the background
+
+    ``get_event_ids()`` returns the ids of the events in Zino, and
+    ``fetch_event(event_id)`` starts fetching an event and returns a
+    future. At most ``concurrency`` events are fetched at a time, typically
+    over worker connections of their own.
+
+    Events are added to the store as they arrive, newest first, so that the
+    first rows can be shown long before all events have been fetched.
+    ``on_fetched(events)`` is called with every chunk of events added.
+    Events that could not be fetched are tried once more at the end.
+
+    The update pump may change the store meanwhile, a fetched event never
+    replaces one with a later update.
+    """
+
+    def __init__(self, store, get_event_ids, fetch_event, on_fetched=None, concurrency: int = 3):
+        super().__init__(name="howitz-event-loader", daemon=True)
+        self.store = store
+        self.get_event_ids = get_event_ids
+        self.fetch_event = fetch_event
+        self.on_fetched = on_fetched
+        self.concurrency = max(concurrency, 1)
+        self.total = None  # Number of events in Zino, once known
+        self.fetched = 0
+        self.error = None
+        self._stopped = threading.Event()
+
+    def __str__(self):
+        return f'EventLoader(fetched={self.fetched}, total={self.total})'
+
+    @property
+    def is_loading(self):
+        return self.is_alive()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        started = time.monotonic()
+        try:
+            event_ids = sorted(self.get_event_ids(), reverse=True)
+            self.total = len(event_ids)
+            failed = self.fetch(event_ids)
+            if failed:
+                logger.info('Fetching %s events again', len(failed))
+                failed = self.fetch(failed)
+            for event_id in failed:
+                logger.warning('Could not fetch event %s: %s', event_id, failed[event_id])
+        except Exception as e:
+            logger.exception('Loading events stopped by error: %s', e)
+            self.error = e
+        logger.info('Loaded %s of %s events in %.2fs', self.fetched, self.total, time.monotonic() - started)
+
+    def fetch(self, event_ids):
+        "Fetch the events and add them to the store, return the errors of those that could not be fetched"
+        failed = {}
+        in_flight = {}
+        pending = iter(event_ids)
+        while not self._stopped.is_set():
+            for event_id in pending:
+                in_flight[self.fetch_event(event_id)] = event_id
+                if len(in_flight) >= self.concurrency or self._stopped.is_set():
+                    break
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            events = []
+            for future in done:
+                event_id = in_flight.pop(future)
+                try:
+                    events.append(future.result())
+                except Exception as e:
+                    failed[event_id] = e
+            self.add(events)
+        return failed
+
+    def add(self, events):
+        with self.store.lock:
+            added = []
+            for event in events:
+                current = self.store.events.get(event.id)
+                if current is None or is_newer(event, current):
+                    self.store.set(event)
+                    added.append(event)
+            self.fetched += len(events)
+        if added and self.on_fetched is not None:
+            self.on_fetched(added)
+
+    def wait_for(self, count: int, timeout: float):
+        "Wait until the store has ``count`` events, all events are loaded or ``timeout`` runs out"
+        deadline = time.monotonic() + timeout
+        version = self.store.version
+        while self.is_loading and len(self.store) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            version = self.store.wait_for_change(version, min(remaining, 0.1))
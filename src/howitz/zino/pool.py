@@ -0,0 +1,385 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from zinolib.controllers.zino1 import Zino1EventManager, SessionAdapter, UpdateHandler, NotConnectedError
+from zinolib.ritz import ProtocolError
+
+from howitz.events.details import DetailsCache
+from howitz.events.shared import JournalFollower, JournalWriter, SharedEvents
+from howitz.events.store import EventStore
+from .health import HealthMonitor
+from .loader import EventLoader
+from .pump import UpdatePump
+from .resync import Resync, Resyncer, resync_events
+from .workers import ZinoWorkers
+
+
+__all__ = [
+    "SessionPool",
+    "ZinoSession",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class _SessionAdapter(SessionAdapter):
+
+    @classmethod
+    def create_session(cls, config):
+        # zinolib's adapter stores the sockets on the _Session class, which
+        # makes every event manager share one connection. Use an instance.
+        session = cls._Session()
+        session.request = None
+        session.push = None
+        return cls._setup_request(session, config)
+
+
+class SessionEventManager(Zino1EventManager):
+    "Zino1EventManager with a connection of its own"
+    _session_adapter = _SessionAdapter
+
+    def get_event_ids(self):
+        self._verify_session()
+        return self._event_adapter.get_event_ids(self.session.request)
+
+
+def _fetch_event(event_manager, event_id):
+    return event_manager.create_event_from_id(event_id)
+
+
+class ZinoSession:
+    """A Zino connection with its update handler, update pump and event store
+
+    ``lock`` must be held while talking to Zino, the connection is shared by
+    the request threads of the user and the update pump. ``workers`` have
+    connections of their own for requests that can run concurrently.
+
+    With ``shared_dir`` set, the sessions of a user in different processes
+    share their events through ``SharedEvents``: only one of them runs an
+    update handler, the others follow its journal.
+
+    Once connected, ``health`` checks the connection every
+    ``health_interval`` seconds and reconnects when it is lost, and
+    ``resyncer`` resyncs the events every ``resync_interval`` seconds.
+    """
+
+    def __init__(self, username, config, autoremove=False, workers=3, shared_dir="", health_interval=30,
+                 resync_interval=300):
+        self.username = username
+        self.config = config
+        self.autoremove = autoremove
+        self.lock = threading.RLock()
+        self.event_manager = SessionEventManager.configure(config)
+        self.store = EventStore()
+        self.details = DetailsCache(self.store)
+        self.workers = ZinoWorkers(self._connect_worker, size=workers)
+        self.updater = None
+        self.pump = None
+        self.shared = None
+        if shared_dir:
+            self.shared = SharedEvents(shared_dir, f"{config.server}:{config.port}:{username}")
+        self.journal_writer = None
+        self.health_interval = health_interval
+        self.health = None
+        self.resync_interval = resync_interval
+        self.resyncer = None
+        self.loader = None
+        self.last_used = time.monotonic()
+        self._token = None
+
+    def __str__(self):
+        return f'ZinoSession(username={self.username}, server={self.config.server})'
+
+    @property
+    def is_authenticated(self):
+        return self.event_manager.is_authenticated
+
+    @property
+    def is_following(self):
+        "Whether the events come from the journal of another process instead of an update handler"
+        return isinstance(self.pump, JournalFollower)
+
+    @property
+    def is_loading(self):
+        "Whether the events are being loaded into the store, see ``start_loading()``"
+        return self.loader is not None and self.loader.is_loading
+
+    @property
+    def idle_time(self):
+        return time.monotonic() - self.last_used
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def connect(self, token):
+        self._token = token
+        with self.lock:
+            if not self.event_manager.is_connected:
+                self.event_manager = SessionEventManager.configure(self.config)
+                self.event_manager.connect()
+                logger.info('Connected to Zino %s', self.event_manager.is_connected)
+
+            if not self.event_manager.is_authenticated:
+                self.event_manager.authenticate(username=self.username, password=token)
+                logger.info('Authenticated in Zino %s', self.event_manager.is_authenticated)
+
+        # Not holding the lock, fetching the events must not hold up requests and the update pump
+        self.connect_updatehandler()
+        if not self.is_following:
+            self.start_loading()  # Have the events on their way by the time the table is asked for
+        if self.health is None:
+            self.health = HealthMonitor(self.check_connection, self.reconnect, interval=self.health_interval)
+            self.health.start()
+        if self.resyncer is None and self.resync_interval:
+            self.resyncer = Resyncer(self.resync, self.store, self.resync_interval)
+            self.resyncer.start()
+
+    def reconnect(self):
+        "Connect again with the same token and load the events, in case updates were lost meanwhile"
+        self.stop_pump()
+        self.workers.close()
+        with self.lock:
+            self.event_manager.disconnect()
+        self.connect(self._token)  # Loads the events already when sharing them
+        if self.shared is None:
+            self.load_events()
+
+    def load_events(self):
+        "Fetch the events from Zino into the store, only those that changed if the store has events already"
+        if self.is_loading:
+            return
+        if self.store.is_loaded:
+            return self.resync()
+        self.start_loading()
+
+    def start_loading(self):
+        """Start loading the events into an empty store, unless they are loaded or loading already
+
+        The events are fetched concurrently over the worker connections and
+        added to the store as they arrive, see ``EventLoader``. Returns the
+        loader, None if the events were loaded already.
+        """
+        with self.lock:
+            if self.store.is_loaded and not self.is_loading:
+                return None
+            if self.loader is None or not self.loader.is_loading:
+                self.store.load({})  # Clients get the events as they are added
+                self.loader = EventLoader(self.store, self._get_event_ids,
+                                          lambda event_id: self.workers.submit(_fetch_event, event_id),
+                                          on_fetched=self._add_known_events, concurrency=self.workers.size)
+                self.loader.start()
+            return self.loader
+
+    def _get_event_ids(self):
+        with self.lock:
+            return self.event_manager.get_event_ids()
+
+    def _add_known_events(self, events):
+        with self.lock:
+            self.event_manager.events.update((event.id, event) for event in events)
+
+    def resync(self, check=None):
+        """Bring the events in the store in line with Zino, see ``resync_events()``
+
+        Events are fetched concurrently over the worker connections.
+        """
+        if self.is_following or self.is_loading:  # The publisher or the loader fetches the events
+            return Resync([], [], [])
+        result = resync_events(self.store, self._get_event_ids,
+                               lambda event_ids: self.workers.map(_fetch_event, event_ids), check=check)
+        self.share_known_events()
+        return result
+
+    def share_known_events(self):
+        "Let the event manager know the events in the store, the update handler ignores updates to unknown events"
+        with self.lock, self.store.lock:
+            known = self.event_manager.events  # Updated in place, the update handler holds on to it
+            for event_id in set(known).difference(self.store.events):
+                del known[event_id]
+            known.update(self.store.events)
+
+    def check_connection(self, timeout=10):
+        """Make a round trip to Zino, raise if it fails
+
+        Returns whether the events are still kept up to date.
+        """
+        if not self.lock.acquire(timeout=timeout):
+            raise TimeoutError("Zino connection busy")
+        try:
+            self.event_manager.test_connection()  # Fetches event with fake id
+        except ProtocolError:  # Event ID unknown, but connection is OK
+            pass
+        finally:
+            self.lock.release()
+        return self.pump is not None and self.pump.is_alive()
+
+    def connect_updatehandler(self):
+        with self.lock:
+            if not self.event_manager.is_authenticated:
+                raise NotConnectedError('Session not authenticated, cannot connect to UpdateHandler')
+            self.stop_pump()
+            if self.shared is not None and not self.shared.acquire():
+                self.start_follower()
+                return
+            self.updater = UpdateHandler(self.event_manager, autoremove=self.autoremove)
+            self.updater.connect()
+            logger.debug('Connected to UpdateHandler: %s', self.updater)
+            self.start_pump()
+            if self.shared is None:
+                return
+        # Followers wait for the events, fetch them now instead of on the first page load
+        self.load_events()
+        with self.lock:
+            self.journal_writer = JournalWriter(self.shared, self.store)
+            self.journal_writer.start()
+
+    def _connect_worker(self):
+        event_manager = SessionEventManager.configure(self.config)
+        event_manager.connect()
+        event_manager.authenticate(username=self.username, password=self._token)
+        return event_manager
+
+    def start_pump(self):
+        self.pump = UpdatePump(self.updater, self.store, self.lock, details=self.details)
+        self.pump.start()
+        logger.debug('Started update pump for %s', self)
+
+    def start_follower(self):
+        self.pump = JournalFollower(self.shared, self.store, on_promoted=self._promote)
+        self.pump.start()
+        logger.debug('Following %s for %s', self.shared, self)
+
+    def _promote(self):
+        try:
+            self.connect_updatehandler()
+        except Exception as e:
+            logger.exception('Taking over the update handler of %s failed: %s', self, e)
+            self.shared.release()
+
+    def stop_pump(self):
+        if self.pump is not None:
+            self.pump.stop()
+            self.pump = None
+            logger.debug('Stopped update pump for %s', self)
+        if self.journal_writer is not None:
+            self.journal_writer.stop()
+            self.journal_writer = None
+
+    def disconnect(self):
+        if self.health is not None:
+            self.health.stop()
+            self.health = None
+        if self.resyncer is not None:
+            self.resyncer.stop()
+            self.resyncer = None
+        if self.loader is not None:
+            self.loader.stop()
+            self.loader.join(5)  # Lets a reconnect know whether all events were loaded
+        self.stop_pump()
+        if self.shared is not None:
+            self.shared.release()
+        self.workers.close()
+        with self.lock:
+            self.event_manager.disconnect()
+            self.updater = None
+        logger.debug('Disconnected %s', self)
+
+
+class SessionPool:
+    """Zino sessions of logged in users, keyed on username
+
+    Sessions that have not been used for ``idle_timeout`` seconds are
+    disconnected and removed. When the pool is full the least recently used
+    session is evicted to make room for a new one. Disconnecting a session
+    can take seconds, so sessions evicted when getting or connecting one are
+    disconnected in a thread of their own.
+    """
+
+    def __init__(self, config, max_size=20, idle_timeout=3600, autoremove=False, workers=3, shared_dir="",
+                 health_interval=30, resync_interval=300):
+        self.config = config
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.autoremove = autoremove
+        self.workers = workers
+        self.shared_dir = shared_dir
+        self.health_interval = health_interval
+        self.resync_interval = resync_interval
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, username):
+        return username in self._sessions
+
+    def get(self, username):
+        "Get the session of ``username``, None if there is none"
+        with self._lock:
+            evicted = self._evict_idle()
+            zino_session = self._sessions.get(username)
+            if zino_session is not None:
+                zino_session.touch()
+                self._sessions.move_to_end(username)
+        self._disconnect_later(evicted)
+        return zino_session
+
+    def connect(self, username, token):
+        "Get the session of ``username``, connecting it to Zino if necessary"
+        with self._lock:
+            evicted = self._evict_idle()
+            zino_session = self._sessions.get(username)
+            if zino_session is None:
+                while len(self._sessions) >= self.max_size:
+                    _, lru_session = self._sessions.popitem(last=False)
+                    logger.warning('Zino session pool is full, evicting %s', lru_session)
+                    evicted.append(lru_session)
+                zino_session = ZinoSession(username, self.config, autoremove=self.autoremove, workers=self.workers,
+                                           shared_dir=self.shared_dir, health_interval=self.health_interval,
+                                           resync_interval=self.resync_interval)
+                self._sessions[username] = zino_session
+            zino_session.touch()
+            self._sessions.move_to_end(username)
+        self._disconnect_later(evicted)
+        zino_session.connect(token)
+        return zino_session
+
+    def remove(self, username):
+        "Disconnect and forget the session of ``username``"
+        with self._lock:
+            zino_session = self._sessions.pop(username, None)
+        if zino_session is not None:
+            self._disconnect([zino_session])
+        return zino_session
+
+    def evict_idle(self):
+        with self._lock:
+            evicted = self._evict_idle()
+        self._disconnect(evicted)
+        return evicted
+
+    def _evict_idle(self):
+        evicted = []
+        for username, zino_session in list(self._sessions.items()):
+            if zino_session.idle_time > self.idle_timeout:
+                logger.info('Evicting idle %s', zino_session)
+                evicted.append(self._sessions.pop(username))
+        return evicted
+
+    def _disconnect_later(self, zino_sessions):
+        "Disconnect ``zino_sessions`` without holding up the calling request"
+        if zino_sessions:
+            threading.Thread(target=self._disconnect, args=(zino_sessions,), name="howitz-session-evict",
+                             daemon=True).start()
+
+    @staticmethod
+    def _disconnect(zino_sessions):
+        for zino_session in zino_sessions:
+            try:
+                zino_session.disconnect()
+            except Exception as e:
+                logger.warning('Error when disconnecting %s: %s', zino_session, e)
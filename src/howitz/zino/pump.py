@@ -0,0 +1,88 @@
+import logging
+import threading
+
+from howitz.events.details import EventDetails
+
+
+__all__ = [
+    "UpdatePump",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpdatePump(threading.Thread):
+    """Drain the Zino push channel into an event store in the background
+
+    The pump owns the ``UpdateHandler`` of a Zino session. Every update is
+    applied to the ``EventStore`` as soon as it arrives, so that requests only
+    need to read the store.
+
+    The update handler refreshes the log and history of an updated event as
+    well, they are put in ``details`` (a ``DetailsCache``) if given.
+
+    ``lock`` guards the Zino session: ``UpdateHandler`` refreshes changed
+    events over the same request socket that is used when handling requests.
+    Handling an update can take a few round trips to Zino, so the lock is
+    taken for one update at a time, letting requests in between.
+    """
+    interval = 0.25  # Seconds to wait when there are no updates
+    batch_size = 100  # Max updates handled before checking whether to stop
+
+    def __init__(self, updater, store, lock, interval=None, details=None):
+        super().__init__(name="howitz-update-pump", daemon=True)
+        self.updater = updater
+        self.store = store
+        self.details = details
+        self.lock = lock
+        if interval is not None:
+            self.interval = interval
+        self.error = None
+        self._stopped = threading.Event()
+
+    @property
+    def is_stopped(self):
+        return self._stopped.is_set()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        logger.debug("Update pump started for %s", self.updater)
+        while not self.is_stopped:
+            try:
+                count = self.drain()
+            except Exception as e:
+                if not self.is_stopped:
+                    logger.exception("Update pump stopped by error: %s", e)
+                    self.error = e
+                break
+            if not count:
+                self._stopped.wait(self.interval)
+        logger.debug("Update pump stopped for %s", self.updater)
+
+    def drain(self):
+        "Apply waiting updates, return how many updates were handled"
+        count = 0
+        while count < self.batch_size and not self.is_stopped:
+            with self.lock:
+                event_id = self.updater.get_event_update()
+                if event_id is False:  # Nothing more to fetch right now
+                    break
+                count += 1
+                if event_id is not None:  # None is an update to an unknown event, ignored
+                    self.apply(event_id)
+        return count
+
+    def apply(self, event_id: int):
+        manager = self.updater.manager
+        event = manager.events.get(event_id)
+        if event is None or event_id in manager.removed_ids:
+            self.store.remove(event_id)
+            logger.debug("Removed event #%s from store", event_id)
+        else:
+            version = self.store.set(event)
+            if self.details is not None:
+                self.details.set(event_id, version, EventDetails.from_updated_event(event))
+            logger.debug("Updated event #%s in store", event_id)
@@ -0,0 +1,128 @@
+import bisect
+import logging
+import threading
+from typing import NamedTuple
+
+
+__all__ = [
+    "Resync",
+    "Resyncer",
+    "is_newer",
+    "resync_events",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class Resync(NamedTuple):
+    "Ids of the events a resync added, modified and removed"
+    added: list
+    modified: list
+    removed: list
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+
+def is_newer(event, current):
+    """Whether a fetched ``event`` should replace ``current``, the same event in the store
+
+    Events without an ``updated`` stamp cannot be told apart by age, they
+    are replaced.
+    """
+    if event.updated is None or current.updated is None:
+        return True
+    return event.updated > current.updated
+
+
+def resync_events(store, get_event_ids, fetch_events, check=None):
+    """Bring the events in ``store`` in line with those in Zino, fetching as few events as possible
+
+    ``get_event_ids()`` returns the ids of the events in Zino now, and
+    ``fetch_events(ids)`` fetches events, returning ``(id, event)`` tuples
+    where event is the exception raised if fetching it failed.
+
+    Events not in Zino are removed and new events are fetched and added. Of
+    the events that are in both, those in ``check`` are fetched as well,
+    all of them if ``check`` is None, and replaced if they have been updated
+    since. Changes are applied as such, so that clients only get the changes
+    on their next refresh.
+
+    The store may be changed by the update pump meanwhile: events that were
+    not in the store before the ids were fetched are never removed, and a
+    fetched event never replaces one with a later update.
+    """
+    with store.lock:
+        known = set(store.events)
+    event_ids = set(get_event_ids())
+    gone = known - event_ids
+    to_fetch = event_ids - known
+    to_fetch.update(event_ids & known if check is None else event_ids.intersection(check))
+
+    result = Resync([], [], [])
+    fetched = fetch_events(sorted(to_fetch))
+    with store.lock:
+        for event_id, event in fetched:
+            if isinstance(event, Exception):
+                logger.warning('Could not fetch event %s when resyncing: %s', event_id, event)
+                continue
+            current = store.events.get(event_id)
+            if current is None:
+                result.added.append(event_id)
+            elif is_newer(event, current):
+                result.modified.append(event_id)
+            else:
+                continue
+            store.set(event)
+        for event_id in gone:
+            if event_id in store.events:
+                store.remove(event_id)
+                result.removed.append(event_id)
+    return result
+
+
+class Resyncer(threading.Thread):
+    """Resync an event store every ``interval`` seconds, to catch updates that were missed
+
+    Every time the ids of the events are compared, and ``batch_size`` of the
+    events are checked for updates, taking turns so that every event gets
+    checked in the end. ``resync(check)`` does the work, see
+    ``resync_events()``.
+    """
+    batch_size = 100
+
+    def __init__(self, resync, store, interval: float, batch_size: int = None):
+        super().__init__(name="howitz-resync", daemon=True)
+        self.resync = resync
+        self.store = store
+        self.interval = interval
+        if batch_size is not None:
+            self.batch_size = batch_size
+        self.last_checked = None  # Id of the last event checked
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            if not self.store.is_loaded:
+                continue
+            try:
+                result = self.resync(self.next_batch())
+            except Exception as e:
+                logger.warning('Resyncing events failed: %s', e)
+                continue
+            if result:
+                logger.info('Resync caught missed updates: %s', result)
+
+    def next_batch(self):
+        "Ids of the next events to check"
+        with self.store.lock:
+            event_ids = sorted(self.store.events)
+        start = 0 if self.last_checked is None else bisect.bisect_right(event_ids, self.last_checked)
+        batch = (event_ids[start:] + event_ids[:start])[:self.batch_size]
+        if batch:
+            self.last_checked = batch[-1]
+        return batch
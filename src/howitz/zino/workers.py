@@ -0,0 +1,113 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from zinolib.controllers.zino1 import LostConnectionError, NotConnectedError
+
+
+__all__ = [
+    "ZinoWorkers",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class ZinoWorkers:
+    """A bounded pool of threads with Zino connections of their own
+
+    Zino answers one request at a time per connection. Requests that do not
+    depend on each other can run concurrently over these connections instead
+    of one after the other over the main connection of a session.
+
+    ``connect`` is called to make a new connected and authenticated event
+    manager, at most ``size`` connections are made. Connections are reused,
+    those that fail with a connection error are dropped.
+    """
+    CONNECTION_ERRORS = (OSError, LostConnectionError, NotConnectedError)
+
+    def __init__(self, connect, size: int = 3):
+        self.connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._connections = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __str__(self):
+        return f'ZinoWorkers(size={self.size}, connections={self._connections})'
+
+    def submit(self, func, *args):
+        "Run ``func(event_manager, *args)`` in a worker, return a future"
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="howitz-zino-worker")
+            return self._executor.submit(self._call, func, *args)
+
+    def map(self, func, items):
+        """Run ``func(event_manager, item)`` concurrently for every item
+
+        Returns a list of ``(item, result)`` tuples in the order of ``items``,
+        where result is the exception raised if ``func`` failed.
+        """
+        futures = [(item, self.submit(func, item)) for item in items]
+        results = []
+        for item, future in futures:
+            try:
+                results.append((item, future.result()))
+            except Exception as e:
+                results.append((item, e))
+        return results
+
+    def close(self):
+        "Stop the workers and disconnect all connections"
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        while True:
+            try:
+                event_manager = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._disconnect(event_manager)
+
+    def _call(self, func, *args):
+        event_manager = self._checkout()
+        try:
+            result = func(event_manager, *args)
+        except self.CONNECTION_ERRORS:
+            self._disconnect(event_manager)
+            raise
+        except Exception:
+            self._idle.put(event_manager)
+            raise
+        self._idle.put(event_manager)
+        return result
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        # There are never more threads than connections, so a thread that
+        # finds no idle connection may make a new one
+        with self._lock:
+            self._connections += 1
+        try:
+            event_manager = self.connect()
+        except Exception:
+            with self._lock:
+                self._connections -= 1
+            raise
+        logger.debug('Connected worker for %s', self)
+        return event_manager
+
+    def _disconnect(self, event_manager):
+        with self._lock:
+            self._connections -= 1
+        try:
+            event_manager.disconnect()
+        except Exception as e:
+            logger.warning('Error when disconnecting worker: %s', e)
@@ -0,0 +1,44 @@
+import gc
+import sqlite3
+import threading
+
+import pytest
+
+from howitz.connections import ThreadConnections
+
+
+@pytest.fixture()
+def connections(tmp_path):
+    connections = ThreadConnections(lambda: sqlite3.connect(tmp_path / "db.sqlite3", check_same_thread=False))
+    yield connections
+    connections.close()
+
+
+def in_thread(function):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class TestThreadConnections:
+    def test_thread_should_reuse_its_connection(self, connections):
+        assert connections.get() is connections.get()
+
+    def test_threads_should_have_connections_of_their_own(self, connections):
+        assert in_thread(connections.get) is not connections.get()
+
+    def test_connection_should_be_closed_when_its_thread_ends(self, connections):
+        connection = in_thread(connections.get)
+        gc.collect()
+        assert len(connections) == 0
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+
+    def test_close_should_close_connections_of_all_threads(self, connections):
+        connection = connections.get()
+        connections.close()
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+        assert connections.get() is not connection
@@ -1,9 +1,21 @@
 import random
+import time
 import pytest
 from datetime import datetime, timezone
 from zinolib.event_types import Event, AdmState, PortState, BFDState, ReachabilityState, PortStateEvent
-from howitz.endpoints import sort_events, EventSort, get_priority
+from howitz.endpoints import sort_events, EventSort, stream_rows_template
+from howitz.events.sorting import get_priority
 from flask import Flask
+from jinja2 import DictLoader
+
+from howitz import create_app
+from howitz.events.store import EventStore
+from howitz.sessions import encode_session
+from howitz.users.model import User
+from howitz.zino.pool import ZinoSession
+from howitz.zino.workers import ZinoWorkers
+
+from .test_zino_bulk import FakeManager
 
 test_app = Flask("test")
 
@@ -165,6 +177,170 @@ def downtime_events():
     return events_dict
 
 
+class TestStreamRowsTemplate:
+    def test_output_should_be_streamed_in_chunks(self):
+        app = Flask("test")
+        app.jinja_loader = DictLoader({"rows.html": "{% for row in rows %}<tr>{{ row }}</tr>{% endfor %}"})
+        with app.test_request_context():
+            chunks = list(stream_rows_template("rows.html", chunk_size=100, rows=iter(range(100))))
+        assert "".join(chunks) == "".join(f"<tr>{i}</tr>" for i in range(100))
+        assert 1 < len(chunks) < 20
+        assert all(len(chunk) >= 100 for chunk in chunks[:-1])
+
+
+class TestAuth:
+    def test_login_should_issue_new_session_id(self, app):
+        client = app.test_client()
+        planted_sid = "planted-by-someone-else"
+        app.session_interface.backend.save(planted_sid, encode_session({"sort_by": "raw"}), time.time() + 60)
+        client.set_cookie("session", planted_sid)
+        client.post("/auth", data={"username": "foo", "password": "bar"})
+        sid = client.get_cookie("session").value
+        assert sid != planted_sid
+        assert app.session_interface.backend.load(planted_sid) is None
+        assert app.session_interface.backend.load(sid) is not None
+
+    def test_logout_should_issue_new_session_id(self, app, client):
+        sid = client.get_cookie("session").value
+        client.get("/logout")
+        assert app.session_interface.backend.load(sid) is None
+        cookie = client.get_cookie("session")
+        assert cookie is None or cookie.value != sid
+
+
+class TestRevalidation:
+    def test_get_events_should_answer_304_without_body_if_view_is_unchanged(self, client):
+        response = client.get("/get_events")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        response = client.get("/get_events", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etag
+
+    def test_get_events_etag_should_change_with_the_store(self, client, zino_session):
+        etag = client.get("/get_events").headers["ETag"]
+        zino_session.store.set(make_event(4))
+        response = client.get("/get_events", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_get_events_etag_should_change_with_the_sort_order(self, client):
+        etag = client.get("/get_events").headers["ETag"]
+        with client.session_transaction() as session:
+            session["sort_by"] = "age"
+        response = client.get("/get_events", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_get_events_etag_should_change_with_the_filter(self, client):
+        etag = client.get("/get_events").headers["ETag"]
+        with client.session_transaction() as session:
+            session["event_filter"] = {"routers": ["router1"]}
+        response = client.get("/get_events", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_footer_should_answer_304_without_body_until_the_store_changes(self, client, zino_session):
+        etag = client.get("/footer").headers["ETag"]
+        response = client.get("/footer", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+        zino_session.store.set(make_event(4))
+        response = client.get("/footer", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_refresh_events_should_answer_204_at_the_current_version(self, client, zino_session):
+        client.get("/get_events")
+        response = client.get("/refresh_events", query_string={"events_version": zino_session.store.version_tag()})
+        assert response.status_code == 204
+        assert response.data == b""
+
+    def test_refresh_events_should_render_rows_when_behind(self, client, zino_session):
+        client.get("/get_events")
+        version_tag = zino_session.store.version_tag()
+        zino_session.store.set(make_event(4))
+        response = client.get("/refresh_events", query_string={"events_version": version_tag})
+        assert response.status_code == 200
+        assert b"event-accordion-row-4" in response.data
+
+    def test_refresh_events_should_render_all_rows_for_version_of_replaced_store(self, client, zino_session):
+        client.get("/get_events")
+        version_tag = zino_session.store.version_tag()
+        zino_session.store = EventStore()
+        zino_session.store.load({event_id: make_event(event_id) for event_id in (1, 2, 3)})
+        zino_session.store.set(make_event(4))
+        response = client.get("/refresh_events", query_string={"events_version": version_tag})
+        assert response.status_code == 200
+        assert b"event-accordion-row-1" in response.data
+        assert b"event-accordion-row-4" in response.data
+
+
+class TestBulkActions:
+    def test_bulk_update_status_should_update_the_selected_events_in_a_job(self, app, client, zino_session):
+        zino_session.workers = ZinoWorkers(FakeManager, size=2)
+        zino_session.store.set(make_event(4).model_copy(update={"adm_state": AdmState.CLOSED}))
+        with client.session_transaction() as session:
+            session["selected_events"] = {"1": "", "2": "", "4": ""}
+        response = client.post("/event/bulk_update_status", data={"event-state": "working", "event-history": ""})
+        assert response.status_code == 200
+        [job] = app.jobs._jobs.values()
+        for _ in range(100):
+            if job.is_finished:
+                break
+            time.sleep(0.05)
+        assert job.counts()["done"] == 2
+        assert job.failures() == {4: "Cannot set state on closed event"}
+        assert zino_session.store.events[1].adm_state == AdmState.WORKING
+        assert zino_session.store.events[3].adm_state == AdmState.OPEN
+        with client.session_transaction() as session:
+            assert session["selected_events"] == {}
+        zino_session.workers.close()
+
+
+class TestCollapseRow:
+    def test_collapse_should_render_event_from_the_store(self, client, zino_session, monkeypatch):
+        def create_event_from_id(event_id):
+            raise AssertionError("Zino was asked for an event in the store")
+
+        monkeypatch.setattr(zino_session.event_manager, "create_event_from_id", create_event_from_id)
+        with client.session_transaction() as session:
+            session["expanded_events"] = {"2": ""}
+        response = client.get("/events/2/collapse_row")
+        assert response.status_code == 200
+        assert b"event-accordion-row-2" in response.data
+        with client.session_transaction() as session:
+            assert session["expanded_events"] == {}
+
+    def test_collapse_should_ask_zino_for_event_not_in_the_store(self, client, zino_session, monkeypatch):
+        monkeypatch.setattr(zino_session.event_manager, "create_event_from_id", make_event)
+        response = client.get("/events/9/collapse_row")
+        assert response.status_code == 200
+        assert b"event-accordion-row-9" in response.data
+
+
+class TestEventStream:
+    def test_stream_should_tell_of_changes_to_the_events(self, app, client, zino_session):
+        app.howitz_config["event_stream"] = True
+        response = client.get("/events/stream", buffered=False)
+        assert response.mimetype == "text/event-stream"
+        assert response.headers["Cache-Control"] == "no-cache"
+        stream = response.iter_encoded()
+        assert next(stream) == f"event: eventsChanged\ndata: {zino_session.store.version}\n\n".encode()
+        zino_session.store.set(make_event(4))
+        assert next(stream) == f"event: eventsChanged\ndata: {zino_session.store.version}\n\n".encode()
+        response.close()
+
+    def test_stream_should_be_off_by_default(self, client):
+        assert client.get("/events/stream").status_code == 404
+
+    def test_stream_should_be_off_if_not_configured(self, app, client):
+        del app.howitz_config["event_stream"]
+        assert client.get("/events/stream").status_code == 404
+        assert client.get("/").status_code == 200
+
+
 class TestGetPriority:
     def test_closed_events_that_indicate_status_down_should_have_priority_0(self, events_of_each_type):
         events = events_of_each_type(adm_state=AdmState.CLOSED, is_down=True)
@@ -340,3 +516,68 @@ def events_of_each_type(get_priority_boilerplate_event):
         return res
 
     return _events_of_each_type
+
+
+class FakePump:
+    error = None
+
+    def is_alive(self):
+        return True
+
+    def stop(self):
+        pass
+
+
+class FakeZinoSession(ZinoSession):
+    "A Zino session with its events loaded and kept up to date, without a Zino server"
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    def connect(self, token):
+        self.pump = FakePump()
+
+
+@pytest.fixture()
+def app(tmp_path):
+    test_config = {
+        "flask": {"SECRET_KEY": "secret", "TESTING": True},
+        "howitz": {"storage": str(tmp_path / "howitz.sqlite3"), "devmode": True, "password_workers": 0},
+        "zino": {"connections": {"default": {"server": "127.0.0.1"}}},
+    }
+    app = create_app(test_config)
+    app.database.add(User(username="foo", password="bar", token="xux"))
+    zino_session = FakeZinoSession("foo", app.zino_config, health_interval=0, resync_interval=0)
+    zino_session.store.load({event_id: make_event(event_id) for event_id in (1, 2, 3)})
+    app.zino_sessions._sessions["foo"] = zino_session
+    yield app
+    app.jobs.close()
+    app.database.close()
+
+
+@pytest.fixture()
+def zino_session(app):
+    return app.zino_sessions._sessions["foo"]
+
+
+@pytest.fixture()
+def client(app):
+    client = app.test_client()
+    response = client.post("/auth", data={"username": "foo", "password": "bar"})
+    assert response.headers["HX-Redirect"] == "/"
+    client.get("/")  # Sets up the UI state of the session
+    return client
+
+
+def make_event(event_id):
+    now = datetime.now(timezone.utc)
+    return Event.create({
+        "id": event_id,
+        "type": Event.Type.REACHABILITY,
+        "adm_state": AdmState.OPEN,
+        "router": "router1",
+        "opened": now,
+        "updated": now,
+        "reachability": "reachable",
+    })
@@ -0,0 +1,71 @@
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+import pytest
+from zinolib.event_types import AdmState, Event
+
+from howitz.events.counters import EventCounters
+from howitz.events.store import EventStore
+
+
+def make_event(event_id, rng):
+    now = datetime.now(timezone.utc)
+    return Event.create({
+        "id": event_id,
+        "type": Event.Type.PORTSTATE,
+        "adm_state": rng.choice([AdmState.OPEN, AdmState.IGNORED, AdmState.WORKING, AdmState.CLOSED]),
+        "router": rng.choice(["router1", "router2", "router3"]),
+        "opened": now,
+        "updated": now,
+        "if_index": event_id,
+        "port_state": rng.choice(["up", "down"]),
+    })
+
+
+def count(events, field):
+    get_value = EventCounters.FIELDS[field]
+    return Counter(get_value(event) for event in events.values())
+
+
+@pytest.fixture()
+def rng():
+    return random.Random(1234)
+
+
+@pytest.fixture()
+def events(rng):
+    return {i: make_event(i, rng) for i in range(1, 100)}
+
+
+class TestEventCounters:
+    @pytest.mark.parametrize("field", EventCounters.FIELDS)
+    def test_counts_should_follow_changes(self, events, rng, field):
+        counters = EventCounters(events)
+        for i in range(200):
+            event_id = rng.randrange(1, 150)
+            if rng.random() < 0.3:
+                events.pop(event_id, None)
+                counters.remove(event_id)
+            else:
+                events[event_id] = make_event(event_id, rng)
+                counters.set(events[event_id])
+        assert counters.counts(field) == count(events, field)
+        assert len(counters) == len(events)
+
+    def test_values_no_event_has_should_not_be_counted(self, rng):
+        counters = EventCounters()
+        event = make_event(1, rng)
+        counters.set(event)
+        counters.remove(1)
+        assert counters.as_dict() == {"total": 0, **{field: {} for field in EventCounters.FIELDS}}
+
+    def test_store_stats_should_count_the_events_of_the_store(self, events, rng):
+        store = EventStore()
+        store.load(events)
+        store.set(make_event(200, rng))
+        store.remove(1)
+        version, stats = store.stats()
+        assert version == store.version
+        assert stats["total"] == len(store)
+        assert stats["adm_state"] == count(store.events, "adm_state")
@@ -0,0 +1,145 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from werkzeug.datastructures import MultiDict
+from zinolib.event_types import AdmState, Event
+
+from howitz.events.filtering import EventFilter, FilterIndex
+from howitz.events.sorting import EventSort, SortedIndex
+from howitz.events.store import EventStore
+
+
+def make_event(event_id, rng):
+    now = datetime.now(timezone.utc)
+    return Event.create({
+        "id": event_id,
+        "type": Event.Type.PORTSTATE,
+        "adm_state": rng.choice([AdmState.OPEN, AdmState.IGNORED, AdmState.WORKING, AdmState.CLOSED]),
+        "router": rng.choice(["router1", "router2", "router3"]),
+        "opened": now - timedelta(minutes=rng.randrange(120)),
+        "updated": now,
+        "if_index": event_id,
+        "port_state": rng.choice(["up", "down"]),
+        "port": rng.choice(["ge-0/0/1", "xe-1/0/2", "et-2/0/0"]),
+        "descr": rng.choice(["Uplink to core", "customer link", "backup"]),
+    })
+
+
+FILTERS = [
+    EventFilter(routers=frozenset({"router1"})),
+    EventFilter(routers=frozenset({"router1", "router2"}), adm_states=frozenset({"open"})),
+    EventFilter(op_states=frozenset({"PORT down"}), priorities=frozenset({4})),
+    EventFilter(types=frozenset({"portstate"}), port="^xe-"),
+    EventFilter(description="LINK"),
+    EventFilter(min_age=30, max_age=60),
+    EventFilter(routers=frozenset({"nonexistent"})),
+]
+
+
+@pytest.fixture()
+def rng():
+    return random.Random(1234)
+
+
+@pytest.fixture()
+def events(rng):
+    return {i: make_event(i, rng) for i in range(1, 200)}
+
+
+class TestEventFilter:
+    def test_filter_should_survive_a_round_trip_through_a_dict(self):
+        event_filter = EventFilter(routers=frozenset({"router1"}), priorities=frozenset({3, 4}), port="ge-", min_age=5)
+        assert EventFilter.from_dict(event_filter.to_dict()) == event_filter
+
+    def test_filter_should_be_read_from_a_form(self):
+        form = MultiDict([("routers", "router1"), ("routers", "router2"), ("priorities", "4"), ("max_age", "10"),
+                          ("min_age", ""), ("description", " core ")])
+        event_filter = EventFilter.from_dict(form)
+        assert event_filter.routers == {"router1", "router2"}
+        assert event_filter.priorities == {4}
+        assert event_filter.max_age == 10
+        assert event_filter.min_age is None
+        assert event_filter.description == "core"
+
+    @pytest.mark.parametrize("data", [{"port": "("}, {"min_age": "-1"}, {"max_age": "many"}])
+    def test_invalid_filter_should_fail(self, data):
+        with pytest.raises(ValueError):
+            EventFilter.from_dict(data)
+
+    def test_empty_filter_should_be_false_and_have_no_tag(self):
+        assert not EventFilter()
+        assert EventFilter().tag == ""
+        assert EventFilter(port="ge-")
+        assert EventFilter(port="ge-").tag != EventFilter(port="xe-").tag
+
+    def test_only_filters_on_age_should_be_volatile(self):
+        assert EventFilter(max_age=10).is_volatile
+        assert EventFilter(min_age=0).is_volatile
+        assert not EventFilter(routers=frozenset({"router1"}), port="ge-").is_volatile
+
+
+class TestFilterIndex:
+    @pytest.mark.parametrize("event_filter", FILTERS)
+    def test_select_should_find_the_matching_events(self, events, event_filter):
+        index = FilterIndex(events)
+        assert index.select(event_filter, events) == {i for i, event in events.items() if event_filter.matches(event)}
+
+    @pytest.mark.parametrize("event_filter", FILTERS)
+    def test_select_should_follow_changes(self, events, rng, event_filter):
+        index = FilterIndex(events)
+        for i in range(100):
+            event_id = rng.randrange(1, 250)
+            if rng.random() < 0.2:
+                events.pop(event_id, None)
+                index.remove(event_id)
+            else:
+                events[event_id] = make_event(event_id, rng)
+                index.set(events[event_id])
+        assert index.select(event_filter, events) == {i for i, event in events.items() if event_filter.matches(event)}
+
+    def test_values_should_only_list_values_in_use(self, events):
+        index = FilterIndex(events)
+        assert index.values("router") == ["router1", "router2", "router3"]
+        for event_id, event in events.items():
+            if event.router == "router2":
+                index.remove(event_id)
+        assert index.values("router") == ["router1", "router3"]
+
+
+class TestFilteredSortedIndex:
+    def test_pages_should_only_hold_matching_events_in_order(self, events):
+        index = SortedIndex(EventSort.AGE, events)
+        selected = FilterIndex(events).select(FILTERS[0], events)
+        pages = []
+        after = None
+        while True:
+            ids, after = index.page(after=after, size=10, where=selected)
+            pages.extend(ids)
+            if after is None:
+                break
+        assert pages == [i for i in index if i in selected]
+
+    def test_previous_should_skip_events_not_matching(self, events):
+        index = SortedIndex(EventSort.AGE, events)
+        selected = FilterIndex(events).select(FILTERS[0], events)
+        ordered = [i for i in index if i in selected]
+        for position, event_id in enumerate(ordered):
+            assert index.previous(event_id, where=selected) == (ordered[position - 1] if position else None)
+
+
+class TestFilteredEventStore:
+    def test_sorted_page_should_only_hold_matching_events(self, events, rng):
+        store = EventStore()
+        store.load(events)
+        store.set(make_event(500, rng))
+        store.remove(1)
+        event_filter = FILTERS[1]
+        _, page, _ = store.sorted_page(EventSort.AGE, size=1000, event_filter=event_filter)
+        assert [event.id for _, event in page] == [i for i in store.index(EventSort.AGE)
+                                                   if event_filter.matches(store.events[i])]
+
+    def test_empty_filter_should_select_None(self, events):
+        store = EventStore()
+        store.load(events)
+        assert store.select(EventFilter()) is None
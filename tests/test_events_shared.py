@@ -0,0 +1,151 @@
+import os
+import time
+
+import pytest
+
+from howitz.events.shared import JournalFollower, JournalWriter, SharedEvents
+from howitz.events.store import EventStore
+
+from .test_events_store import make_event
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture()
+def shared(tmp_path):
+    shared = SharedEvents(str(tmp_path / "shared"), "zino:8001:user")
+    yield shared
+    shared.release()
+
+
+@pytest.fixture()
+def store():
+    store = EventStore()
+    store.load({i: make_event(i) for i in (1, 2, 3)})
+    return store
+
+
+class TestSharedEvents:
+    def test_only_one_should_publish(self, shared):
+        other = SharedEvents(shared.directory, "zino:8001:user")
+        assert shared.acquire()
+        assert shared.acquire()
+        assert not other.acquire()
+        shared.release()
+        assert other.acquire()
+        other.release()
+
+    def test_other_users_should_publish_on_their_own(self, shared):
+        other = SharedEvents(shared.directory, "zino:8001:other")
+        assert shared.acquire()
+        assert other.acquire()
+        assert other.path != shared.path
+        other.release()
+
+
+class TestJournalFollower:
+    def test_snapshot_should_load_the_store(self, shared, store):
+        shared.acquire()
+        shared.write_snapshot(store.events)
+        follower_store = EventStore()
+        assert JournalFollower(shared, follower_store).follow() == 1
+        assert follower_store.is_loaded
+        assert follower_store.events == store.events
+
+    def test_appended_changes_should_be_applied(self, shared, store):
+        shared.acquire()
+        shared.write_snapshot(store.events)
+        follower_store = EventStore()
+        follower = JournalFollower(shared, follower_store)
+        follower.follow()
+        version = follower_store.version
+        shared.append([("set", make_event(4)), ("remove", 2)])
+        assert follower.follow() == 2
+        assert sorted(follower_store.events) == [1, 3, 4]
+        changes = follower_store.changes_since(version)
+        assert changes.added == [4]
+        assert changes.removed == [2]
+
+    def test_new_snapshot_should_be_applied_as_changes(self, shared, store):
+        shared.acquire()
+        shared.write_snapshot(store.events)
+        follower_store = EventStore()
+        follower = JournalFollower(shared, follower_store)
+        follower.follow()
+        version = follower_store.version
+        shared.write_snapshot({1: store.events[1], 3: store.events[3], 5: make_event(5)})
+        assert follower.follow() == 1
+        changes = follower_store.changes_since(version)
+        assert changes.added == [5]
+        assert changes.removed == [2]
+        assert not changes.modified
+
+    def test_partly_written_record_should_wait(self, shared, store):
+        shared.acquire()
+        shared.write_snapshot(store.events)
+        follower = JournalFollower(shared, EventStore())
+        follower.follow()
+        with open(shared.path, "ab") as f:
+            f.write(b"\x00\x00")
+        assert follower.follow() == 0
+
+    def test_follower_should_take_over_when_the_publisher_goes_away(self, shared, store):
+        shared.acquire()
+        shared.write_snapshot(store.events)
+        promoted = []
+        follower_shared = SharedEvents(shared.directory, "zino:8001:user")
+        follower = JournalFollower(follower_shared, EventStore(), on_promoted=lambda: promoted.append(True))
+        follower.interval = follower.takeover_interval = 0.01
+        follower.start()
+        assert wait_until(lambda: follower.store.is_loaded)
+        assert follower.is_alive()
+        shared.release()
+        follower.join(5)
+        assert promoted
+        assert follower_shared.is_publisher
+        follower_shared.release()
+
+
+class TestJournalWriter:
+    def test_follower_should_keep_up_with_the_writer(self, shared, store):
+        shared.acquire()
+        writer = JournalWriter(shared, store)
+        writer.interval = 0.01
+        writer.start()
+        follower_store = EventStore()
+        follower = JournalFollower(shared, follower_store)
+        try:
+            assert wait_until(lambda: follower.follow() or follower_store.is_loaded)
+            store.set(make_event(4))
+            store.remove(1)
+            assert wait_until(lambda: follower.follow() or sorted(follower_store.events) == [2, 3, 4])
+            store.load({7: make_event(7)})
+            assert wait_until(lambda: follower.follow() or sorted(follower_store.events) == [7])
+        finally:
+            writer.stop()
+            writer.join()
+        assert writer.error is None
+
+    def test_writer_should_compact_the_journal(self, shared, store):
+        shared.acquire()
+        writer = JournalWriter(shared, store)
+        writer.interval = 0.01
+        writer.compact_after = 2
+        writer.start()
+        try:
+            assert wait_until(lambda: os.path.exists(shared.path))
+            for i in range(4, 10):
+                store.set(make_event(i))
+                time.sleep(0.05)  # One change at a time
+        finally:
+            writer.stop()
+            writer.join()
+        follower_store = EventStore()
+        records = JournalFollower(shared, follower_store).follow()
+        assert records <= 1 + writer.compact_after
+        assert sorted(follower_store.events) == list(range(1, 10))
@@ -0,0 +1,136 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from zinolib.event_types import AdmState, Event
+
+from howitz.events.sorting import EventSort, SortedIndex, decode_cursor, encode_cursor, get_priority
+
+
+def make_event(event_id, rng):
+    now = datetime.now(timezone.utc)
+    return Event.create({
+        "id": event_id,
+        "type": rng.choice([Event.Type.REACHABILITY, Event.Type.ALARM]),
+        "adm_state": rng.choice([AdmState.OPEN, AdmState.IGNORED, AdmState.WORKING, AdmState.CLOSED]),
+        "router": "router1",
+        "opened": now - timedelta(minutes=rng.randrange(5)),
+        "updated": now - timedelta(minutes=rng.randrange(5)),
+        "reachability": "reachable",
+        "alarm_count": 0,
+        "alarm_type": "yellow",
+    })
+
+
+def full_sort(events, sort_by):
+    "The order of a complete sort of ``events``, ties in the order of the event ids"
+    events = dict(sorted(events.items()))
+    if sort_by == EventSort.DEFAULT:
+        return sorted(events)
+    if sort_by == EventSort.LASTTRANS:
+        return list(reversed(sorted(events, key=lambda k: (
+            0 if events[k].adm_state == AdmState.IGNORED else 1, events[k].updated))))
+    if sort_by == EventSort.SEVERITY:
+        return sorted(events, key=lambda k: (get_priority(events[k]), events[k].type), reverse=True)
+    return sorted(events, key=lambda k: getattr(events[k], sort_by.attribute), reverse=sort_by.reversed)
+
+
+SORTS = [sort_by for sort_by in EventSort if not sort_by.is_volatile]
+
+
+@pytest.fixture()
+def rng():
+    return random.Random(1234)
+
+
+@pytest.fixture()
+def events(rng):
+    return {i: make_event(i, rng) for i in range(1, 40)}
+
+
+class TestSortedIndex:
+    @pytest.mark.parametrize("sort_by", SORTS, ids=str)
+    def test_index_should_have_the_order_of_a_full_sort(self, events, sort_by):
+        assert list(SortedIndex(sort_by, events)) == full_sort(events, sort_by)
+
+    @pytest.mark.parametrize("sort_by", SORTS, ids=str)
+    def test_index_should_keep_order_when_events_change(self, events, rng, sort_by):
+        index = SortedIndex(sort_by, events)
+        for i in range(50):
+            event_id = rng.randrange(1, 50)
+            if rng.random() < 0.2:
+                events.pop(event_id, None)
+                index.remove(event_id)
+            else:
+                events[event_id] = make_event(event_id, rng)
+                index.set(events[event_id])
+        assert list(index) == full_sort(events, sort_by)
+        assert len(index) == len(events)
+
+    @pytest.mark.parametrize("sort_by", SORTS, ids=str)
+    def test_position_and_previous_should_follow_display_order(self, events, sort_by):
+        index = SortedIndex(sort_by, events)
+        ordered = list(index)
+        for position, event_id in enumerate(ordered):
+            assert index.position(event_id) == position
+            assert index.previous(event_id) == (ordered[position - 1] if position else None)
+
+    def test_removing_unknown_event_should_do_nothing(self, events):
+        index = SortedIndex(EventSort.AGE, events)
+        index.remove(999)
+        assert len(index) == len(events)
+
+    def test_only_downtime_sorts_should_get_outdated(self, events):
+        index = SortedIndex(EventSort.DOWN, events)
+        assert not index.is_outdated()
+        index.built_at -= SortedIndex.max_age + 1
+        assert index.is_outdated()
+        index = SortedIndex(EventSort.AGE, events)
+        index.built_at -= SortedIndex.max_age + 1
+        assert not index.is_outdated()
+
+    @pytest.mark.parametrize("sort_by", SORTS, ids=str)
+    def test_pages_should_follow_display_order(self, events, sort_by):
+        index = SortedIndex(sort_by, events)
+        pages = []
+        after = None
+        while True:
+            ids, after = index.page(after=after, size=7)
+            pages.append(ids)
+            if after is None:
+                break
+        assert [len(ids) for ids in pages] == [7] * 5 + [4]
+        assert sum(pages, []) == list(index)
+
+    @pytest.mark.parametrize("sort_by", SORTS, ids=str)
+    def test_page_should_end_at_the_given_key(self, events, sort_by):
+        index = SortedIndex(sort_by, events)
+        ordered = list(index)
+        end = index.key(events[ordered[9]])
+        ids, last_key = index.page(end=end)
+        assert ids == ordered[:10]
+        assert last_key == end
+        assert [i for i in ordered if index.includes(i, end)] == ordered[:10]
+
+    def test_last_page_should_have_no_last_key(self, events):
+        index = SortedIndex(EventSort.AGE, events)
+        ids, last_key = index.page(size=len(events))
+        assert len(ids) == len(events)
+        assert last_key is None
+        assert index.includes(ids[-1], None)
+
+
+class TestCursor:
+    @pytest.mark.parametrize("sort_by", list(EventSort), ids=str)
+    def test_cursor_should_decode_to_the_same_key(self, events, sort_by):
+        index = SortedIndex(sort_by, events)
+        key = index.key(events[1])
+        assert decode_cursor(sort_by, encode_cursor(sort_by, key)) == key
+
+    def test_cursor_of_the_end_should_decode_to_none(self):
+        assert decode_cursor(EventSort.AGE, encode_cursor(EventSort.AGE, None)) is None
+
+    @pytest.mark.parametrize("cursor", ["", "age", "upd.", "age.notbase64!", "age.WyJhIiwgMV0="])
+    def test_bad_cursor_should_fail(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(EventSort.AGE, cursor)
@@ -0,0 +1,214 @@
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from zinolib.event_types import Event, AdmState
+
+from howitz.events.details import DetailsCache, EventDetails
+from howitz.events.store import EventStore
+from howitz.zino.pump import UpdatePump
+
+
+def make_event(event_id):
+    now = datetime.now(timezone.utc)
+    return Event.create({
+        "id": event_id,
+        "type": Event.Type.REACHABILITY,
+        "adm_state": AdmState.OPEN,
+        "router": "router1",
+        "opened": now,
+        "updated": now,
+        "reachability": "reachable",
+    })
+
+
+@pytest.fixture()
+def store():
+    store = EventStore()
+    store.load({i: make_event(i) for i in (1, 2, 3)})
+    return store
+
+
+class TestEventStore:
+    def test_load_should_bump_version(self):
+        store = EventStore()
+        version = store.load({1: make_event(1)})
+        assert version == store.version == 1
+        assert len(store) == 1
+
+    def test_nothing_should_have_changed_since_current_version(self, store):
+        changes = store.changes_since(store.version)
+        assert changes.version == store.version
+        assert not changes
+
+    def test_changes_since_should_list_added_modified_and_removed_ids(self, store):
+        since = store.version
+        store.set(make_event(4))
+        store.set(make_event(1))
+        store.remove(2)
+        changes = store.changes_since(since)
+        assert changes.version == since + 3
+        assert changes.added == [4]
+        assert changes.modified == [1]
+        assert changes.removed == [2]
+        assert 2 not in store.events
+
+    def test_event_added_and_removed_since_version_should_be_left_out(self, store):
+        since = store.version
+        store.set(make_event(4))
+        store.set(make_event(4))
+        store.remove(4)
+        assert not store.changes_since(since)
+
+    def test_event_removed_and_added_again_should_be_modified(self, store):
+        since = store.version
+        store.remove(1)
+        store.set(make_event(1))
+        changes = store.changes_since(since)
+        assert changes.modified == [1]
+        assert changes.added == changes.removed == []
+
+    def test_removing_unknown_event_should_not_bump_version(self, store):
+        since = store.version
+        assert store.remove(99) == since
+
+    def test_changes_since_before_last_load_should_return_None(self, store):
+        since = store.version
+        store.load({})
+        assert store.changes_since(since) is None
+
+    def test_changes_since_None_should_return_None(self, store):
+        assert store.changes_since(None) is None
+
+    def test_changes_since_future_version_should_return_None(self, store):
+        assert store.changes_since(store.version + 1) is None
+
+    def test_changes_since_version_dropped_from_changelog_should_return_None(self):
+        store = EventStore(changelog_size=2)
+        since = store.load({})
+        store.set(make_event(1))
+        assert store.changes_since(since) is not None
+        store.set(make_event(2))
+        store.set(make_event(3))
+        assert store.changes_since(since) is None
+        assert store.changes_since(since + 1).added == [3, 2]
+
+    def test_version_tag_should_be_parsed_by_same_store_only(self, store):
+        other = EventStore()
+        other.load({})
+        assert store.parse_version_tag(store.version_tag()) == store.version
+        assert other.parse_version_tag(store.version_tag()) is None
+        assert store.version_tag() != other.version_tag()
+
+    @pytest.mark.parametrize("tag", [None, "", "1", "-1", "abc-def"])
+    def test_malformed_version_tag_should_not_be_parsed(self, store, tag):
+        assert store.parse_version_tag(tag) is None
+
+    def test_wait_for_change_should_return_current_version_on_timeout(self, store):
+        assert store.wait_for_change(store.version, timeout=0.01) == store.version
+
+    def test_wait_for_change_should_wake_up_on_change(self, store):
+        since = store.version
+        timer = threading.Timer(0.01, store.set, args=(make_event(4),))
+        timer.start()
+        assert store.wait_for_change(since, timeout=5) == since + 1
+        timer.join()
+
+    def test_snapshot_should_be_a_copy(self, store):
+        version, snapshot = store.snapshot()
+        assert version == store.version
+        store.remove(1)
+        assert 1 in snapshot
+
+    def test_table_event_should_be_made_once_per_version(self, store):
+        table_event = store.table_event(store.events[1])
+        assert store.table_event(store.events[1]) is table_event
+        store.set(make_event(1))
+        assert store.table_event(store.events[1]) is not table_event
+
+
+class TestDetailsCache:
+    def test_details_should_be_valid_until_event_changes(self, store):
+        details = DetailsCache(store)
+        details.set(1, store.event_versions[1], EventDetails(store.events[1], [], []))
+        assert details.get(1) is not None
+        store.set(make_event(1))
+        assert details.get(1) is None
+        assert details.missing([1, 2]) == [1, 2]
+
+    def test_details_of_event_not_in_store_should_not_be_cached(self, store):
+        details = DetailsCache(store)
+        details.set(99, None, EventDetails(make_event(99), [], []))
+        assert 99 not in details
+
+
+class FakeManager:
+    def __init__(self, events):
+        self.events = events
+        self.removed_ids = set()
+
+
+class FakeUpdater:
+    def __init__(self, manager, updates):
+        self.manager = manager
+        self.updates = list(updates)
+
+    def get_event_update(self):
+        if not self.updates:
+            return False
+        return self.updates.pop(0)
+
+
+class CountingLock:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.taken = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.taken += 1
+
+    def __exit__(self, *exc_info):
+        self.lock.release()
+
+
+class TestUpdatePump:
+    def test_drain_should_apply_updates_to_store(self, store):
+        manager = FakeManager({1: make_event(1), 3: make_event(3), 5: make_event(5)})
+        manager.removed_ids.add(2)
+        updater = FakeUpdater(manager, [5, None, 2, 1])
+        pump = UpdatePump(updater, store, threading.RLock())
+        since = store.version
+
+        count = pump.drain()
+
+        assert count == 4
+        changes = store.changes_since(since)
+        assert changes.added == [5]
+        assert changes.modified == [1]
+        assert changes.removed == [2]
+
+    def test_drain_should_put_details_of_updated_events_in_cache(self, store):
+        manager = FakeManager({1: make_event(1)})
+        details = DetailsCache(store)
+        pump = UpdatePump(FakeUpdater(manager, [1]), store, threading.RLock(), details=details)
+        pump.drain()
+        assert details.get(1).event is manager.events[1]
+
+    def test_drain_should_release_the_lock_between_updates(self, store):
+        manager = FakeManager({i: make_event(i) for i in (1, 2, 3)})
+        lock = CountingLock()
+        pump = UpdatePump(FakeUpdater(manager, [1, 2, 3]), store, lock)
+        assert pump.drain() == 3
+        assert lock.taken == 4  # Once per update, and once to find there are no more
+
+    def test_pump_thread_should_stop_on_error(self, store):
+        class BrokenUpdater(FakeUpdater):
+            def get_event_update(self):
+                raise BrokenPipeError("gone")
+
+        pump = UpdatePump(BrokenUpdater(FakeManager({}), []), store, threading.RLock(), interval=0.01)
+        pump.start()
+        pump.join(timeout=1)
+        assert not pump.is_alive()
+        assert isinstance(pump.error, BrokenPipeError)
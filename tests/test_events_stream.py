@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from howitz.events.store import EventStore
+from howitz.events.stream import event_stream, format_sse
+
+from .test_events_store import make_event
+
+
+@pytest.fixture()
+def store():
+    store = EventStore()
+    store.load({i: make_event(i) for i in (1, 2, 3)})
+    return store
+
+
+class TestFormatSse:
+    def test_message_should_end_with_empty_line(self):
+        assert format_sse(42) == "data: 42\n\n"
+
+    def test_named_event_should_come_before_data(self):
+        assert format_sse(42, event="eventsChanged") == "event: eventsChanged\ndata: 42\n\n"
+
+
+class TestEventStream:
+    def test_stream_should_start_with_current_version(self, store):
+        stream = event_stream(store, is_alive=lambda: True)
+        assert next(stream) == f"event: eventsChanged\ndata: {store.version}\n\n"
+
+    def test_stream_should_send_new_version_on_change(self, store):
+        stream = event_stream(store, is_alive=lambda: True, throttle=0)
+        next(stream)
+        store.set(make_event(4))
+        assert next(stream) == f"event: eventsChanged\ndata: {store.version}\n\n"
+
+    def test_changes_within_throttle_should_be_sent_as_one_message(self, store):
+        stream = event_stream(store, is_alive=lambda: True, heartbeat=0.01, throttle=0.2)
+        next(stream)
+        store.set(make_event(4))
+        threading.Timer(0.05, store.set, args=(make_event(5),)).start()
+        assert next(stream) == f"event: eventsChanged\ndata: {store.version}\n\n"
+        assert next(stream) == ": heartbeat\n\n"
+
+    def test_stream_should_send_heartbeat_when_nothing_changes(self, store):
+        stream = event_stream(store, is_alive=lambda: True, heartbeat=0.01)
+        next(stream)
+        assert next(stream) == ": heartbeat\n\n"
+
+    def test_stream_should_end_when_no_longer_alive(self, store):
+        stream = event_stream(store, is_alive=lambda: False)
+        next(stream)
+        with pytest.raises(StopIteration):
+            next(stream)
+
+    def test_stream_should_end_after_max_duration(self, store):
+        stream = event_stream(store, is_alive=lambda: True, heartbeat=0.01, max_duration=0.05)
+        started = time.monotonic()
+        messages = list(stream)
+        assert time.monotonic() - started < 1
+        assert messages[0].startswith("event: eventsChanged")
+        assert all(message == ": heartbeat\n\n" for message in messages[1:])
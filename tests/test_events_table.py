@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from zinolib.event_types import Event, AdmState, PortState
+
+from howitz.endpoints import create_table_event
+from howitz.events.table import EventColor, TableEvent
+
+
+def make_portstate_event(port_state, adm_state=AdmState.OPEN, lasttrans=None, ac_down=None):
+    now = datetime.now(timezone.utc)
+    return Event.create({
+        "id": 1,
+        "type": Event.Type.PORTSTATE,
+        "adm_state": adm_state,
+        "router": "router1",
+        "opened": now - timedelta(days=2, hours=3),
+        "updated": now,
+        "if_index": 1,
+        "port_state": port_state,
+        "port": "ge-0/0/1",
+        "descr": "Uplink to core",
+        "lasttrans": lasttrans,
+        "ac_down": ac_down,
+    })
+
+
+class TestTableEvent:
+    def test_table_event_should_show_what_the_event_row_shows(self):
+        event = make_portstate_event(PortState.DOWN)
+        table_event = TableEvent.from_event(event)
+        assert table_event.id == 1
+        assert table_event.type == "portstate"
+        assert table_event.color == EventColor.RED
+        assert table_event.adm_state == AdmState.OPEN
+        assert table_event.op_state == event.op_state
+        assert (table_event.router, table_event.port, table_event.description) == (
+            "router1", "ge-0/0/1", event.description)
+        assert table_event.age == "2 days, 3:00"
+
+    @pytest.mark.parametrize("port_state,expected", [(PortState.DOWN, "14m"), (PortState.UP, " 4m")])
+    def test_downtime_should_match_the_downtime_of_the_event(self, port_state, expected):
+        now = datetime.now(timezone.utc)
+        event = make_portstate_event(port_state, lasttrans=now - timedelta(minutes=10), ac_down=timedelta(minutes=4))
+        assert TableEvent.from_event(event).downtime == expected
+
+    def test_event_without_downtime_should_show_none(self):
+        now = datetime.now(timezone.utc)
+        event = Event.create({"id": 2, "type": Event.Type.REACHABILITY, "adm_state": AdmState.IGNORED,
+                              "router": "router1", "opened": now, "updated": now, "reachability": "reachable"})
+        table_event = TableEvent.from_event(event)
+        assert table_event.downtime == ""
+        assert table_event.color == EventColor.BLUE
+
+    def test_create_table_event_should_take_an_event_or_its_table_event(self):
+        event = make_portstate_event(PortState.UP)
+        table_event = TableEvent.from_event(event)
+        assert create_table_event(table_event)["event"] is table_event
+        assert create_table_event(event, selected=True)["event"].id == event.id
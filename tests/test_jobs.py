@@ -0,0 +1,133 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from howitz.jobs import ItemStatus, Job, JobQueue
+
+
+class Worker:
+    "Works on items slowly, keeping track of how many at a time"
+    def __init__(self, delay=0.01, fail=()):
+        self.delay = delay
+        self.fail = fail
+        self.active = 0
+        self.max_active = 0
+        self.started = []
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=8)
+
+    def work(self, item):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.active, self.max_active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if item in self.fail:
+            raise ValueError(f"Cannot do {item}")
+        return item * 2
+
+    def start(self, item):
+        self.started.append((item, time.monotonic()))
+        return self.executor.submit(self.work, item)
+
+
+def wait_for(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.is_finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture()
+def worker():
+    worker = Worker()
+    yield worker
+    worker.executor.shutdown()
+
+
+class TestJob:
+    def test_run_should_do_every_item(self, worker):
+        results = {}
+        job = Job("user", "Doubling", [1, 2, 3, 4], worker.start, on_result=results.__setitem__, concurrency=2)
+        job.run()
+        assert job.is_finished
+        assert results == {1: 2, 2: 4, 3: 6, 4: 8}
+        assert set(job.statuses.values()) == {ItemStatus.DONE}
+        assert job.counts()["done"] == 4
+
+    def test_run_should_bound_concurrency(self, worker):
+        Job("user", "Doubling", range(12), worker.start, concurrency=3).run()
+        assert 1 < worker.max_active <= 3
+
+    def test_failed_item_should_not_stop_the_others(self):
+        worker = Worker(fail={2})
+        results = {}
+
+        def start(item):
+            if item == 4:
+                raise LookupError("No such item")
+            return worker.start(item)
+
+        job = Job("user", "Doubling", [1, 2, 3, 4, 5], start, on_result=results.__setitem__, concurrency=2)
+        job.run()
+        worker.executor.shutdown()
+        assert results == {1: 2, 3: 6, 5: 10}
+        assert job.failures() == {2: "Cannot do 2", 4: "No such item"}
+        assert job.statuses[2] == job.statuses[4] == ItemStatus.FAILED
+
+    def test_cancelled_job_should_start_no_more_items(self, worker):
+        job = Job("user", "Doubling", range(10), worker.start, concurrency=1, rate=20)
+        thread = threading.Thread(target=job.run)
+        thread.start()
+        time.sleep(0.12)
+        job.cancel()
+        thread.join()
+        counts = job.counts()
+        assert 0 < counts["done"] < 10
+        assert counts["done"] + counts["cancelled"] == 10
+        assert counts["pending"] == counts["running"] == 0
+
+    def test_rate_should_space_the_starts(self, worker):
+        Job("user", "Doubling", range(4), worker.start, concurrency=4, rate=20).run()
+        starts = [started for _, started in worker.started]
+        assert all(b - a >= 0.045 for a, b in zip(starts, starts[1:]))
+
+
+class TestJobQueue:
+    def test_submitted_job_should_run_in_the_background(self, worker):
+        jobs = JobQueue(max_running=1)
+        job = jobs.submit(Job("user", "Doubling", [1, 2], worker.start))
+        wait_for(job)
+        jobs.close()
+        assert job.is_finished
+        assert job.counts()["done"] == 2
+
+    def test_job_should_only_be_found_by_its_owner(self, worker):
+        jobs = JobQueue()
+        job = jobs.submit(Job("user", "Doubling", [1], worker.start))
+        assert jobs.get(job.id, owner="user") is job
+        assert jobs.get(job.id, owner="other") is None
+        assert jobs.get("nonexistent") is None
+        jobs.close()
+
+    def test_cancel_all_should_only_cancel_the_jobs_of_the_owner(self):
+        gate = threading.Event()
+        jobs = JobQueue(max_running=2)
+        mine = jobs.submit(Job("user", "Waiting", [1], lambda item: ThreadPoolExecutor(1).submit(gate.wait)))
+        theirs = jobs.submit(Job("other", "Waiting", [1], lambda item: ThreadPoolExecutor(1).submit(gate.wait)))
+        jobs.cancel_all("user")
+        assert mine.is_cancelled
+        assert not theirs.is_cancelled
+        gate.set()
+        jobs.close()
+
+    def test_finished_jobs_should_be_forgotten_after_a_while(self, worker):
+        jobs = JobQueue()
+        job = jobs.submit(Job("user", "Doubling", [1], worker.start))
+        wait_for(job)
+        job.finished_at -= jobs.keep_finished + 1
+        jobs.submit(Job("user", "Doubling", [2], worker.start))
+        jobs.close()
+        assert jobs.get(job.id) is None
@@ -0,0 +1,32 @@
+from howitz.rowcache import RowCache
+
+
+class TestRowCache:
+    def test_get_should_count_hits_and_misses(self):
+        cache = RowCache(max_size=100)
+        assert cache.get("a") is None
+        cache.set("a", "<tr></tr>")
+        assert cache.get("a") == "<tr></tr>"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_full_cache_should_drop_least_recently_used_rows(self):
+        cache = RowCache(max_size=10)
+        cache.set("a", "aaaa")
+        cache.set("b", "bbbb")
+        cache.get("a")
+        cache.set("c", "cccc")
+        assert cache.get("b") is None
+        assert cache.get("a") == "aaaa"
+        assert cache.size == 8
+
+    def test_replacing_a_row_should_update_size(self):
+        cache = RowCache(max_size=10)
+        cache.set("a", "aaaa")
+        cache.set("a", "aa")
+        assert cache.size == 2
+        assert len(cache) == 1
+
+    def test_row_larger_than_cache_should_not_be_cached(self):
+        cache = RowCache(max_size=2)
+        cache.set("a", "aaaa")
+        assert len(cache) == 0
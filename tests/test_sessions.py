@@ -0,0 +1,162 @@
+import time
+
+import pytest
+from flask import Flask, session
+
+from howitz.sessions import (
+    FileSystemSessionBackend,
+    ServerSideSessionInterface,
+    SqliteSessionBackend,
+    decode_session,
+    encode_session,
+    make_session_interface,
+    regenerate_session,
+)
+
+
+@pytest.fixture(params=["sqlite", "filesystem"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SqliteSessionBackend(str(tmp_path / "sessions.sqlite3"))
+    else:
+        backend = FileSystemSessionBackend(str(tmp_path / "sessions"))
+    backend.initdb()
+    return backend
+
+
+@pytest.fixture()
+def app(backend):
+    app = Flask(__name__)
+    app.secret_key = "secret"
+    app.session_interface = ServerSideSessionInterface(backend)
+
+    @app.route("/expand/<event_id>")
+    def expand(event_id):
+        session.setdefault("expanded_events", {})[event_id] = ""
+        session.modified = True
+        return ""
+
+    @app.route("/expanded")
+    def expanded():
+        return ",".join(sorted(session.get("expanded_events", {})))
+
+    @app.route("/touch")
+    def touch():
+        session.modified = True
+        return ""
+
+    @app.route("/regenerate")
+    def regenerate():
+        regenerate_session(session)
+        return ""
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return ""
+
+    return app
+
+
+class TestEncoding:
+    def test_encoded_session_should_decode_to_the_same_data(self):
+        data = {
+            "expanded_events": {"12": "", "3": ""},
+            "selected_events": {"12": "alarm", "40": "portstate", "3": "alarm"},
+            "sort_by": "raw",
+            "errors": {"abc": "Traceback"},
+            "empty": {},
+            "not_ids": {"007": "", "1": ""},
+        }
+        assert decode_session(encode_session(data)) == data
+
+    def test_event_ids_should_be_stored_compactly(self):
+        ids = {str(event_id): "" for event_id in range(100000, 110000)}
+        assert len(encode_session({"expanded_events": ids})) < 1000
+
+
+class TestBackends:
+    def test_saved_session_should_load(self, backend):
+        backend.save("sid", b"data", time.time() + 60)
+        assert backend.load("sid") == b"data"
+
+    def test_expired_session_should_not_load(self, backend):
+        backend.save("sid", b"data", time.time() - 1)
+        assert backend.load("sid") is None
+
+    def test_sqlite_backend_should_reuse_a_connection_in_wal_mode(self, tmp_path):
+        backend = SqliteSessionBackend(str(tmp_path / "sessions.sqlite3"))
+        backend.initdb()
+        backend.save("sid", b"data", time.time() + 60)
+        backend.load("sid")
+        assert len(backend.connections) == 1
+        assert backend.connections.get().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        backend.close()
+
+    def test_purge_should_delete_expired_sessions(self, backend):
+        backend.save("old", b"data", time.time() - 1)
+        backend.save("new", b"data", time.time() + 60)
+        backend.purge()
+        assert backend.load("new") == b"data"
+        backend.save("old", b"data", time.time() + 60)  # Would fail if the old one were still there
+        backend.delete("old")
+        assert backend.load("old") is None
+
+
+class TestServerSideSessionInterface:
+    def test_cookie_should_only_hold_a_session_id(self, app):
+        client = app.test_client()
+        for event_id in range(1000):
+            client.get(f"/expand/{event_id}")
+        cookie = client.get_cookie("session")
+        assert len(cookie.value) < 64
+        assert len(client.get("/expanded").text.split(",")) == 1000
+
+    def test_cookie_should_only_be_sent_for_new_sessions(self, app):
+        client = app.test_client()
+        response = client.get("/expand/1")
+        assert "Set-Cookie" in response.headers
+        response = client.get("/expand/2")
+        assert "Set-Cookie" not in response.headers
+
+    def test_unchanged_session_should_not_be_saved(self, app, backend, monkeypatch):
+        client = app.test_client()
+        client.get("/expand/1")
+        saved = []
+        monkeypatch.setattr(backend, "save", lambda *args: saved.append(args))
+        client.get("/touch")
+        assert not saved
+        client.get("/expand/2")
+        assert len(saved) == 1
+
+    def test_cleared_session_should_be_deleted(self, app, backend):
+        client = app.test_client()
+        client.get("/expand/1")
+        sid = client.get_cookie("session").value
+        client.get("/clear")
+        assert backend.load(sid) is None
+        assert client.get_cookie("session") is None
+
+    def test_regenerated_session_should_keep_its_data_under_a_new_id(self, app, backend):
+        client = app.test_client()
+        client.get("/expand/1")
+        sid = client.get_cookie("session").value
+        response = client.get("/regenerate")
+        assert "Set-Cookie" in response.headers
+        assert client.get_cookie("session").value != sid
+        assert backend.load(sid) is None
+        assert client.get("/expanded").text == "1"
+
+    def test_unknown_session_id_should_start_a_new_session(self, app):
+        client = app.test_client()
+        client.set_cookie("session", "unknown")
+        assert client.get("/expanded").text == ""
+
+
+class TestMakeSessionInterface:
+    def test_cookie_backend_should_keep_flask_default(self):
+        assert make_session_interface("cookie", "") is None
+
+    def test_unknown_backend_should_fail(self, tmp_path):
+        with pytest.raises(ValueError):
+            make_session_interface("memcached", str(tmp_path))
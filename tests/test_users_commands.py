@@ -0,0 +1,116 @@
+import csv
+import json
+
+import pytest
+
+from howitz import create_app
+from howitz.users.model import User
+
+
+@pytest.fixture
+def app(tmp_path):
+    test_config = {
+        "flask": {"SECRET_KEY": "secret", "TESTING": True},
+        "howitz": {"storage": str(tmp_path / "howitz.sqlite3"), "devmode": True},
+        "zino": {"connections": {"default": {"server": "127.0.0.1"}}},
+    }
+    app = create_app(test_config)
+    yield app
+    app.database.close()
+
+
+@pytest.fixture
+def runner(app):
+    return app.test_cli_runner()
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+class TestImportUsers:
+    def test_should_create_users_from_csv(self, app, runner, tmp_path):
+        path = write_csv(tmp_path / "users.csv", [
+            {"username": "foo", "password": "bar", "token": "xux", "timezone": ""},
+            {"username": "bar", "password": "xux", "token": "gurba", "timezone": "Europe/Oslo"},
+        ])
+        result = runner.invoke(args=["user", "import", path, "--workers", "0"])
+        assert result.exit_code == 0, result.output
+        assert "Created 2 and updated 0 users" in result.output
+        assert app.database.get("foo").authenticate("bar")
+        assert app.database.get("bar").timezone == "Europe/Oslo"
+
+    def test_should_hash_passwords_in_worker_processes(self, app, runner, tmp_path):
+        path = tmp_path / "users.ndjson"
+        path.write_text("".join(json.dumps({"username": f"user{i}", "password": f"pw{i}", "token": "t"}) + "\n"
+                                for i in range(4)))
+        result = runner.invoke(args=["user", "import", str(path), "--workers", "2"])
+        assert result.exit_code == 0, result.output
+        assert app.database.get("user3").authenticate("pw3")
+
+    def test_dry_run_should_not_change_anything(self, app, runner, tmp_path):
+        path = tmp_path / "users.json"
+        path.write_text(json.dumps([{"username": "foo", "password": "bar", "token": "xux"}]))
+        result = runner.invoke(args=["user", "import", str(path), "--dry-run"])
+        assert result.exit_code == 0, result.output
+        assert "Would create 1 and update 0 users" in result.output
+        assert app.database.get("foo") is None
+
+    def test_existing_user_should_abort_without_upsert(self, app, runner, tmp_path):
+        app.database.add(User(username="foo", password="bar", token="xux"))
+        path = write_csv(tmp_path / "users.csv", [
+            {"username": "foo", "password": "new", "token": "new"},
+            {"username": "bar", "password": "xux", "token": "gurba"},
+        ])
+        result = runner.invoke(args=["user", "import", path, "--workers", "0"])
+        assert result.exit_code == 1
+        assert "use --upsert" in result.output
+        assert app.database.get("bar") is None
+
+    def test_upsert_should_keep_fields_left_out(self, app, runner, tmp_path):
+        app.database.add(User(username="foo", password="bar", token="xux", timezone="Europe/Oslo"))
+        path = write_csv(tmp_path / "users.csv", [{"username": "foo", "token": "new"}])
+        result = runner.invoke(args=["user", "import", path, "--upsert", "--workers", "0"])
+        assert result.exit_code == 0, result.output
+        assert "Created 0 and updated 1 users" in result.output
+        user = app.database.get("foo")
+        assert user.token == "new"
+        assert user.timezone == "Europe/Oslo"
+        assert user.authenticate("bar")
+
+    def test_invalid_user_should_abort_whole_import(self, app, runner, tmp_path):
+        path = write_csv(tmp_path / "users.csv", [
+            {"username": "foo", "password": "bar", "token": "xux", "timezone": ""},
+            {"username": "bar", "password": "xux", "token": "gurba", "timezone": "Mars/Olympus"},
+            {"username": "xux", "password": "", "token": "", "timezone": ""},
+        ])
+        result = runner.invoke(args=["user", "import", path, "--workers", "0"])
+        assert result.exit_code == 1
+        assert "unknown timezone Mars/Olympus" in result.output
+        assert "User xux needs both password and token" in result.output
+        assert app.database.get_all() is None
+
+
+class TestExportUsers:
+    @pytest.mark.parametrize("file_format", ["csv", "json", "ndjson"])
+    def test_export_should_import_again(self, app, runner, tmp_path, file_format):
+        app.database.add(User(username="foo", password="bar", token="xux", timezone="Europe/Oslo"))
+        path = str(tmp_path / f"users.{file_format}")
+        result = runner.invoke(args=["user", "export", path])
+        assert result.exit_code == 0, result.output
+        exported = app.database.get("foo")
+        app.database.remove("foo")
+
+        result = runner.invoke(args=["user", "import", path, "--workers", "0"])
+        assert result.exit_code == 0, result.output
+        assert app.database.get("foo") == exported
+
+    def test_export_should_write_to_stdout(self, app, runner):
+        app.database.add(User(username="foo", password="bar", token="xux"))
+        result = runner.invoke(args=["user", "export", "--format", "ndjson"])
+        assert result.exit_code == 0, result.output
+        assert json.loads(result.stdout.splitlines()[0])["username"] == "foo"
@@ -1,5 +1,9 @@
 from pathlib import Path
+import sqlite3
+import threading
+import time
 import unittest
+from unittest.mock import patch
 
 from howitz.users.db import UserDB
 from howitz.users.model import User
@@ -21,6 +25,7 @@ class UserDBTest(unittest.TestCase):
         self.userdb.initdb()
 
     def tearDown(self):
+        self.userdb.close()
         TEST_DB.unlink(missing_ok=True)
 
     def test_get_non_existent_user_returns_None(self):
@@ -64,3 +69,149 @@ class UserDBTest(unittest.TestCase):
         self.assertEqual(len(results), 2)
         print(results)
 
+
+    def test_update_should_keep_timezone(self):
+        user = User(**{'username': 'foo', 'password': 'bar', 'token': 'xux'})
+        user = self.userdb.add(user)
+        self.assertEqual(user.timezone, '')
+        user.timezone = 'Europe/Oslo'
+        resuser = self.userdb.update(user)
+        self.assertEqual(resuser.timezone, 'Europe/Oslo')
+
+    def test_add_many_should_add_all_users(self):
+        users = [User(username=f'user{i}', password='bar', token='xux') for i in range(3)]
+        self.assertEqual(self.userdb.add_many(users), 3)
+        self.assertTrue(self.userdb.get('user2').authenticate('bar'))
+
+    def test_add_many_should_add_nothing_if_a_user_exists(self):
+        self.userdb.add(User(username='user1', password='bar', token='xux'))
+        users = [User(username=f'user{i}', password='bar', token='xux') for i in range(3)]
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.userdb.add_many(users)
+        self.assertEqual(len(self.userdb.get_all()), 1)
+
+    def test_add_many_with_replace_should_replace_existing_users(self):
+        self.userdb.add(User(username='user1', password='bar', token='xux'))
+        self.userdb.get('user1')
+        users = [User(username=f'user{i}', password='bar', token='new') for i in range(3)]
+        self.userdb.add_many(users, replace=True)
+        self.assertEqual(self.userdb.get('user1').token, 'new')
+
+    def test_database_should_be_in_wal_mode(self):
+        connection = sqlite3.connect(TEST_DB)
+        mode = connection.execute("PRAGMA journal_mode").fetchone()
+        connection.close()
+        self.assertEqual(mode[0], 'wal')
+
+    def test_connection_should_be_reused_by_the_same_thread(self):
+        self.assertIs(self.userdb.connection, self.userdb.connection)
+
+    def test_connection_should_differ_between_threads(self):
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(self.userdb.connection))
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], self.userdb.connection)
+
+    def test_connection_should_be_closed_when_its_thread_ends(self):
+        self.userdb.cache_ttl = 0
+        for _ in range(10):
+            thread = threading.Thread(target=self.userdb.get, args=('foo',))
+            thread.start()
+            thread.join()
+        self.assertEqual(len(self.userdb.connections), 1)  # Of this thread
+
+
+class UserDBCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.userdb = UserDB(TEST_DB)
+        self.userdb.initdb()
+        self.userdb.add(User(username='foo', password='bar', token='xux'))
+
+    def tearDown(self):
+        self.userdb.close()
+        TEST_DB.unlink(missing_ok=True)
+
+    def test_get_should_not_read_the_database_for_a_cached_user(self):
+        self.userdb.get('foo')
+        with patch.object(self.userdb, '_get') as _get:
+            user = self.userdb.get('foo')
+        _get.assert_not_called()
+        self.assertEqual(user.username, 'foo')
+
+    def test_get_should_return_a_copy_of_the_cached_user(self):
+        user = self.userdb.get('foo')
+        user.timezone = 'Europe/Oslo'
+        self.assertEqual(self.userdb.get('foo').timezone, '')
+
+    def test_update_should_invalidate_the_cached_user(self):
+        user = self.userdb.get('foo')
+        user.timezone = 'Europe/Oslo'
+        self.userdb.update(user)
+        self.assertEqual(self.userdb.get('foo').timezone, 'Europe/Oslo')
+
+    def test_remove_should_invalidate_the_cached_user(self):
+        self.userdb.get('foo')
+        self.userdb.remove('foo')
+        self.assertIsNone(self.userdb.get('foo'))
+
+    def test_cached_user_should_be_got_without_any_query(self):
+        self.userdb.get('foo')
+        statements = []
+        self.userdb.connection.set_trace_callback(statements.append)
+        self.userdb.get('foo')
+        self.userdb.connection.set_trace_callback(None)
+        self.assertEqual(statements, [])
+
+    def test_changes_by_other_processes_should_be_seen_after_version_check_interval(self):
+        self.userdb.version_check_interval = 0.05
+        self.userdb.get('foo')
+        other = UserDB(TEST_DB)  # Like the flask user commands
+        user = other.get('foo')
+        user.timezone = 'Europe/Oslo'
+        other.update(user)
+        other.close()
+        time.sleep(0.06)
+        self.assertEqual(self.userdb.get('foo').timezone, 'Europe/Oslo')
+
+    def test_cached_user_should_expire(self):
+        self.userdb.cache_ttl = 0.05
+        self.userdb.clear_cache()
+        self.userdb.get('foo')
+        time.sleep(0.06)
+        with patch.object(self.userdb, '_get') as _get:
+            self.userdb.get('foo')
+        _get.assert_called_once_with('foo')
+
+    def test_every_change_should_bump_the_version(self):
+        version = self.userdb.get_version()
+        self.userdb.update(self.userdb.get('foo'))
+        self.userdb.add_many([User(username='bar', password='bar', token='xux')])
+        self.assertEqual(self.userdb.get_version(), version + 2)
+
+    def test_cache_ttl_0_should_turn_the_cache_off(self):
+        userdb = UserDB(TEST_DB, cache_ttl=0)
+        userdb.get('foo')
+        with patch.object(userdb, '_get') as _get:
+            userdb.get('foo')
+        _get.assert_called_once_with('foo')
+        userdb.close()
+
+
+class UserDBMigrationTest(unittest.TestCase):
+
+    def tearDown(self):
+        TEST_DB.unlink(missing_ok=True)
+
+    def test_initdb_should_add_missing_columns(self):
+        connection = sqlite3.connect(TEST_DB)
+        with connection:
+            connection.execute("CREATE TABLE user (username TEXT NOT NULL PRIMARY KEY, password TEXT NOT NULL, "
+                               "token TEXT NOT NULL)")
+            connection.execute("INSERT INTO user values ('foo', 'bar', 'xux')")
+        connection.close()
+        userdb = UserDB(TEST_DB)
+        userdb.initdb()
+        self.assertEqual(userdb.get('foo').timezone, '')
+        userdb.close()
@@ -0,0 +1,50 @@
+import pytest
+
+from howitz.users.hashing import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture(scope="module")
+def pooled_hasher():
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1)
+    yield hasher
+    hasher.close()
+
+
+class TestPasswordHasher:
+    def test_hash_should_use_the_configured_method(self):
+        hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=0)
+        assert hasher.hash("bar").startswith("pbkdf2:sha256:1000$")
+
+    def test_verify_should_check_the_password_against_the_hash(self):
+        hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=0)
+        password_hash = hasher.hash("bar")
+        assert hasher.verify("bar", password_hash)
+        assert not hasher.verify("blbl", password_hash)
+
+    def test_needs_rehash_should_be_false_for_hash_with_configured_parameters(self):
+        hasher = PasswordHasher(method="scrypt", workers=0)
+        assert not hasher.needs_rehash(hasher.hash("bar"))
+
+    def test_needs_rehash_should_be_true_for_hash_with_other_parameters(self):
+        hasher = PasswordHasher(method="scrypt", workers=0)
+        other = PasswordHasher(method="scrypt:16384:8:1", workers=0)
+        assert hasher.needs_rehash(other.hash("bar"))
+
+    def test_pool_should_hash_and_verify_in_other_process(self, pooled_hasher):
+        password_hash = pooled_hasher.hash("bar")
+        assert password_hash.startswith("pbkdf2:sha256:1000$")
+        assert pooled_hasher.verify("bar", password_hash)
+        assert not pooled_hasher.verify("blbl", password_hash)
+
+    def test_full_queue_should_raise_busy_with_retry_after(self):
+        hasher = PasswordHasher(workers=1, max_pending=1)
+        hasher._pending.acquire()  # Another login waits for the worker
+        with pytest.raises(PasswordHasherBusy) as excinfo:
+            hasher.verify("bar", "scrypt:32768:8:1$salt$hash")
+        assert excinfo.value.code == 503
+        assert ("Retry-After", "5") in excinfo.value.get_headers()
+        assert hasher._executor is None  # Nothing was sent to the pool
+
+    def test_queue_place_should_be_freed_when_done(self, pooled_hasher):
+        for _ in range(pooled_hasher.max_pending + 1):
+            pooled_hasher.hash("bar")
@@ -0,0 +1,41 @@
+import io
+
+import pytest
+
+from howitz.users.model import User
+from howitz.users.transfer import guess_format, read_users, write_users
+
+
+class TestGuessFormat:
+    @pytest.mark.parametrize("filename,expected", [
+        ("users.csv", "csv"),
+        ("users.JSON", "json"),
+        ("users.ndjson", "ndjson"),
+        ("users.jsonl", "ndjson"),
+        ("-", "csv"),
+        ("users.txt", "csv"),
+    ])
+    def test_should_guess_format_from_extension(self, filename, expected):
+        assert guess_format(filename) == expected
+
+
+class TestReadUsers:
+    def test_should_leave_out_empty_and_unknown_fields(self):
+        file = io.StringIO("username,password,token,timezone,extra\nfoo,bar,,,x\n")
+        assert read_users(file, "csv") == [{"username": "foo", "password": "bar"}]
+
+    def test_should_skip_empty_lines_in_ndjson(self):
+        file = io.StringIO('{"username": "foo"}\n\n{"username": "bar"}\n')
+        assert read_users(file, "ndjson") == [{"username": "foo"}, {"username": "bar"}]
+
+    def test_json_that_is_not_a_list_should_fail(self):
+        with pytest.raises(ValueError):
+            read_users(io.StringIO('{"username": "foo"}'), "json")
+
+    @pytest.mark.parametrize("file_format", ["csv", "json", "ndjson"])
+    def test_should_read_what_was_written(self, file_format):
+        users = [User(username="foo", password="bar", token="xux", timezone="Europe/Oslo")]
+        file = io.StringIO()
+        write_users(users, file, file_format)
+        file.seek(0)
+        assert read_users(file, file_format) == [users[0].model_dump()]
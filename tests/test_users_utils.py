@@ -4,6 +4,7 @@ import unittest
 from werkzeug.exceptions import Forbidden
 
 from howitz.users.db import UserDB
+from howitz.users.hashing import PasswordHasher
 from howitz.users.model import User
 from howitz.users.utils import authenticate_user
 
@@ -17,6 +18,7 @@ class UserUtilsTest(unittest.TestCase):
         self.userdb.initdb()
 
     def tearDown(self):
+        self.userdb.close()
         TEST_DB.unlink(missing_ok=True)
 
     def test_autenticate_user_with_correct_password_returns_true(self):
@@ -30,3 +32,21 @@ class UserUtilsTest(unittest.TestCase):
         resuser = self.userdb.add(user)
         with self.assertRaises(Forbidden):
             authenticate_user(self.userdb, 'foo', 'blbl')
+
+    def test_authenticate_user_with_hasher_and_correct_password_returns_user(self):
+        self.userdb.add(User(username='foo', password='bar', token='xux'))
+        result = authenticate_user(self.userdb, 'foo', 'bar', hasher=PasswordHasher(workers=0))
+        self.assertEqual(result.username, 'foo')
+
+    def test_authenticate_user_with_hasher_and_wrong_password_raises_exception(self):
+        self.userdb.add(User(username='foo', password='bar', token='xux'))
+        with self.assertRaises(Forbidden):
+            authenticate_user(self.userdb, 'foo', 'blbl', hasher=PasswordHasher(workers=0))
+
+    def test_authenticate_user_should_rehash_password_made_with_other_parameters(self):
+        self.userdb.add(User(username='foo', password='bar', token='xux'))
+        hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=0)
+        authenticate_user(self.userdb, 'foo', 'bar', hasher=hasher)
+        password = self.userdb.get('foo').password
+        self.assertTrue(password.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(authenticate_user(self.userdb, 'foo', 'bar', hasher=hasher))
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from howitz.utils import DateFormatter, get_tzinfo, is_valid_timezone
+
+
+class TestTimezones:
+    @pytest.mark.parametrize("name", ["UTC", "LOCAL", "Europe/Oslo", "America/New_York"])
+    def test_known_timezones_should_be_valid(self, name):
+        assert is_valid_timezone(name)
+
+    @pytest.mark.parametrize("name", ["", "utc", "Europe", "../../etc/passwd", "Mars/Olympus_Mons"])
+    def test_unknown_timezones_should_be_invalid(self, name):
+        assert not is_valid_timezone(name)
+
+    def test_invalid_timezone_should_fall_back_to_utc(self):
+        assert get_tzinfo("Mars/Olympus_Mons") == timezone.utc
+
+    def test_local_timezone_should_be_left_to_astimezone(self):
+        assert get_tzinfo("LOCAL") is None
+
+
+class TestDateFormatter:
+    @pytest.mark.parametrize("tz_name,expected", [
+        ("UTC", "2024-01-15 12:30:00"),
+        ("Europe/Oslo", "2024-01-15 13:30:00"),
+        ("America/New_York", "2024-01-15 07:30:00"),
+    ])
+    def test_datetimes_should_be_formatted_in_the_timezone(self, tz_name, expected):
+        date_format = DateFormatter(tz_name)
+        assert date_format(datetime(2024, 1, 15, 12, 30, tzinfo=timezone.utc)) == expected
+        assert date_format(datetime(2024, 1, 15, 12, 30)) == expected  # Naive datetimes are UTC
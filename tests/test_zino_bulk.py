@@ -0,0 +1,121 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+from zinolib.controllers.zino1 import EventClosedError
+from zinolib.event_types import AdmState, Event
+
+from howitz.jobs import ItemStatus, Job
+from howitz.zino import bulk
+from howitz.zino.workers import ZinoWorkers
+
+
+def make_event(event_id, adm_state=AdmState.OPEN):
+    now = datetime.now(timezone.utc)
+    return Event.create({
+        "id": event_id,
+        "type": Event.Type.REACHABILITY,
+        "adm_state": adm_state,
+        "router": "router1",
+        "opened": now,
+        "updated": now,
+        "reachability": "reachable",
+    })
+
+
+class FakeManager:
+    "Acts on the events lent to it like a Zino1EventManager, slowly"
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.events = {}
+        self.history = []
+
+    def disconnect(self):
+        pass
+
+    def _act(self):
+        with self.lock:
+            FakeManager.active += 1
+            FakeManager.max_active = max(FakeManager.active, FakeManager.max_active)
+        time.sleep(0.01)
+        with self.lock:
+            FakeManager.active -= 1
+
+    def change_admin_state_for_id(self, event_id, admin_state):
+        self._act()
+        event = self.events[event_id]
+        if event.adm_state == AdmState.CLOSED:
+            raise EventClosedError("Cannot set state on closed event")
+        return event.model_copy(update={"adm_state": admin_state})
+
+    def add_history_entry_for_id(self, event_id, message):
+        self._act()
+        self.history.append((event_id, message))
+        return self.events[event_id]
+
+    def poll(self, event):
+        self._act()
+        if event.id == 13:
+            raise OSError("Connection reset")
+        return True
+
+    def clear_flapping(self, event):
+        return None
+
+
+@pytest.fixture()
+def workers():
+    FakeManager.max_active = 0
+    workers = ZinoWorkers(FakeManager, size=3)
+    yield workers
+    workers.close()
+
+
+def run_job(workers, action, events, **kwargs):
+    "Run ``action`` on ``events`` in a job like the bulk actions of the events table do, return the job and results"
+    events = {event.id: event for event in events}
+    results = {}
+    job = Job("alice", action.__name__, list(events),
+              lambda event_id: bulk.submit(workers, action, events[event_id], **kwargs),
+              on_result=results.__setitem__, concurrency=workers.size)
+    job.run()
+    return job, results
+
+
+class TestBulkJob:
+    def test_update_status_should_report_every_event(self, workers):
+        events = [make_event(i) for i in range(1, 10)] + [make_event(10, AdmState.CLOSED)]
+        job, results = run_job(workers, bulk.update_status, events, state=AdmState.WORKING)
+        assert job.counts()["done"] == 9
+        assert sorted(results) == list(range(1, 10))
+        assert all(event.adm_state == AdmState.WORKING for event in results.values())
+        assert job.statuses[10] == ItemStatus.FAILED
+        assert job.failures() == {10: "Cannot set state on closed event"}
+
+    def test_actions_should_run_concurrently(self, workers):
+        events = [make_event(i) for i in range(1, 13)]
+        run_job(workers, bulk.poll, events)
+        assert 1 < FakeManager.max_active <= 3
+
+    def test_failure_should_not_stop_the_other_events(self, workers):
+        events = [make_event(i) for i in range(10, 16)]
+        job, _ = run_job(workers, bulk.poll, events)
+        assert [job.statuses[i] == ItemStatus.DONE for i in range(10, 16)] == [True, True, True, False, True, True]
+        assert job.failures() == {13: "Connection reset"}
+
+    def test_failed_action_should_be_an_error(self, workers):
+        job, _ = run_job(workers, bulk.clear_flapping, [make_event(1)])
+        assert job.failures() == {1: "Cant clear flapping on a non-port event."}
+
+    def test_lent_events_should_be_returned(self, workers):
+        managers = []
+        workers.connect = lambda: managers.append(FakeManager()) or managers[-1]
+        run_job(workers, bulk.update_status, [make_event(1), make_event(2)], history="down for maintenance")
+        assert managers
+        assert all(not manager.events for manager in managers)
+        assert sorted(entry for manager in managers for entry in manager.history) == [
+            (1, "down for maintenance"), (2, "down for maintenance")]
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from howitz.zino.health import Health, HealthMonitor
+
+
+class FakeConnection:
+    "Fails its checks while ``broken``, until reconnected ``reconnects_needed`` times"
+    def __init__(self, reconnects_needed=1):
+        self.broken = False
+        self.receiving = True
+        self.checks = 0
+        self.reconnects = 0
+        self.reconnects_needed = reconnects_needed
+        self.reconnected = threading.Event()
+
+    def check(self):
+        self.checks += 1
+        if self.broken:
+            raise TimeoutError("Timed out")
+        return self.receiving
+
+    def reconnect(self):
+        self.reconnects += 1
+        if self.reconnects < self.reconnects_needed:
+            raise ConnectionRefusedError("Refused")
+        self.broken = False
+        self.receiving = True
+        self.reconnected.set()
+
+
+@pytest.fixture()
+def connection():
+    return FakeConnection()
+
+
+def make_monitor(connection, **kwargs):
+    monitor = HealthMonitor(connection.check, connection.reconnect, interval=kwargs.pop("interval", 60))
+    monitor.backoff = monitor.min_interval = 0.01
+    for name, value in kwargs.items():
+        setattr(monitor, name, value)
+    return monitor
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestHealthMonitor:
+    def test_status_should_be_unknown_before_checking(self, connection):
+        assert make_monitor(connection).status.health == Health.UNKNOWN
+
+    def test_working_connection_should_be_up(self, connection):
+        status = make_monitor(connection).update()
+        assert status.health == Health.UP
+        assert status.rtt is not None
+        assert not status.failures
+
+    def test_slow_connection_should_be_degraded(self, connection):
+        assert make_monitor(connection, slow_rtt=-1).update().health == Health.DEGRADED
+
+    def test_one_failed_check_should_only_degrade(self, connection):
+        monitor = make_monitor(connection)
+        connection.broken = True
+        status = monitor.update()
+        assert status.health == Health.DEGRADED
+        assert status.error == "Timed out"
+        assert monitor.update().health == Health.DOWN
+
+    def test_lost_updates_should_be_down(self, connection):
+        connection.receiving = False
+        assert make_monitor(connection).update().health == Health.DOWN
+
+    def test_success_should_reset_failures(self, connection):
+        monitor = make_monitor(connection)
+        connection.broken = True
+        monitor.update()
+        connection.broken = False
+        assert monitor.update().failures == 0
+
+    def test_backoff_should_grow_up_to_max(self, connection):
+        monitor = make_monitor(connection, backoff=1, max_backoff=10, jitter=0.5)
+        delays = [monitor.backoff_delay(attempts) for attempts in range(6)]
+        assert 0.5 <= delays[0] <= 1
+        assert 4 <= delays[3] <= 8
+        assert 5 <= delays[5] <= 10
+
+    def test_lost_connection_should_be_reconnected(self):
+        connection = FakeConnection(reconnects_needed=3)
+        monitor = make_monitor(connection)
+        monitor.start()
+        try:
+            assert wait_until(lambda: monitor.status.health == Health.UP)
+            connection.broken = True
+            monitor.check_soon()
+            assert connection.reconnected.wait(5)
+            assert wait_until(lambda: monitor.status.health == Health.UP)
+        finally:
+            monitor.stop()
+            monitor.join()
+        assert connection.reconnects == 3
+
+    def test_check_soon_should_check_before_the_interval(self, connection):
+        monitor = make_monitor(connection)
+        monitor.start()
+        try:
+            assert wait_until(lambda: connection.checks == 1)
+            monitor.check_soon()
+            assert wait_until(lambda: connection.checks == 2)
+        finally:
+            monitor.stop()
+            monitor.join()
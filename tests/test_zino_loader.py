@@ -0,0 +1,104 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+
+from howitz.events.store import EventStore
+from howitz.zino.loader import EventLoader
+
+from .test_events_store import make_event
+
+
+class FakeZino:
+    def __init__(self, event_ids, fail=()):
+        self.events = {i: make_event(i) for i in event_ids}
+        self.fail = dict.fromkeys(fail, 1)  # Fails this many times
+        self.fetched = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.executor = ThreadPoolExecutor(max_workers=3)
+
+    def get_event_ids(self):
+        return list(self.events)
+
+    def _fetch(self, event_id):
+        self.gate.wait()
+        self.fetched.append(event_id)
+        if self.fail.get(event_id):
+            self.fail[event_id] -= 1
+            raise TimeoutError("Timed out")
+        return self.events[event_id]
+
+    def fetch_event(self, event_id):
+        return self.executor.submit(self._fetch, event_id)
+
+
+@pytest.fixture()
+def zino():
+    zino = FakeZino(range(1, 21))
+    yield zino
+    zino.executor.shutdown()
+
+
+class TestEventLoader:
+    def test_loader_should_add_every_event(self, zino):
+        store = EventStore()
+        known = {}
+        loader = EventLoader(store, zino.get_event_ids, zino.fetch_event,
+                             on_fetched=lambda events: known.update((e.id, e) for e in events))
+        loader.run()
+        assert sorted(store.events) == list(range(1, 21))
+        assert known == store.events
+        assert loader.fetched == loader.total == 20
+
+    def test_newest_events_should_be_fetched_first(self, zino):
+        EventLoader(EventStore(), zino.get_event_ids, zino.fetch_event, concurrency=1).run()
+        assert zino.fetched == list(range(20, 0, -1))
+
+    def test_failed_event_should_be_fetched_again(self):
+        zino = FakeZino([1, 2, 3], fail=[2])
+        store = EventStore()
+        EventLoader(store, zino.get_event_ids, zino.fetch_event).run()
+        zino.executor.shutdown()
+        assert sorted(store.events) == [1, 2, 3]
+        assert zino.fetched.count(2) == 2
+
+    def test_fetched_event_should_not_replace_a_later_update(self, zino):
+        store = EventStore()
+        later = zino.events[5].model_copy(update={"updated": zino.events[5].updated + timedelta(seconds=60)})
+        store.set(later)
+        EventLoader(store, zino.get_event_ids, zino.fetch_event).run()
+        assert store.events[5] is later
+
+    def test_event_without_updated_should_not_stop_the_loader(self, zino):
+        store = EventStore()
+        zino.events[5] = zino.events[5].model_copy(update={"updated": None})
+        store.set(make_event(5))  # Added by the update pump meanwhile
+        loader = EventLoader(store, zino.get_event_ids, zino.fetch_event)
+        loader.run()
+        assert loader.error is None
+        assert sorted(store.events) == list(range(1, 21))
+        assert store.events[5] is zino.events[5]
+
+    def test_wait_for_should_return_before_all_events_are_loaded(self, zino):
+        store = EventStore()
+        loader = EventLoader(store, zino.get_event_ids, zino.fetch_event, concurrency=1)
+        zino.gate.clear()
+        loader.start()
+        loader.wait_for(5, timeout=0.05)
+        assert loader.is_loading
+        zino.gate.set()
+        loader.wait_for(5, timeout=5)
+        assert len(store) >= 5
+        loader.join()
+
+    def test_stopped_loader_should_fetch_no_more(self, zino):
+        store = EventStore()
+        loader = EventLoader(store, zino.get_event_ids, zino.fetch_event, concurrency=1)
+        zino.gate.clear()
+        loader.start()
+        loader.stop()
+        zino.gate.set()
+        loader.join()
+        assert len(zino.fetched) < 20
@@ -0,0 +1,183 @@
+import threading
+
+import pytest
+
+from howitz.config.zino1 import make_zino1_config
+from howitz.zino import pool
+from howitz.zino.pool import SessionPool, SessionEventManager
+
+from .test_events_store import make_event
+
+
+class FakeSession:
+    def __init__(self, username, config, autoremove=False, workers=3, shared_dir="", health_interval=30,
+                 resync_interval=300):
+        self.username = username
+        self.idle = 0
+        self.connected = False
+        self.disconnected = threading.Event()
+
+    @property
+    def idle_time(self):
+        return self.idle
+
+    def touch(self):
+        self.idle = 0
+
+    def connect(self, token):
+        self.connected = True
+
+    def disconnect(self):
+        self.disconnected.set()
+
+
+@pytest.fixture()
+def session_pool(monkeypatch):
+    monkeypatch.setattr(pool, "ZinoSession", FakeSession)
+    return SessionPool(config=None, max_size=2, idle_timeout=10)
+
+
+class TestSessionPool:
+    def test_connect_should_reuse_session_of_user(self, session_pool):
+        first = session_pool.connect("alice", "token")
+        assert first.connected
+        assert session_pool.connect("alice", "token") is first
+        assert len(session_pool) == 1
+
+    def test_get_should_return_none_for_unknown_user(self, session_pool):
+        assert session_pool.get("alice") is None
+
+    def test_full_pool_should_evict_least_recently_used_session(self, session_pool):
+        alice = session_pool.connect("alice", "token")
+        session_pool.connect("bob", "token")
+        session_pool.get("alice")
+        session_pool.connect("carol", "token")
+        assert "bob" not in session_pool
+        assert "alice" in session_pool
+        assert session_pool.get("alice") is alice
+
+    def test_evicted_session_should_be_disconnected(self, session_pool):
+        alice = session_pool.connect("alice", "token")
+        session_pool.connect("bob", "token")
+        session_pool.connect("carol", "token")
+        assert alice.disconnected.wait(1)
+
+    def test_idle_session_should_be_evicted(self, session_pool):
+        alice = session_pool.connect("alice", "token")
+        alice.idle = 11
+        assert session_pool.get("alice") is None
+        assert alice.disconnected.wait(1)
+
+    def test_get_should_not_wait_for_evicted_session_to_disconnect(self, session_pool):
+        may_finish = threading.Event()
+        alice = session_pool.connect("alice", "token")
+        alice.disconnect = lambda: may_finish.wait(5) and alice.disconnected.set()
+        bob = session_pool.connect("bob", "token")
+        alice.idle = 11
+        assert session_pool.get("bob") is bob
+        assert "alice" not in session_pool
+        assert not alice.disconnected.is_set()
+        may_finish.set()
+        assert alice.disconnected.wait(1)
+
+    def test_remove_should_disconnect_session(self, session_pool):
+        alice = session_pool.connect("alice", "token")
+        assert session_pool.remove("alice") is alice
+        assert alice.disconnected.is_set()
+        assert "alice" not in session_pool
+
+
+def test_session_event_managers_should_not_share_connection():
+    config = make_zino1_config({"ZINO1_SERVER": "localhost"})
+    first = SessionEventManager.configure(config)
+    second = SessionEventManager.configure(config)
+    assert first.session is not second.session
+
+
+class FakeUpdateHandler:
+    def __init__(self, manager, autoremove=False):
+        self.manager = manager
+
+    def connect(self):
+        pass
+
+    def get_event_update(self):
+        return False
+
+
+class FakeEventManager:
+    is_authenticated = True
+
+    def __init__(self):
+        self.events = {}
+
+    def get_events(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+def test_only_one_shared_session_should_connect_to_the_update_handler(monkeypatch, tmp_path):
+    monkeypatch.setattr(pool, "UpdateHandler", FakeUpdateHandler)
+    config = make_zino1_config({"ZINO1_SERVER": "localhost"})
+    sessions = [pool.ZinoSession("alice", config, shared_dir=str(tmp_path)) for _ in range(2)]
+    for zino_session in sessions:
+        zino_session.event_manager = FakeEventManager()
+        zino_session.connect_updatehandler()
+    publisher, follower = sessions
+    try:
+        assert publisher.updater is not None and not publisher.is_following
+        assert follower.updater is None and follower.is_following
+    finally:
+        publisher.disconnect()
+        follower.disconnect()
+
+
+def test_resync_should_let_the_update_handler_know_the_events(monkeypatch, tmp_path):
+    monkeypatch.setattr(pool, "UpdateHandler", FakeUpdateHandler)
+    config = make_zino1_config({"ZINO1_SERVER": "localhost"})
+    zino_session = pool.ZinoSession("alice", config, resync_interval=0)
+    zino_session.event_manager = FakeEventManager()
+    zino_session.event_manager.get_event_ids = lambda: [1, 2]
+    zino_session.workers.map = lambda func, event_ids: [(i, make_event(i)) for i in event_ids]
+    zino_session.store.load({3: make_event(3)})
+    known = zino_session.event_manager.events
+    known[3] = make_event(3)
+    zino_session.resync()
+    assert zino_session.event_manager.events is known
+    assert sorted(known) == [1, 2]
+
+
+def is_locked_elsewhere(lock):
+    "Whether another thread holds ``lock``"
+    result = []
+
+    def try_lock():
+        result.append(not lock.acquire(timeout=0))
+        if not result[0]:
+            lock.release()
+
+    thread = threading.Thread(target=try_lock)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_reconnect_should_resync_without_holding_the_lock(monkeypatch, tmp_path, shared):
+    monkeypatch.setattr(pool, "UpdateHandler", FakeUpdateHandler)
+    config = make_zino1_config({"ZINO1_SERVER": "localhost"})
+    zino_session = pool.ZinoSession("alice", config, shared_dir=str(tmp_path) if shared else "",
+                                    health_interval=3600, resync_interval=0)
+    event_manager = FakeEventManager()
+    event_manager.is_connected = True
+    zino_session.event_manager = event_manager
+    zino_session.store.load({1: make_event(1)})
+    locked = []
+    monkeypatch.setattr(zino_session, "resync", lambda check=None: locked.append(is_locked_elsewhere(zino_session.lock)))
+    try:
+        zino_session.reconnect()
+    finally:
+        zino_session.disconnect()
+    assert locked == [False]
@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+import pytest
+
+from howitz.events.store import EventStore
+from howitz.zino.resync import Resyncer, is_newer, resync_events
+
+from .test_events_store import make_event
+
+
+def updated(event, seconds=60):
+    return event.model_copy(update={"updated": event.updated + timedelta(seconds=seconds)})
+
+
+class FakeZino:
+    def __init__(self, events):
+        self.events = dict(events)
+        self.fetched = []
+
+    def get_event_ids(self):
+        return list(self.events)
+
+    def fetch_events(self, event_ids):
+        self.fetched.extend(event_ids)
+        results = []
+        for event_id in event_ids:
+            event = self.events.get(event_id)
+            results.append((event_id, event if event is not None else LookupError(f"No event {event_id}")))
+        return results
+
+
+@pytest.fixture()
+def store():
+    store = EventStore()
+    store.load({i: make_event(i) for i in (1, 2, 3)})
+    return store
+
+
+class TestIsNewer:
+    def test_later_update_should_be_newer(self):
+        event = make_event(1)
+        assert is_newer(updated(event), event)
+        assert not is_newer(event, updated(event))
+        assert not is_newer(event, event)
+
+    def test_event_without_updated_should_be_newer(self):
+        event = make_event(1)
+        unknown = event.model_copy(update={"updated": None})
+        assert is_newer(unknown, event)
+        assert is_newer(event, unknown)
+
+
+class TestResyncEvents:
+    def test_unchanged_events_should_change_nothing(self, store):
+        zino = FakeZino(store.events)
+        version = store.version
+        assert not resync_events(store, zino.get_event_ids, zino.fetch_events)
+        assert store.version == version
+
+    def test_resync_should_apply_differences_as_changes(self, store):
+        zino = FakeZino(store.events)
+        zino.events[2] = updated(store.events[2])
+        del zino.events[3]
+        zino.events[4] = make_event(4)
+        version = store.version
+        result = resync_events(store, zino.get_event_ids, zino.fetch_events)
+        assert result.added == [4]
+        assert result.modified == [2]
+        assert result.removed == [3]
+        changes = store.changes_since(version)
+        assert (changes.added, changes.modified, changes.removed) == ([4], [2], [3])
+
+    def test_only_new_and_checked_events_should_be_fetched(self, store):
+        zino = FakeZino(store.events)
+        zino.events[4] = make_event(4)
+        zino.events[1] = updated(store.events[1])
+        zino.events[2] = updated(store.events[2])
+        result = resync_events(store, zino.get_event_ids, zino.fetch_events, check=[1])
+        assert sorted(zino.fetched) == [1, 4]
+        assert result.modified == [1]
+
+    def test_older_event_should_not_replace_newer(self, store):
+        zino = FakeZino(store.events)
+        store.set(updated(store.events[1]))
+        assert not resync_events(store, zino.get_event_ids, zino.fetch_events)
+        assert store.events[1].updated > zino.events[1].updated
+
+    @pytest.mark.parametrize("store_has_updated,zino_has_updated", [(True, False), (False, True), (False, False)])
+    def test_event_without_updated_should_be_replaced(self, store, store_has_updated, zino_has_updated):
+        zino = FakeZino(store.events)
+        if not store_has_updated:
+            store.set(store.events[1].model_copy(update={"updated": None}))
+        if not zino_has_updated:
+            zino.events[1] = zino.events[1].model_copy(update={"updated": None})
+        zino.events[2] = updated(store.events[2])
+        result = resync_events(store, zino.get_event_ids, zino.fetch_events)
+        assert result.modified == [1, 2]
+        assert store.events[1] is zino.events[1]
+
+    def test_event_added_meanwhile_should_not_be_removed(self, store):
+        zino = FakeZino(store.events)
+
+        def get_event_ids():
+            ids = zino.get_event_ids()
+            store.set(make_event(5))  # Added by the update pump after Zino listed its events
+            return ids
+
+        resync_events(store, get_event_ids, zino.fetch_events)
+        assert 5 in store.events
+
+    def test_failed_fetch_should_be_skipped(self, store):
+        zino = FakeZino(store.events)
+        zino.events[4] = make_event(4)
+        zino.fetch_events = lambda event_ids: [(4, TimeoutError("Timed out"))]
+        assert not resync_events(store, zino.get_event_ids, zino.fetch_events)
+        assert 4 not in store.events
+
+
+class TestResyncer:
+    def test_batches_should_take_turns(self, store):
+        store.set(make_event(4))
+        resyncer = Resyncer(None, store, interval=60, batch_size=3)
+        assert resyncer.next_batch() == [1, 2, 3]
+        assert resyncer.next_batch() == [4, 1, 2]
+        store.remove(3)
+        assert resyncer.next_batch() == [4, 1, 2]
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from howitz.zino.workers import ZinoWorkers
+
+
+class FakeManager:
+    def __init__(self):
+        self.disconnected = False
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+class TestZinoWorkers:
+    def test_map_should_return_results_in_order(self):
+        workers = ZinoWorkers(FakeManager, size=3)
+        results = workers.map(lambda manager, i: i * 2, [1, 2, 3, 4])
+        workers.close()
+        assert results == [(1, 2), (2, 4), (3, 6), (4, 8)]
+
+    def test_map_should_return_exception_of_failed_call(self):
+        def fail_on_two(manager, i):
+            if i == 2:
+                raise ValueError(i)
+            return i
+
+        workers = ZinoWorkers(FakeManager, size=2)
+        results = dict(workers.map(fail_on_two, [1, 2, 3]))
+        workers.close()
+        assert isinstance(results[2], ValueError)
+        assert results[3] == 3
+
+    def test_should_not_make_more_connections_than_size(self):
+        managers = []
+
+        def connect():
+            managers.append(FakeManager())
+            return managers[-1]
+
+        barrier = threading.Barrier(2)
+        workers = ZinoWorkers(connect, size=2)
+        workers.map(lambda manager, i: barrier.wait(timeout=1), range(6))
+        workers.close()
+        assert len(managers) == 2
+        assert all(manager.disconnected for manager in managers)
+
+    def test_connection_error_should_drop_connection(self):
+        managers = []
+
+        def connect():
+            managers.append(FakeManager())
+            return managers[-1]
+
+        def broken(manager, i):
+            raise BrokenPipeError()
+
+        workers = ZinoWorkers(connect, size=1)
+        with pytest.raises(BrokenPipeError):
+            workers.submit(broken, 1).result()
+        assert managers[0].disconnected
+        assert workers.submit(lambda manager: manager).result() is managers[1]
+        workers.close()